@@ -2,21 +2,37 @@ import os
 import numpy as np
 import cv2
 import json
-import pandas as pd
-from flask import Flask, render_template, request, jsonify, url_for, session, redirect
+import zipfile
+import csv
+import threading
+import time
+import uuid
+from flask import Flask, render_template, request, jsonify, url_for, session, redirect, Response
 from werkzeug.utils import secure_filename
-from tensorflow.keras.models import load_model
-from tensorflow.keras.utils import load_img, img_to_array
 import base64
 from io import BytesIO
 from PIL import Image
-from flask import send_from_directory
-from datetime import timedelta
+from flask import send_from_directory, send_file
+from datetime import datetime, timedelta
 
 # Import des configurations et de la base de données
 from config import config
 from database import db
 from auth import auth_bp, login_required
+from inference import load_backend, MicroBatcher
+from cascade import CascadePredictor
+from prediction_cache import PredictionCache, model_identity, cascade_identity, tta_identity
+from write_behind import PredictionWriter
+from jobs import JobQueue
+from thumbnails import ThumbnailStore
+from assets import AssetManifest
+from export import EXPORT_FORMATS, encode_chunks, parse_date
+from slide import analyze_slide
+from tta import refine_low_confidence
+import metrics
+from metrics import stage
+import preprocessing
+from preprocessing import decode_image, read_image, image_size
 
 db.init_db()
 
@@ -38,28 +54,94 @@ app.static_folder = 'static'
 # Enregistrement du blueprint d'authentification
 app.register_blueprint(auth_bp)
 
+# Métriques Prometheus (/metrics) et durées par étape (en-tête Server-Timing)
+metrics.init_app(
+    app,
+    enabled=config.METRICS_ENABLED,
+    server_timing=config.SERVER_TIMING,
+    metrics_dir=config.METRICS_DIR,
+    flush_interval=config.METRICS_FLUSH_INTERVAL,
+    token=config.METRICS_TOKEN
+)
+
+print(f"✓ Prétraitement des images: {preprocessing.configure(config.PREPROCESS_BACKEND)}")
+
 # Créer le dossier uploads s'il n'existe pas
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Charger le modèle au démarrage
-try:
-    if os.path.exists(config.MODEL_PATH):
-        model = load_model(config.MODEL_PATH, compile=False)
-        # Recompiler pour éviter l'erreur batch_shape
-        model.compile(
-            optimizer='adam',
-            loss='binary_crossentropy',
-            metrics=['accuracy']
+# Charger le modèle (ou la cascade de modèles) au démarrage
+backend_options = {
+    'num_threads': config.INFERENCE_THREADS,
+    'compiled': config.KERAS_COMPILED_SERVING,
+    'warmup_batch_sizes': config.SERVING_WARMUP_BATCH_SIZES
+}
+with metrics.timer('malaria_model_load_seconds', config.INFERENCE_BACKEND):
+    if config.CASCADE_ENABLED:
+        model = CascadePredictor.from_paths(
+            config.INFERENCE_BACKEND,
+            config.CASCADE_MODELS,
+            threshold=config.CASCADE_THRESHOLD,
+            final=config.CASCADE_FINAL,
+            **backend_options
         )
-        print(f"✓ Modèle chargé depuis: {config.MODEL_PATH}")
     else:
-        print(f"⚠ Fichier modèle introuvable: {config.MODEL_PATH}")
-        print("⚠ L'application fonctionnera sans le modèle")
-        model = None
-except Exception as e:
-    print(f"⚠ Erreur lors du chargement du modèle: {e}")
-    print("⚠ L'application continuera sans le modèle")
-    model = None
+        model = load_backend(config.INFERENCE_BACKEND, config.MODEL_PATH, **backend_options)
+
+# Regroupement des prédictions concurrentes en un seul appel au modèle
+def record_batch(images, requests):
+    """Taille de chaque passe avant du micro-batcher (/metrics)"""
+    metrics.observe('malaria_batch_images', images)
+    metrics.observe('malaria_batch_requests', requests)
+
+batcher = None
+if model is not None and config.BATCHING_ENABLED:
+    batcher = MicroBatcher(
+        model.predict,
+        max_batch_size=config.BATCH_MAX_SIZE,
+        max_wait_ms=config.BATCH_MAX_WAIT_MS,
+        on_batch=record_batch
+    )
+
+# Cache des prédictions adressé par le contenu des images
+prediction_cache = None
+if model is not None and config.PREDICTION_CACHE_ENABLED:
+    if config.CASCADE_ENABLED:
+        cache_model_id = cascade_identity(config.CASCADE_MODELS, config.CASCADE_THRESHOLD, config.CASCADE_FINAL)
+    else:
+        cache_model_id = model_identity(config.MODEL_PATH)
+    if config.TTA_ENABLED:
+        cache_model_id = tta_identity(cache_model_id, config.TTA_THRESHOLD, config.TTA_TRANSFORMS)
+    prediction_cache = PredictionCache(
+        config.MODEL_PATH,
+        max_entries=config.PREDICTION_CACHE_SIZE,
+        database=db if config.PREDICTION_CACHE_PERSISTENT else None,
+        model_id=cache_model_id
+    )
+
+# Miniatures renvoyées par URL à la place de l'image complète en base64
+thumbnail_store = None
+if config.PREDICT_IMAGE_ECHO == 'thumbnail':
+    thumbnail_store = ThumbnailStore(
+        config.THUMBNAIL_DIR,
+        max_side=config.THUMBNAIL_MAX_SIDE,
+        quality=config.THUMBNAIL_QUALITY,
+        ttl=config.THUMBNAIL_TTL
+    )
+
+# Images de models/ : variantes pré-générées par build_assets.py
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
+model_assets = AssetManifest(MODELS_DIR, os.path.join(os.path.dirname(os.path.abspath(__file__)), config.MODEL_ASSETS_DIR))
+
+# Écriture différée des prédictions en base
+prediction_writer = None
+if config.DB_WRITE_BEHIND:
+    prediction_writer = PredictionWriter(
+        db,
+        max_queue=config.WRITE_BEHIND_QUEUE_SIZE,
+        batch_size=config.WRITE_BEHIND_BATCH_SIZE,
+        flush_interval=config.WRITE_BEHIND_FLUSH_INTERVAL,
+        max_retries=config.WRITE_BEHIND_MAX_RETRIES
+    )
 
 # Configuration
 IMG_SIZE = (config.IMG_SIZE, config.IMG_SIZE)
@@ -83,102 +165,468 @@ def allowed_file(filename):
         return False
     return filename.rsplit('.', 1)[1].lower() in config.ALLOWED_EXTENSIONS
 
-def preprocess_image(image_path, target_size=IMG_SIZE):
-    """Prétraite l'image pour la prédiction"""
+def preprocess_image(source, target_size=IMG_SIZE):
+    """Prétraite l'image pour la prédiction (octets en mémoire ou chemin sur disque)"""
     try:
-        img = load_img(image_path, target_size=target_size)
-        img_array = img_to_array(img)
-        img_array = img_array / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-        return img_array
+        return preprocessing.preprocess(source, target_size)
     except Exception as e:
         print(f"Erreur preprocessing: {e}")
         return None
 
-def predict_image(image_path):
-    """Effectue la prédiction sur l'image"""
+def format_prediction(probabilities):
+    """Construit le dictionnaire de résultat à partir d'une ligne de probabilités"""
+    predicted_class_idx = int(np.argmax(probabilities))
+    confidence = float(probabilities[predicted_class_idx])
+    predicted_class = CATEGORIES[predicted_class_idx]
+
+    return {
+        'predicted_class': predicted_class,
+        'confidence': confidence,
+        'confidence_percentage': f"{confidence * 100:.2f}%",
+        'all_probabilities': {
+            CATEGORIES[i]: float(probabilities[i])
+            for i in range(len(CATEGORIES))
+        },
+        'class_info': CLASS_INFO[predicted_class]
+    }
+
+def run_model(img_batch):
+    """Passe avant sur un lot (via le micro-batcher s'il est actif)"""
+    if batcher is not None:
+        return batcher.predict(img_batch)
+    return model.predict(img_batch)
+
+def apply_tta(img_batch, predictions, endpoint=None):
+    """
+    Augmentation au test (symétries moyennées) sur les seules images dont la
+    confiance est sous TTA_THRESHOLD. Retourne les probabilités et, par image,
+    ce qui a été fait et le surcoût en millisecondes.
+    """
+    start = time.perf_counter()
+    with stage('tta'):
+        refined, mask = refine_low_confidence(
+            run_model, img_batch, predictions, config.TTA_THRESHOLD, config.TTA_TRANSFORMS
+        )
+    applied = int(mask.sum())
+    extra_ms = (time.perf_counter() - start) * 1000 / applied if applied else 0.0
+    if applied:
+        metrics.inc('malaria_tta_images_total', endpoint or metrics.current_endpoint(), amount=applied)
+
+    return refined, [
+        {
+            'applied': bool(low),
+            'transforms': config.TTA_TRANSFORMS if low else 1,
+            'first_pass_confidence': float(np.max(first)),
+            'extra_ms': round(extra_ms, 2) if low else 0.0,
+            'cached': False
+        }
+        for low, first in zip(mask, predictions)
+    ]
+
+def tta_skipped(probabilities, cached=False):
+    """
+    Champ 'tta' quand l'augmentation n'a pas tourné pour cette requête (TTA
+    désactivé, ou probabilités servies par le cache) : mêmes clés que
+    apply_tta. Depuis le cache, la confiance du premier passage n'est plus
+    connue (les probabilités stockées sont celles après TTA éventuel).
+    """
+    return {
+        'applied': False,
+        'transforms': 1,
+        'first_pass_confidence': None if cached else float(np.max(probabilities)),
+        'extra_ms': 0.0,
+        'cached': cached
+    }
+
+def predict_image(source, image_key=None):
+    """
+    Effectue la prédiction sur l'image (octets ou chemin) ; image_key :
+    empreinte déjà calculée (voir image_key_for), sinon calculée ici
+    """
     if model is None:
         return None, "Modèle non chargé"
 
     try:
-        img_array = preprocess_image(image_path)
+        cache_key = None
+        if prediction_cache is not None:
+            with stage('cache'):
+                cache_key = image_key or prediction_cache.key_for(source)
+                cached = prediction_cache.get(cache_key)
+            if cached is not None:
+                results = format_prediction(cached)
+                results['tta'] = tta_skipped(cached, cached=True)
+                return results, None
+
+        with stage('preprocess'):
+            img_array = preprocess_image(source)
         if img_array is None:
+            metrics.inc('malaria_errors_total', metrics.current_endpoint(), 'preprocess')
             return None, "Erreur lors du prétraitement"
 
-        predictions = model.predict(img_array, verbose=0)
-        predicted_class_idx = np.argmax(predictions[0])
-        confidence = float(predictions[0][predicted_class_idx])
-        predicted_class = CATEGORIES[predicted_class_idx]
-
-        results = {
-            'predicted_class': predicted_class,
-            'confidence': confidence,
-            'confidence_percentage': f"{confidence * 100:.2f}%",
-            'all_probabilities': {
-                CATEGORIES[i]: float(predictions[0][i])
-                for i in range(len(CATEGORIES))
-            },
-            'class_info': CLASS_INFO[predicted_class]
-        }
+        with stage('inference'):
+            predictions = run_model(img_array)
+        tta_info = None
+        if config.TTA_ENABLED:
+            predictions, tta_info = apply_tta(img_array, predictions)
+        if cache_key is not None:
+            prediction_cache.put(cache_key, predictions[0])
 
+        results = format_prediction(predictions[0])
+        results['tta'] = tta_info[0] if tta_info is not None else tta_skipped(predictions[0])
         return results, None
 
     except Exception as e:
+        metrics.inc('malaria_errors_total', metrics.current_endpoint(), 'inference')
         return None, f"Erreur lors de la prédiction: {str(e)}"
 
-def image_to_base64(image_path):
-    """Convertit une image en base64 pour l'affichage"""
+def save_prediction_result(user_id, filename, results):
+    """Enregistre la prédiction en base (en différé si possible, sinon directement)"""
+    with stage('db'):
+        saved_later = prediction_writer is not None and prediction_writer.submit(
+            user_id, filename, results['predicted_class'], results['confidence']
+        )
+        if not saved_later:
+            saved = db.save_prediction(
+                user_id=user_id,
+                filename=filename,
+                predicted_class=results['predicted_class'],
+                confidence=results['confidence']
+            )
+            if saved is None:
+                metrics.inc('malaria_errors_total', metrics.current_endpoint() or 'predict_job', 'db')
+
+def analyze_slide_source(source):
+    """Analyse d'un frottis complet : segmentation, classification par lots, parasitémie"""
+    if model is None:
+        return None, "Modèle non chargé"
+
+    try:
+        with stage('decode'):
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                image = decode_image(source)
+            else:
+                image = read_image(source)
+    except Exception as e:
+        metrics.inc('malaria_errors_total', metrics.current_endpoint() or 'predict_job', 'preprocess')
+        return None, f"Erreur lors du décodage: {e}"
+
+    try:
+        # Lots déjà volumineux : appel direct au modèle, sans le micro-batcher
+        with stage('slide'):
+            results = analyze_slide(
+                image, model.predict, IMG_SIZE,
+                tile_size=config.SLIDE_TILE_SIZE,
+                batch_size=config.SLIDE_BATCH_SIZE,
+                cell_diameter=config.SLIDE_CELL_DIAMETER or None,
+                categories=CATEGORIES
+            )
+        return results, None
+    except Exception as e:
+        metrics.inc('malaria_errors_total', metrics.current_endpoint() or 'predict_job', 'inference')
+        return None, f"Erreur lors de l'analyse du frottis: {e}"
+
+def run_prediction_job(payload):
+    """Prédiction exécutée par la file de jobs (hors requête HTTP)"""
+    source = payload['source']
+    try:
+        if payload.get('mode') == 'slide':
+            return analyze_slide_source(source)
+
+        reference = payload.get('thumbnail')
+        results, error = predict_image(source, reference['key'] if reference else None)
+        if error:
+            return None, error
+        save_prediction_result(payload['user_id'], payload['filename'], results)
+        # Jamais d'image en base64 dans l'état du job : miniature par URL si demandée
+        if reference and thumbnail_store.put(reference['key'], source):
+            results['thumbnail_url'] = reference['url']
+        return results, None
+    finally:
+        if isinstance(source, str) and os.path.exists(source):
+            try:
+                os.remove(source)
+            except OSError as e:
+                print(f"Erreur lors de la suppression du fichier: {e}")
+
+def image_echo_mode():
+    """
+    Image renvoyée avec le résultat : réglage PREDICT_IMAGE_ECHO, ou 'none'
+    si le client affiche déjà l'image localement (?image=none)
+    """
+    if request.values.get('image', '').lower() == 'none':
+        return 'none'
+    return config.PREDICT_IMAGE_ECHO
+
+def image_key_for(source, echo_mode):
+    """
+    Empreinte SHA-256 de l'image, calculée une seule fois par requête : clé
+    du cache des prédictions et nom de la miniature (None si aucun des deux)
+    """
+    if prediction_cache is None and echo_mode != 'thumbnail':
+        return None
+    with stage('hash'):
+        return PredictionCache.key_for(source)
+
+def thumbnail_reference(key):
+    """Clé (empreinte de l'image) et URL de sa miniature"""
+    return {'key': key, 'url': url_for('thumbnail', key=key)}
+
+def job_links(job_id):
+    """URL de suivi d'un job : polling, et server-sent events seulement si JOB_EVENTS_ENABLED"""
+    links = {'status_url': url_for('job_status', job_id=job_id)}
+    if config.JOB_EVENTS_ENABLED:
+        links['events_url'] = url_for('job_events', job_id=job_id)
+    return links
+
+def wants_async(file=None):
+    """
+    Le client demande le mode asynchrone (?async=1 ou champ de formulaire async).
+    Pour une image seule (`file`), le job n'est créé qu'au-delà de
+    ASYNC_MIN_UPLOAD_SIZE : une petite image est plus vite prédite
+    directement qu'en passant par la file et le polling.
+    """
+    if job_queue is None or request.values.get('async', '').lower() not in ('1', 'true', 'yes'):
+        return False
+    return file is None or upload_size(file) > config.ASYNC_MIN_UPLOAD_SIZE
+
+def collect_batch_uploads(files):
+    """
+    Retourne la liste (nom, octets) des images envoyées.
+    Les archives .zip sont décompressées en mémoire.
+    """
+    uploads = []
+    rejected = []
+    total_size = 0
+
+    def add(name, data):
+        nonlocal total_size
+        total_size += len(data)
+        metrics.observe('malaria_upload_size_bytes', len(data), metrics.current_endpoint())
+        if len(uploads) >= config.BATCH_MAX_FILES:
+            raise ValueError(f"Trop d'images (maximum {config.BATCH_MAX_FILES})")
+        if total_size > config.BATCH_MAX_UNZIPPED_SIZE:
+            raise ValueError("Archive trop volumineuse une fois décompressée")
+        uploads.append((name, data))
+
+    for file in files:
+        if not file or file.filename == '':
+            continue
+
+        if file.filename.lower().endswith('.zip'):
+            with zipfile.ZipFile(file.stream) as archive:
+                for info in archive.infolist():
+                    if info.is_dir() or info.filename.startswith('__MACOSX/'):
+                        continue
+                    if not allowed_file(info.filename):
+                        rejected.append(os.path.basename(info.filename))
+                        continue
+                    if total_size + info.file_size > config.BATCH_MAX_UNZIPPED_SIZE:
+                        raise ValueError("Archive trop volumineuse une fois décompressée")
+                    add(secure_filename(os.path.basename(info.filename)), archive.read(info))
+        elif allowed_file(file.filename):
+            add(secure_filename(file.filename), file.read())
+        else:
+            rejected.append(file.filename)
+
+    return uploads, rejected
+
+def preprocess_batch(uploads, target_size=IMG_SIZE):
+    """
+    Prétraite toutes les images en un seul tableau (n, H, W, 3).
+    Retourne le lot, les index des images valides et les erreurs par index.
+    """
+    batch, valid_indices, errors = preprocessing.preprocess_batch([data for _, data in uploads], target_size)
+    errors = {i: f"Erreur lors du prétraitement: {e}" for i, e in errors.items()}
+    return batch, valid_indices, errors
+
+def image_to_base64(source):
+    """Convertit une image (octets ou chemin) en base64 pour l'affichage"""
     try:
-        with open(image_path, "rb") as img_file:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return base64.b64encode(source).decode('utf-8')
+        with open(source, "rb") as img_file:
             return base64.b64encode(img_file.read()).decode('utf-8')
     except Exception as e:
         print(f"Erreur conversion base64: {e}")
         return None
 
+def upload_size(file):
+    """Taille du fichier envoyé, sans le lire"""
+    stream = file.stream
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(position)
+    return size
+
+def should_spool_to_disk(file):
+    """Ancien comportement (écriture dans UPLOAD_FOLDER) si désactivé ou fichier très volumineux"""
+    if not config.UPLOAD_IN_MEMORY:
+        return True
+    return upload_size(file) > config.UPLOAD_SPOOL_THRESHOLD
+
+# Données d'évaluation de secours (avant le premier entraînement)
+DEFAULT_METRICS = [
+    {'model': 'model_A', 'val_accuracy': 0.95, 'val_loss': 0.15},
+    {'model': 'model_B', 'val_accuracy': 0.96, 'val_loss': 0.12},
+    {'model': 'model_C', 'val_accuracy': 0.97, 'val_loss': 0.10}
+]
+DEFAULT_TRAINING_HISTORY = {
+    'model_A': {
+        'accuracy': [0.75, 0.80, 0.83, 0.85, 0.87, 0.88, 0.89, 0.90, 0.91, 0.92],
+        'val_accuracy': [0.73, 0.78, 0.81, 0.83, 0.85, 0.86, 0.87, 0.88, 0.89, 0.90],
+        'loss': [0.50, 0.45, 0.40, 0.35, 0.30, 0.27, 0.24, 0.22, 0.20, 0.18],
+        'val_loss': [0.52, 0.47, 0.42, 0.37, 0.32, 0.29, 0.26, 0.24, 0.22, 0.20]
+    },
+    'model_B': {
+        'accuracy': [0.78, 0.82, 0.85, 0.87, 0.89, 0.90, 0.91, 0.92, 0.93, 0.94],
+        'val_accuracy': [0.76, 0.80, 0.83, 0.85, 0.87, 0.88, 0.89, 0.90, 0.91, 0.92],
+        'loss': [0.48, 0.42, 0.38, 0.33, 0.28, 0.25, 0.22, 0.20, 0.18, 0.16],
+        'val_loss': [0.50, 0.44, 0.40, 0.35, 0.30, 0.27, 0.24, 0.22, 0.20, 0.18]
+    },
+    'model_C': {
+        'accuracy': [0.76, 0.81, 0.84, 0.86, 0.88, 0.89, 0.90, 0.91, 0.92, 0.93],
+        'val_accuracy': [0.74, 0.79, 0.82, 0.84, 0.86, 0.87, 0.88, 0.89, 0.90, 0.91],
+        'loss': [0.49, 0.43, 0.39, 0.34, 0.29, 0.26, 0.23, 0.21, 0.19, 0.17],
+        'val_loss': [0.51, 0.45, 0.41, 0.36, 0.31, 0.28, 0.25, 0.23, 0.21, 0.19]
+    }
+}
+
+EVALUATION_FILES = {
+    'metrics': os.path.join('models', 'metrics_comparison.csv'),
+    'history': os.path.join('models', 'training_history.json'),
+    'summary': os.path.join('models', 'final_summary.csv'),
+    'confusion_matrix': os.path.join('models', 'confusion_matrix_best.png')
+}
+
+# Contexte de /evaluation, reconstruit seulement si un fichier a changé
+_evaluation_cache = {'signature': None, 'context': None}
+_evaluation_lock = threading.Lock()
+
+def evaluation_signature():
+    """(mtime, taille) de chaque fichier produit par l'entraînement"""
+    signature = []
+    for path in EVALUATION_FILES.values():
+        try:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((path, None, None))
+    return tuple(signature)
+
+def read_metrics(path):
+    """Lignes de metrics_comparison.csv (colonnes numériques converties en float)"""
+    if not os.path.exists(path):
+        return DEFAULT_METRICS
+    rows = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            for key, value in row.items():
+                if key != 'model' and value not in (None, ''):
+                    row[key] = float(value)
+            rows.append(row)
+    return rows
+
+def read_final_summary(path):
+    """Métriques de test du meilleur modèle (final_summary.csv : Metric,Value)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline='') as f:
+        return {row['Metric']: row['Value'] for row in csv.DictReader(f)}
+
+def format_metric(value):
+    if value in (None, ''):
+        return 'N/A'
+    return f"{float(value):.3f}"
+
 def load_evaluation_data():
     """Charge les données d'évaluation depuis les fichiers générés par l'entraînement"""
     try:
-        metrics_path = 'models/metrics_comparison.csv'
-        if os.path.exists(metrics_path):
-            metrics_df = pd.read_csv(metrics_path)
-        else:
-            metrics_df = pd.DataFrame({
-                'model': ['model_A', 'model_B', 'model_C'],
-                'val_accuracy': [0.95, 0.96, 0.97],
-                'val_loss': [0.15, 0.12, 0.10]
-            })
-        
-        history_path = 'models/training_history.json'
+        metrics = read_metrics(EVALUATION_FILES['metrics'])
+
+        history_path = EVALUATION_FILES['history']
         if os.path.exists(history_path):
             with open(history_path, 'r') as f:
                 training_history = json.load(f)
         else:
-            training_history = {
-                'model_A': {
-                    'accuracy': [0.75, 0.80, 0.83, 0.85, 0.87, 0.88, 0.89, 0.90, 0.91, 0.92],
-                    'val_accuracy': [0.73, 0.78, 0.81, 0.83, 0.85, 0.86, 0.87, 0.88, 0.89, 0.90],
-                    'loss': [0.50, 0.45, 0.40, 0.35, 0.30, 0.27, 0.24, 0.22, 0.20, 0.18],
-                    'val_loss': [0.52, 0.47, 0.42, 0.37, 0.32, 0.29, 0.26, 0.24, 0.22, 0.20]
-                },
-                'model_B': {
-                    'accuracy': [0.78, 0.82, 0.85, 0.87, 0.89, 0.90, 0.91, 0.92, 0.93, 0.94],
-                    'val_accuracy': [0.76, 0.80, 0.83, 0.85, 0.87, 0.88, 0.89, 0.90, 0.91, 0.92],
-                    'loss': [0.48, 0.42, 0.38, 0.33, 0.28, 0.25, 0.22, 0.20, 0.18, 0.16],
-                    'val_loss': [0.50, 0.44, 0.40, 0.35, 0.30, 0.27, 0.24, 0.22, 0.20, 0.18]
-                },
-                'model_C': {
-                    'accuracy': [0.76, 0.81, 0.84, 0.86, 0.88, 0.89, 0.90, 0.91, 0.92, 0.93],
-                    'val_accuracy': [0.74, 0.79, 0.82, 0.84, 0.86, 0.87, 0.88, 0.89, 0.90, 0.91],
-                    'loss': [0.49, 0.43, 0.39, 0.34, 0.29, 0.26, 0.23, 0.21, 0.19, 0.17],
-                    'val_loss': [0.51, 0.45, 0.41, 0.36, 0.31, 0.28, 0.25, 0.23, 0.21, 0.19]
-                }
-            }
-        
-        return metrics_df, training_history
-    
+            training_history = DEFAULT_TRAINING_HISTORY
+
+        return metrics, training_history, read_final_summary(EVALUATION_FILES['summary'])
+
     except Exception as e:
         print(f"Erreur lors du chargement des données d'évaluation: {e}")
-        return None, None
+        return None, None, None
+
+def build_evaluation_context():
+    """Assemble le contexte du template evaluation.html (None si indisponible)"""
+    metrics, training_history, summary = load_evaluation_data()
+    if not metrics:
+        return None
+
+    best_model_name = max(metrics, key=lambda row: row['val_accuracy'])['model']
+
+    # Précision / rappel / F1 : colonnes par modèle si présentes, sinon
+    # final_summary.csv pour le meilleur modèle (ensemble de test)
+    summary_metrics = {}
+    if summary.get('Best Model'):
+        summary_metrics[summary['Best Model']] = {
+            'precision': summary.get('Precision'),
+            'recall': summary.get('Sensitivity'),
+            'f1_score': summary.get('F1-Score')
+        }
+
+    metrics_display = []
+    detailed_metrics = []
+    for row in metrics:
+        best = row['model'] == best_model_name
+        fallback = summary_metrics.get(row['model'], {})
+        metrics_display.append({
+            'name': row['model'],
+            'value': f"{row['val_accuracy']:.3f}",
+            'best': best
+        })
+        detailed_metrics.append({
+            'name': row['model'],
+            'accuracy': f"{row['val_accuracy']:.3f}",
+            'loss': f"{row['val_loss']:.3f}",
+            'precision': format_metric(row.get('precision', fallback.get('precision'))),
+            'recall': format_metric(row.get('recall', fallback.get('recall'))),
+            'f1_score': format_metric(row.get('f1_score', fallback.get('f1_score'))),
+            'best': best
+        })
+
+    model_names = [row['model'] for row in metrics]
+
+    training_data = []
+    for model_name in model_names:
+        if model_name in training_history:
+            hist = training_history[model_name]
+            training_data.append({
+                'name': model_name,
+                'train_acc': hist['accuracy'],
+                'val_acc': hist['val_accuracy'],
+                'epochs': len(hist['accuracy'])
+            })
+
+    return {
+        'metrics': metrics_display,
+        'model_names': model_names,
+        'accuracies': [row['val_accuracy'] for row in metrics],
+        'losses': [row['val_loss'] for row in metrics],
+        'training_data': training_data,
+        'detailed_metrics': detailed_metrics,
+        'best_model_name': best_model_name,
+        'confusion_matrix_exists': os.path.exists(EVALUATION_FILES['confusion_matrix'])
+    }
+
+def get_evaluation_context():
+    """Contexte de /evaluation mis en cache par processus, invalidé par mtime/taille"""
+    signature = evaluation_signature()
+    with _evaluation_lock:
+        if _evaluation_cache['signature'] != signature or _evaluation_cache['context'] is None:
+            _evaluation_cache['context'] = build_evaluation_context()
+            _evaluation_cache['signature'] = signature
+        return _evaluation_cache['context']
 
 # ✅ Route favicon corrigée (suppression du doublon)
 @app.route('/favicon.ico')
@@ -193,14 +641,28 @@ def favicon():
         )
     return '', 204
 
+# Prédictions asynchrones : file de jobs locale au worker, état partagé sur disque
+job_queue = None
+if model is not None and config.ASYNC_JOBS_ENABLED:
+    job_queue = JobQueue(
+        run_prediction_job,
+        config.JOB_DIR,
+        workers=config.JOB_WORKERS,
+        max_pending=config.JOB_QUEUE_SIZE,
+        ttl=config.JOB_TTL
+    )
+
 @app.route('/')
 @login_required
 def index():
     """Page d'accueil"""
-    predictions_history = db.get_user_predictions(session['user_id'], limit=5)
-    return render_template('index.html', 
-                         username=session.get('username'),
-                         predictions_history=predictions_history)
+    with stage('db'):
+        predictions_history = db.get_user_predictions(session['user_id'], limit=5)
+    with stage('render'):
+        return render_template('index.html', 
+                             username=session.get('username'),
+                             predictions_history=predictions_history,
+                             async_jobs=job_queue is not None)
 
 @app.route('/predict', methods=['POST'])
 @login_required
@@ -218,33 +680,70 @@ def predict():
         return jsonify({'error': 'Format de fichier non autorisé. Utilisez PNG, JPG ou JPEG'}), 400
 
     filepath = None
+    async_mode = wants_async(file)
+    echo_mode = image_echo_mode()
     try:
-        # Sauvegarder le fichier
         filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+
+        metrics.observe('malaria_upload_size_bytes', upload_size(file), 'predict')
+        with stage('upload'):
+            if should_spool_to_disk(file):
+                # Sauvegarder le fichier (nom unique : le job le lira après la réponse)
+                stored_name = f"{uuid.uuid4().hex}_{filename}" if async_mode else filename
+                filepath = os.path.join(app.config['UPLOAD_FOLDER'], stored_name)
+                file.save(filepath)
+                source = filepath
+            else:
+                # Lecture directe du flux de la requête, sans passer par le disque
+                source = file.read()
+
+        # Empreinte partagée par le cache et la miniature ; en mode asynchrone,
+        # laissée au job sauf pour annoncer l'URL de la miniature
+        image_key = None
+        if not async_mode or echo_mode == 'thumbnail':
+            image_key = image_key_for(source, echo_mode)
+
+        if async_mode:
+            # Décodage et inférence dans la file de jobs : le worker HTTP est libéré
+            job_id = job_queue.submit(session['user_id'], {
+                'user_id': session['user_id'],
+                'filename': filename,
+                'source': source,
+                'thumbnail': thumbnail_reference(image_key) if echo_mode == 'thumbnail' else None
+            })
+            if job_id is None:
+                metrics.inc('malaria_errors_total', 'predict', 'queue_full')
+                return jsonify({'error': "File d'attente pleine, réessayez dans quelques instants"}), 503
+            # Le fichier éventuel appartient désormais au job
+            filepath = None
+            return jsonify({
+                'job_id': job_id,
+                'status': 'queued',
+                **job_links(job_id)
+            }), 202
 
         # Faire la prédiction
-        results, error = predict_image(filepath)
+        results, error = predict_image(source, image_key)
 
         if error:
             return jsonify({'error': error}), 500
 
         # Sauvegarder la prédiction dans la base de données
-        db.save_prediction(
-            user_id=session['user_id'],
-            filename=filename,
-            predicted_class=results['predicted_class'],
-            confidence=results['confidence']
-        )
+        save_prediction_result(session['user_id'], filename, results)
 
-        # Convertir l'image en base64
-        img_base64 = image_to_base64(filepath)
-        results['image'] = img_base64
+        # Image renvoyée au client : miniature par URL, image complète en base64 ou rien
+        with stage('encode'):
+            if echo_mode == 'thumbnail':
+                reference = thumbnail_reference(image_key)
+                if thumbnail_store.put(reference['key'], source):
+                    results['thumbnail_url'] = reference['url']
+            elif echo_mode == 'base64':
+                results['image'] = image_to_base64(source)
 
         return jsonify(results), 200
 
     except Exception as e:
+        metrics.inc('malaria_errors_total', 'predict', 'exception')
         return jsonify({'error': f'Erreur serveur: {str(e)}'}), 500
     
     finally:
@@ -255,75 +754,341 @@ def predict():
             except Exception as e:
                 print(f"Erreur lors de la suppression du fichier: {e}")
 
+@app.route('/thumbnails/<key>.jpg')
+@login_required
+def thumbnail(key):
+    """Miniature d'une image analysée (URL de courte durée, mise en cache par le navigateur)"""
+    found = thumbnail_store.lookup(key) if thumbnail_store is not None else None
+    if found is None:
+        return jsonify({'error': 'Miniature introuvable ou expirée'}), 404
+
+    path, remaining = found
+    # Contenu adressé par l'empreinte : la clé sert d'ETag (304 si If-None-Match correspond)
+    response = send_file(path, mimetype='image/jpeg', etag=key, conditional=True, max_age=remaining)
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
+
+@app.route('/predict/batch', methods=['POST'])
+@login_required
+def predict_batch():
+    """Prédiction sur plusieurs images (fichiers multiples ou archive .zip), résultats en NDJSON"""
+    if model is None:
+        return jsonify({'error': 'Modèle non chargé'}), 500
+
+    files = request.files.getlist('files') + request.files.getlist('file')
+    if not files:
+        return jsonify({'error': 'Aucun fichier trouvé'}), 400
+
+    try:
+        with stage('upload'):
+            uploads, rejected = collect_batch_uploads(files)
+    except (ValueError, zipfile.BadZipFile) as e:
+        return jsonify({'error': str(e)}), 400
+
+    if not uploads:
+        return jsonify({'error': 'Aucune image valide. Utilisez PNG, JPG, JPEG ou une archive ZIP'}), 400
+
+    # Images déjà connues : servies depuis le cache, sans décodage ni inférence
+    cache_keys = {}
+    cached = {}
+    to_compute = list(range(len(uploads)))
+    if prediction_cache is not None:
+        with stage('cache'):
+            cache_keys = {i: prediction_cache.key_for(data) for i, (_, data) in enumerate(uploads)}
+            found = prediction_cache.get_many(cache_keys.values())
+        cached = {i: found[key] for i, key in cache_keys.items() if key in found}
+        to_compute = [i for i in to_compute if i not in cached]
+
+    with stage('preprocess'):
+        batch, valid_positions, preprocess_errors = preprocess_batch([uploads[i] for i in to_compute])
+    valid_indices = [to_compute[k] for k in valid_positions]
+    errors = {to_compute[k]: error for k, error in preprocess_errors.items()}
+    if errors:
+        metrics.inc('malaria_errors_total', 'predict_batch', 'preprocess', amount=len(errors))
+    user_id = session['user_id']
+    chunk_size = config.BATCH_MAX_SIZE
+
+    def generate():
+        for i, error in errors.items():
+            yield json.dumps({'index': i, 'filename': uploads[i][0], 'error': error}) + '\n'
+
+        # Un INSERT multi-lignes par lot, avant d'envoyer ses lignes : ce qui a
+        # été calculé reste enregistré si le client coupe le flux en cours de route
+        predicted = 0
+        saved_all = True
+
+        def save_chunk(rows):
+            nonlocal predicted, saved_all
+            if not rows:
+                return
+            predicted += len(rows)
+            if db.save_predictions_batch(user_id, rows) is None:
+                saved_all = False
+                metrics.inc('malaria_errors_total', 'predict_batch', 'db')
+
+        cached_rows = []
+        for i, probabilities in cached.items():
+            results = format_prediction(probabilities)
+            results['tta'] = tta_skipped(probabilities, cached=True)
+            results['index'] = i
+            results['filename'] = uploads[i][0]
+            cached_rows.append(results)
+        save_chunk(cached_rows)
+        for results in cached_rows:
+            yield json.dumps(results) + '\n'
+
+        tta_applied = 0
+        for start in range(0, len(valid_indices), chunk_size):
+            tta_info = None
+            try:
+                predictions = run_model(batch[start:start + chunk_size])
+                if config.TTA_ENABLED:
+                    predictions, tta_info = apply_tta(batch[start:start + chunk_size], predictions,
+                                                      endpoint='predict_batch')
+                    tta_applied += sum(info['applied'] for info in tta_info)
+            except Exception as e:
+                metrics.inc('malaria_errors_total', 'predict_batch', 'inference',
+                            amount=len(valid_indices[start:start + chunk_size]))
+                for i in valid_indices[start:start + chunk_size]:
+                    yield json.dumps({'index': i, 'filename': uploads[i][0],
+                                      'error': f"Erreur lors de la prédiction: {e}"}) + '\n'
+                continue
+
+            chunk_rows = []
+            for k, (i, probabilities) in enumerate(zip(valid_indices[start:start + chunk_size], predictions)):
+                if prediction_cache is not None:
+                    prediction_cache.put(cache_keys[i], probabilities)
+                results = format_prediction(probabilities)
+                results['tta'] = tta_info[k] if tta_info is not None else tta_skipped(probabilities)
+                results['index'] = i
+                results['filename'] = uploads[i][0]
+                chunk_rows.append(results)
+            save_chunk(chunk_rows)
+            for results in chunk_rows:
+                yield json.dumps(results) + '\n'
+
+        yield json.dumps({'summary': {
+            'total': len(uploads),
+            'predicted': predicted,
+            'errors': len(uploads) - predicted,
+            'rejected': rejected,
+            'saved': saved_all,
+            'tta_applied': tta_applied if config.TTA_ENABLED else None
+        }}) + '\n'
+
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    """État d'une prédiction asynchrone (polling)"""
+    job = job_queue.get(job_id, owner=session['user_id']) if job_queue is not None else None
+    if job is None:
+        return jsonify({'error': 'Job introuvable'}), 404
+    return jsonify(job), 200
+
+@app.route('/jobs/<job_id>/events')
+@login_required
+def job_events(job_id):
+    """Suivi d'une prédiction asynchrone en server-sent events (un message par changement d'état)"""
+    owner = session['user_id']
+    # Un flux ouvert occupe un worker : désactivé sauf workers threadés/async
+    if not config.JOB_EVENTS_ENABLED or job_queue is None or job_queue.get(job_id, owner=owner) is None:
+        return jsonify({'error': 'Job introuvable'}), 404
+
+    def generate():
+        status = None
+        deadline = time.monotonic() + config.JOB_EVENTS_TIMEOUT
+        while time.monotonic() < deadline:
+            job = job_queue.wait(job_id, status, owner=owner)
+            if job is None:
+                yield f"data: {json.dumps({'status': 'error', 'error': 'Job introuvable'})}\n\n"
+                return
+            if job['status'] == status:
+                # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                yield ": keep-alive\n\n"
+                continue
+            status = job['status']
+            yield f"data: {json.dumps(job)}\n\n"
+            if status in JobQueue.FINAL_STATUSES:
+                return
+        # Le client repasse en polling sur status_url
+        yield f"event: timeout\ndata: {json.dumps({'status': status})}\n\n"
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/predict/slide', methods=['POST'])
+@login_required
+def predict_slide():
+    """Frottis complet : boîtes et classes par cellule, parasitémie (async possible)"""
+    if 'file' not in request.files:
+        return jsonify({'error': 'Aucun fichier trouvé'}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({'error': 'Aucun fichier sélectionné'}), 400
+    if not allowed_file(file.filename):
+        return jsonify({'error': 'Format de fichier non autorisé. Utilisez PNG, JPG ou JPEG'}), 400
+
+    metrics.observe('malaria_upload_size_bytes', upload_size(file), 'predict_slide')
+    with stage('upload'):
+        source = file.read()
+
+    # Dimensions lues dans l'en-tête : un PNG de quelques Mo peut se décoder
+    # en plusieurs gigapixels (segmentation et tuilage en mémoire)
+    try:
+        width, height = image_size(source)
+    except Image.DecompressionBombError:
+        width = height = None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if width is None or width * height > config.SLIDE_MAX_PIXELS:
+        metrics.inc('malaria_errors_total', 'predict_slide', 'too_large')
+        return jsonify({'error': f"Image trop grande (maximum {config.SLIDE_MAX_PIXELS} pixels)"}), 413
+
+    if wants_async():
+        job_id = job_queue.submit(session['user_id'], {
+            'mode': 'slide',
+            'user_id': session['user_id'],
+            'filename': secure_filename(file.filename),
+            'source': source
+        })
+        if job_id is None:
+            metrics.inc('malaria_errors_total', 'predict_slide', 'queue_full')
+            return jsonify({'error': "File d'attente pleine, réessayez dans quelques instants"}), 503
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            **job_links(job_id)
+        }), 202
+
+    results, error = analyze_slide_source(source)
+    if error:
+        return jsonify({'error': error}), 500
+    return jsonify(results), 200
+
 @app.route('/evaluation')
 @login_required
 def evaluation():
     """Page d'évaluation des modèles"""
-    metrics_df, training_history = load_evaluation_data()
+    with stage('evaluation_data'):
+        context = get_evaluation_context()
     
-    if metrics_df is None:
+    if context is None:
         return "Données d'évaluation non disponibles", 500
     
-    best_model_idx = metrics_df['val_accuracy'].idxmax()
-    best_model_name = metrics_df.loc[best_model_idx, 'model']
-    
-    metrics_display = []
-    for _, row in metrics_df.iterrows():
-        metrics_display.append({
-            'name': row['model'],
-            'value': f"{row['val_accuracy']:.3f}",
-            'best': row['model'] == best_model_name
-        })
-    
-    model_names = metrics_df['model'].tolist()
-    accuracies = metrics_df['val_accuracy'].tolist()
-    losses = metrics_df['val_loss'].tolist()
-    
-    training_data = []
-    for model_name in model_names:
-        if model_name in training_history:
-            hist = training_history[model_name]
-            training_data.append({
-                'name': model_name,
-                'train_acc': hist['accuracy'],
-                'val_acc': hist['val_accuracy'],
-                'epochs': len(hist['accuracy'])
-            })
-    
-    detailed_metrics = []
-    for _, row in metrics_df.iterrows():
-        detailed_metrics.append({
-            'name': row['model'],
-            'accuracy': f"{row['val_accuracy']:.3f}",
-            'loss': f"{row['val_loss']:.3f}",
-            'precision': "0.950",
-            'recall': "0.940",
-            'f1_score': "0.945",
-            'best': row['model'] == best_model_name
-        })
-        
-    confusion_matrix_path = os.path.join('models', 'confusion_matrix_best.png')
-    confusion_matrix_exists = os.path.exists(confusion_matrix_path)
-    
-    return render_template('evaluation.html',
-                         username=session.get('username'),
-                         metrics=metrics_display,
-                         model_names=model_names,
-                         accuracies=accuracies,
-                         losses=losses,
-                         training_data=training_data,
-                         detailed_metrics=detailed_metrics,
-                         best_model_name=best_model_name,
-                         confusion_matrix_exists=confusion_matrix_exists)
+    with stage('render'):
+        return render_template('evaluation.html', username=session.get('username'), **context)
 
 @app.route('/history')
 @login_required
 def history():
-    """Page d'historique des prédictions"""
-    predictions = db.get_user_predictions(session['user_id'], limit=20)
-    return render_template('history.html',
-                         username=session.get('username'),
-                         predictions=predictions)
+    """Page d'historique des prédictions (pagination par curseur)"""
+    cursor = request.args.get('cursor')
+    with stage('db'):
+        predictions, next_cursor = db.get_user_predictions_page(
+            session['user_id'], limit=config.HISTORY_PAGE_SIZE, cursor=cursor
+        )
+    with stage('render'):
+        return render_template('history.html',
+                             username=session.get('username'),
+                             predictions=predictions,
+                             next_cursor=next_cursor,
+                             is_first_page=not cursor)
+
+@app.route('/api/history')
+@login_required
+def history_api():
+    """Historique en JSON pour le défilement infini"""
+    try:
+        limit = min(max(int(request.args.get('limit', config.HISTORY_PAGE_SIZE)), 1), 100)
+    except ValueError:
+        return jsonify({'error': 'Paramètre limit invalide'}), 400
+
+    predictions, next_cursor = db.get_user_predictions_page(
+        session['user_id'], limit=limit, cursor=request.args.get('cursor')
+    )
+    return jsonify({
+        'predictions': [
+            {
+                'id': p['id'],
+                'filename': p['filename'],
+                'predicted_class': p['predicted_class'],
+                'confidence': float(p['confidence']),
+                'created_at': p['created_at'].isoformat()
+            }
+            for p in predictions
+        ],
+        'next_cursor': next_cursor
+    }), 200
+
+@app.route('/api/stats')
+@login_required
+def stats_api():
+    """Statistiques de l'utilisateur (tables d'agrégats, coût constant)"""
+    try:
+        days = min(max(int(request.args.get('days', 30)), 1), 366)
+    except ValueError:
+        return jsonify({'error': 'Paramètre days invalide'}), 400
+
+    with stage('db'):
+        stats = db.get_user_stats(session['user_id'], days=days)
+    if stats is None:
+        return jsonify({'error': 'Statistiques indisponibles'}), 500
+    stats['days'] = days
+    return jsonify(stats), 200
+
+@app.route('/export/predictions.<fmt>')
+@login_required
+def export_predictions(fmt):
+    """
+    Export complet de l'historique en CSV ou NDJSON, diffusé lot par lot
+    (curseur côté serveur). Filtres : start, end (AAAA-MM-JJ ou ISO), class.
+    scope=all ou user_id=<id> : réservé aux utilisateurs de EXPORT_ADMINS.
+    """
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"Format inconnu. Utilisez {', '.join(EXPORT_FORMATS)}"}), 404
+
+    try:
+        start = parse_date(request.args.get('start'))
+        end = parse_date(request.args.get('end'), end=True)
+    except ValueError:
+        return jsonify({'error': 'Paramètre start ou end invalide (AAAA-MM-JJ)'}), 400
+
+    predicted_class = request.args.get('class') or None
+    if predicted_class is not None and predicted_class not in CATEGORIES:
+        return jsonify({'error': f"Classe inconnue. Utilisez {', '.join(CATEGORIES)}"}), 400
+
+    user_id = session['user_id']
+    scope = session.get('username')
+    if request.args.get('scope') == 'all' or request.args.get('user_id'):
+        if session.get('username') not in config.EXPORT_ADMINS:
+            return jsonify({'error': 'Export réservé aux administrateurs'}), 403
+        try:
+            user_id = int(request.args['user_id']) if request.args.get('user_id') else None
+        except ValueError:
+            return jsonify({'error': 'Paramètre user_id invalide'}), 400
+        scope = f"user{user_id}" if user_id is not None else 'all'
+
+    # Vérification avant l'envoi des en-têtes ; la connexion de l'export n'est
+    # empruntée qu'au premier lot (rien n'est gardé pour HEAD ou un client parti)
+    if not db.ping():
+        return jsonify({'error': 'Base de données indisponible'}), 503
+
+    chunks = db.stream_predictions(user_id=user_id, start=start, end=end,
+                                   predicted_class=predicted_class, chunk_size=config.EXPORT_CHUNK_SIZE)
+    filename = secure_filename(f"predictions_{scope}_{datetime.now():%Y%m%d_%H%M%S}.{fmt}")
+    # Pas de stream_with_context : le générateur n'utilise ni request ni session
+    return Response(encode_chunks(chunks, fmt), mimetype=EXPORT_FORMATS[fmt],
+                    headers={
+                        'Content-Disposition': f'attachment; filename="{filename}"',
+                        'Cache-Control': 'no-store',
+                        'X-Accel-Buffering': 'no'
+                    })
 
 @app.route('/about')
 @login_required
@@ -335,21 +1100,68 @@ def about():
 @login_required
 def health():
     """Health check endpoint"""
-    db_status = db.get_connection() is not None
+    db_status = db.ping()
     status = {
         'status': 'healthy',
         'database_connected': db_status,
+        'database_pool': db.pool_stats(),
         'model_loaded': model is not None,
         'model_path': config.MODEL_PATH,
+        'inference_backend': config.INFERENCE_BACKEND,
+        'preprocess_backend': preprocessing.current_backend(),
+        'cascade': model.stats() if isinstance(model, CascadePredictor) else None,
+        'batching': batcher.stats() if batcher is not None else None,
+        'prediction_cache': prediction_cache.stats() if prediction_cache is not None else None,
+        'write_behind': prediction_writer.stats() if prediction_writer is not None else None,
+        'jobs': job_queue.stats() if job_queue is not None else None,
+        'image_echo': config.PREDICT_IMAGE_ECHO,
         'user': session.get('username')
     }
     return jsonify(status), 200
 
+def requested_width():
+    """Largeur d'affichage demandée (?w=, ou indice client Sec-CH-Width / Width)"""
+    for value in (request.args.get('w'), request.headers.get('Sec-CH-Width'), request.headers.get('Width')):
+        try:
+            if value and int(value) > 0:
+                return int(value)
+        except ValueError:
+            continue
+    return None
+
 @app.route('/models/<path:filename>')
 def serve_model_file(filename):
     """Sert les fichiers du dossier models (images, etc.)"""
-    models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
-    return send_from_directory(models_dir, filename)
+    # Variante adressée par son contenu : ne change jamais, mise en cache un an
+    found = model_assets.asset(filename)
+    if found is not None:
+        path, variant = found
+        response = send_file(path, mimetype=variant['mimetype'], etag=variant['sha256'],
+                             conditional=True, max_age=31536000)
+        response.cache_control.immutable = True
+        return response
+
+    # Image source : variante choisie selon Accept et la largeur demandée,
+    # revalidée à chaque visite (304 tant que build_assets.py ne l'a pas changée)
+    # WebP seulement s'il est annoncé explicitement (*/* ne garantit pas son support)
+    webp = any(mimetype == 'image/webp' for mimetype, _ in request.accept_mimetypes)
+    accepted = ['image/webp', 'image/png'] if webp else ['image/png']
+    found = model_assets.select(filename, width=requested_width(), accepted=accepted)
+    if found is not None:
+        path, variant = found
+        response = send_file(path, mimetype=variant['mimetype'], etag=variant['sha256'], conditional=True)
+        response.cache_control.no_cache = True
+        response.vary.update(('Accept', 'Sec-CH-Width', 'Width'))
+        return response
+
+    return send_from_directory(MODELS_DIR, filename)
+
+@app.context_processor
+def model_asset_helpers():
+    """srcset des variantes WebP d'une image de models/ pour les templates"""
+    def model_image_srcset(filename):
+        return model_assets.srcset(filename, lambda f: url_for('serve_model_file', filename=f))
+    return {'model_image_srcset': model_image_srcset}
 
 # Gestionnaires d'erreurs
 @app.errorhandler(413)
@@ -362,6 +1174,7 @@ def not_found(error):
 
 @app.errorhandler(500)
 def internal_error(error):
+    metrics.inc('malaria_errors_total', metrics.current_endpoint(), 'internal')
     return jsonify({'error': 'Erreur interne du serveur'}), 500
 
 if __name__ == '__main__':
@@ -374,7 +1187,7 @@ if __name__ == '__main__':
     print("="*70)
     print(f"Environnement: {config.FLASK_ENV}")
     print(f"Base de données: {'✓ Connectée' if db_success else '✗ Erreur'}")
-    print(f"Modèle: {config.MODEL_PATH}")
+    print(f"Modèle: {', '.join(config.CASCADE_MODELS) if config.CASCADE_ENABLED else config.MODEL_PATH}")
     print(f"Status: {'✓ Chargé' if model else '✗ Non chargé'}")
     print(f"Dossier uploads: {config.UPLOAD_FOLDER}")
     print(f"Formats acceptés: {', '.join(config.ALLOWED_EXTENSIONS)}")
@@ -382,5 +1195,5 @@ if __name__ == '__main__':
 
     #app.run(debug=config.DEBUG, host='0.0.0.0', port=5001)
     
-port = int(os.environ.get("PORT", 5001))
-app.run(host='0.0.0.0', port=port)
\ No newline at end of file
+    port = int(os.environ.get("PORT", 5001))
+    app.run(host='0.0.0.0', port=port)
\ No newline at end of file
@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+
+MANIFEST_FILE = 'manifest.json'
+
+
+class AssetManifest:
+    """
+    Variantes des images de models/ produites par build_assets.py.
+
+    Le manifeste associe chaque image source (ex: 'pixel_statistics.png') à
+    ses variantes redimensionnées et recompressées, nommées par l'empreinte
+    de leur contenu ('assets/pixel_statistics.960.3f2a9c1b7d4e.webp') :
+    une même URL désigne toujours les mêmes octets et peut être mise en
+    cache indéfiniment. Le manifeste est relu quand build_assets.py le
+    réécrit ; sans manifeste, aucune variante n'est proposée.
+    """
+
+    def __init__(self, models_dir, assets_dir):
+        self.models_dir = models_dir
+        self.assets_dir = assets_dir
+        self.prefix = os.path.relpath(assets_dir, models_dir).replace(os.sep, '/') + '/'
+        self._path = os.path.join(assets_dir, MANIFEST_FILE)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._images = {}
+        self._files = {}
+
+    def _load(self):
+        """Recharge le manifeste s'il a changé sur le disque"""
+        try:
+            mtime = os.path.getmtime(self._path)
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            images, files = {}, {}
+            if mtime is not None:
+                try:
+                    with open(self._path) as f:
+                        images = json.load(f).get('images', {})
+                except (OSError, ValueError) as e:
+                    print(f"⚠ Manifeste des images illisible ({self._path}): {e}")
+                    images = {}
+            for entry in images.values():
+                for variant in entry['variants']:
+                    files[self.prefix + variant['file']] = variant
+            self._images, self._files, self._mtime = images, files, mtime
+
+    def asset(self, filename):
+        """Variante adressée par son contenu (chemin relatif à models/), None si inconnue"""
+        self._load()
+        variant = self._files.get(filename)
+        if variant is None:
+            return None
+        return os.path.join(self.assets_dir, variant['file']), variant
+
+    def variants(self, filename, mimetype=None):
+        """Variantes d'une image source, de la plus petite à la plus grande"""
+        self._load()
+        entry = self._images.get(filename)
+        if entry is None:
+            return []
+        return [v for v in entry['variants'] if mimetype is None or v['mimetype'] == mimetype]
+
+    def select(self, filename, width=None, accepted=()):
+        """
+        Variante à servir pour une image source : premier format accepté par
+        le client, plus petite largeur >= `width` (la plus grande sinon).
+        Retourne (chemin, variante) ou None (servir l'original).
+        """
+        for mimetype in accepted:
+            candidates = self.variants(filename, mimetype)
+            if not candidates:
+                continue
+            chosen = candidates[-1]
+            if width:
+                chosen = next((v for v in candidates if v['width'] >= width), chosen)
+            return os.path.join(self.assets_dir, chosen['file']), chosen
+        return None
+
+    def srcset(self, filename, url_for_file, mimetype='image/webp'):
+        """Attribut srcset ('url 480w, url 960w') des variantes d'une image, '' sans variantes"""
+        return ', '.join(f"{url_for_file(self.prefix + v['file'])} {v['width']}w"
+                         for v in self.variants(filename, mimetype))
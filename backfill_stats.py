@@ -0,0 +1,91 @@
+"""
+Recalcule les statistiques par utilisateur (user_prediction_stats,
+user_daily_prediction_stats) à partir de la table predictions.
+
+Les triggers tiennent ces tables à jour à chaque écriture ; ce script sert
+pour les prédictions enregistrées avant leur création, ou pour vérifier
+qu'elles n'ont pas dérivé.
+
+Usage:
+    python backfill_stats.py                 # tous les utilisateurs
+    python backfill_stats.py --user-id 42
+    python backfill_stats.py --check         # compare sans rien écrire
+    python backfill_stats.py --reinstall-triggers   # après modification des triggers
+"""
+import argparse
+
+from psycopg2.extras import RealDictCursor
+
+from database import db
+
+
+def find_drift(user_id=None):
+    """Lignes où les agrégats diffèrent d'un recalcul complet depuis predictions"""
+    conn = db.get_connection()
+    if not conn:
+        raise SystemExit("❌ Impossible de se connecter à la base de données")
+
+    scope = "" if user_id is None else "AND p.user_id = %(user_id)s"
+    try:
+        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(f"""
+                WITH expected AS (
+                    SELECT p.user_id, p.predicted_class, COUNT(*) AS total
+                    FROM predictions p
+                    WHERE p.user_id IS NOT NULL {scope}
+                    GROUP BY p.user_id, p.predicted_class
+                ), stored AS (
+                    SELECT user_id, predicted_class, total
+                    FROM user_prediction_stats p
+                    WHERE total > 0 {scope}
+                )
+                SELECT COALESCE(e.user_id, s.user_id) AS user_id,
+                       COALESCE(e.predicted_class, s.predicted_class) AS predicted_class,
+                       COALESCE(e.total, 0) AS expected, COALESCE(s.total, 0) AS stored
+                FROM expected e
+                FULL JOIN stored s USING (user_id, predicted_class)
+                WHERE COALESCE(e.total, 0) <> COALESCE(s.total, 0)
+                ORDER BY 1, 2
+            """, {'user_id': user_id})
+            return cur.fetchall()
+    finally:
+        db.release_connection(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recalcul des statistiques de prédiction par utilisateur")
+    parser.add_argument('--user-id', type=int, default=None)
+    parser.add_argument('--check', action='store_true', help="Affiche les écarts sans recalculer")
+    parser.add_argument('--reinstall-triggers', action='store_true',
+                        help="Recrée la fonction et les triggers de statistiques (verrouille predictions)")
+    args = parser.parse_args()
+
+    if not db.init_db():
+        raise SystemExit(1)
+
+    if args.reinstall_triggers:
+        created = db.install_prediction_stats_triggers()
+        if created is None:
+            raise SystemExit("❌ Installation des triggers échouée")
+        print(f"✓ {created} trigger(s) de statistiques recréé(s)")
+
+    drift = find_drift(args.user_id)
+    print("\n" + "=" * 60)
+    print(f"{'Utilisateur':<14}{'Classe':<16}{'Attendu':>14}{'Enregistré':>14}")
+    print("-" * 60)
+    for row in drift:
+        print(f"{row['user_id']:<14}{row['predicted_class']:<16}{row['expected']:>14}{row['stored']:>14}")
+    print("=" * 60)
+    print(f"{len(drift)} écart(s)")
+
+    if args.check:
+        raise SystemExit(1 if drift else 0)
+
+    written = db.backfill_prediction_stats(args.user_id)
+    if written is None:
+        raise SystemExit("❌ Recalcul échoué")
+    print(f"✓ {written} ligne(s) d'agrégats recalculée(s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark : prédiction image par image vs micro-lots (MicroBatcher)
+
+Simule N requêtes concurrentes (threads) et mesure le débit ainsi que les
+latences p50/p99 de chaque chemin.
+
+Usage:
+    python benchmark_batching.py --requests 512 --concurrency 16
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+
+import numpy as np
+
+from config import config
+from inference import load_backend, MicroBatcher
+from preprocessing import preprocess_paths
+
+
+def percentile(values, q):
+    """Percentile en millisecondes"""
+    if not values:
+        return 0.0
+    return float(np.percentile(np.asarray(values) * 1000.0, q))
+
+
+def load_sample_images(data_dir, n, img_size):
+    """Charge n cellules de cell_images/ prétraitées comme dans app.preprocess_image"""
+    paths = []
+    for category in ('Parasitized', 'Uninfected'):
+        folder = os.path.join(data_dir, category)
+        if os.path.isdir(folder):
+            paths += [os.path.join(folder, f) for f in os.listdir(folder)
+                      if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+
+    if not paths:
+        print(f"⚠ Aucune image trouvée dans {data_dir}, utilisation d'images aléatoires")
+        rng = np.random.default_rng(42)
+        return [rng.random((1, img_size, img_size, 3), dtype=np.float32) for _ in range(n)]
+
+    random.seed(42)
+    images = []
+    for path in random.sample(paths, min(n, len(paths))):
+        images.append(preprocess_paths([path], (img_size, img_size)))
+    return images
+
+
+def run_load(images, n_requests, concurrency, predict):
+    """Lance n_requests appels à predict répartis sur `concurrency` threads"""
+    latencies = []
+    lock = threading.Lock()
+    counter = iter(range(n_requests))
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            img = images[i % len(images)]
+            t0 = time.perf_counter()
+            predict(img)
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    return {
+        'requests': n_requests,
+        'concurrency': concurrency,
+        'wall_time_s': round(wall, 3),
+        'throughput_rps': round(n_requests / wall, 2),
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p99_ms': round(percentile(latencies, 99), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du micro-batching")
+    parser.add_argument('--model', default=config.MODEL_PATH)
+    parser.add_argument('--backend', default=config.INFERENCE_BACKEND, choices=['keras', 'tflite'])
+    parser.add_argument('--data-dir', default='cell_images')
+    parser.add_argument('--requests', type=int, default=512)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--max-batch-size', type=int, default=config.BATCH_MAX_SIZE)
+    parser.add_argument('--max-wait-ms', type=float, default=config.BATCH_MAX_WAIT_MS)
+    parser.add_argument('--output', help="Fichier JSON de résultats (optionnel)")
+    args = parser.parse_args()
+
+    model = load_backend(args.backend, args.model)
+    if model is None:
+        raise SystemExit(1)
+
+    images = load_sample_images(args.data_dir, min(args.requests, 256), config.IMG_SIZE)
+
+    # Préchauffage (traçage du graphe, allocation des buffers)
+    model.predict(images[0])
+
+    print(f"\n▶ Image par image ({args.requests} requêtes, {args.concurrency} threads)...")
+    single = run_load(images, args.requests, args.concurrency, model.predict)
+
+    batcher = MicroBatcher(model.predict,
+                           max_batch_size=args.max_batch_size,
+                           max_wait_ms=args.max_wait_ms)
+    batcher.predict(images[0])
+
+    print(f"▶ Micro-lots (max {args.max_batch_size} images, {args.max_wait_ms} ms)...")
+    batched = run_load(images, args.requests, args.concurrency, batcher.predict)
+    batched['batcher'] = batcher.stats()
+    batcher.close()
+
+    print("\n" + "=" * 70)
+    print(f"{'Chemin':<20}{'Débit (req/s)':>16}{'p50 (ms)':>14}{'p99 (ms)':>14}")
+    print("-" * 70)
+    for name, res in (('image par image', single), ('micro-lots', batched)):
+        print(f"{name:<20}{res['throughput_rps']:>16.1f}{res['p50_ms']:>14.1f}{res['p99_ms']:>14.1f}")
+    print("=" * 70)
+    print(f"Taille moyenne des lots: {batched['batcher']['avg_batch_size']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'single': single, 'batched': batched}, f, indent=2)
+        print(f"✓ Résultats sauvegardés dans {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,440 @@
+"""
+Benchmark de charge des routes Flask : /predict, /, /history, /evaluation
+
+Deux cibles :
+- client de test Flask dans ce processus (par défaut), avec une base
+  PostgreSQL locale ou une base en mémoire (--database memory)
+- serveur déjà lancé, ex. gunicorn local (--url http://127.0.0.1:8000),
+  démarré avec SERVER_TIMING=True pour obtenir le détail par étape
+
+Pour chaque route : débit, latences p50/p95/p99 et, via l'en-tête
+Server-Timing, durées par étape (upload, preprocess, inference, db, encode,
+render...). Les résultats sont écrits en JSON ; --compare signale les
+régressions par rapport à un fichier de référence (code de sortie 1).
+
+Usage:
+    python benchmark_endpoints.py --output bench/base.json
+    python benchmark_endpoints.py --concurrency 1 4 16 --requests 300
+    python benchmark_endpoints.py --url http://127.0.0.1:8000 --username bench --password Bench1234
+    python benchmark_endpoints.py --output bench/new.json --compare bench/base.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+
+ENDPOINTS = {
+    'predict': ('POST', '/predict'),
+    'index': ('GET', '/'),
+    'history': ('GET', '/history'),
+    'evaluation': ('GET', '/evaluation'),
+}
+
+
+class MemoryDatabase:
+    """
+    Remplaçant en mémoire de database.Database (mêmes méthodes et mêmes
+    formes de résultats) : isole le coût de l'application de celui de PostgreSQL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.users = {}
+        self.predictions = []
+        self.cache = {}
+
+    def init_db(self):
+        return True
+
+    def ping(self):
+        return True
+
+    def pool_stats(self):
+        return {'backend': 'memory'}
+
+    def get_user_by_username(self, username):
+        return self.users.get(username)
+
+    def create_user(self, username, email, password_hash):
+        with self._lock:
+            if username in self.users:
+                return None
+            user = {'id': next(self._ids), 'username': username, 'email': email,
+                    'password': password_hash, 'created_at': datetime.now()}
+            self.users[username] = user
+            return {k: user[k] for k in ('id', 'username', 'email', 'created_at')}
+
+    def _insert(self, user_id, filename, predicted_class, confidence, created_at=None):
+        row = {'id': next(self._ids), 'user_id': user_id, 'filename': filename,
+               'predicted_class': predicted_class, 'confidence': confidence,
+               'created_at': created_at or datetime.now()}
+        self.predictions.append(row)
+        return row
+
+    def save_prediction(self, user_id, filename, predicted_class, confidence):
+        with self._lock:
+            return {'id': self._insert(user_id, filename, predicted_class, confidence)['id']}
+
+    def save_predictions_batch(self, user_id, predictions):
+        with self._lock:
+            return [{'id': row['id'], 'created_at': row['created_at']}
+                    for row in (self._insert(user_id, p['filename'], p['predicted_class'], p['confidence'])
+                                for p in predictions)]
+
+    def save_predictions_many(self, rows):
+        with self._lock:
+            now = datetime.now()
+            for user_id, filename, predicted_class, confidence, age in rows:
+                self._insert(user_id, filename, predicted_class, confidence,
+                             now - timedelta(seconds=age))
+            return len(rows)
+
+    def _user_rows(self, user_id):
+        with self._lock:
+            rows = [r for r in self.predictions if r['user_id'] == user_id]
+        rows.sort(key=lambda r: (r['created_at'], r['id']), reverse=True)
+        return [{k: r[k] for k in ('id', 'filename', 'predicted_class', 'confidence', 'created_at')}
+                for r in rows]
+
+    def get_user_predictions(self, user_id, limit=10):
+        return self._user_rows(user_id)[:limit]
+
+    def get_user_predictions_page(self, user_id, limit=20, cursor=None):
+        from database import encode_cursor, decode_cursor
+
+        rows = self._user_rows(user_id)
+        position = decode_cursor(cursor) if cursor else None
+        if position is not None:
+            rows = [r for r in rows if (r['created_at'], r['id']) < position]
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, encode_cursor(rows[-1])
+        return rows, None
+
+    def get_cached_prediction(self, image_hash, model_id):
+        return self.cache.get((image_hash, model_id))
+
+    def save_cached_prediction(self, image_hash, model_id, probabilities):
+        self.cache[(image_hash, model_id)] = probabilities
+        return True
+
+    def get_cached_predictions(self, image_hashes, model_id):
+        return {h: self.cache[(h, model_id)] for h in image_hashes if (h, model_id) in self.cache}
+
+
+def load_sample_files(data_dir, n, seed=42):
+    """(nom, octets) de n images de cell_images/, tirées avec une graine fixe"""
+    paths = []
+    for category in ('Parasitized', 'Uninfected'):
+        folder = os.path.join(data_dir, category)
+        if os.path.isdir(folder):
+            paths += sorted(os.path.join(folder, f) for f in os.listdir(folder)
+                            if f.lower().endswith(('.png', '.jpg', '.jpeg')))
+    if not paths:
+        raise SystemExit(f"❌ Aucune image trouvée dans {data_dir}")
+
+    rng = random.Random(seed)
+    samples = []
+    for path in rng.sample(paths, min(n, len(paths))):
+        with open(path, 'rb') as f:
+            samples.append((os.path.basename(path), f.read()))
+    return samples
+
+
+def parse_server_timing(header):
+    """'preprocess;dur=1.2, inference;dur=3.4' -> {'preprocess': 0.0012, ...} (secondes)"""
+    stages = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if name and key == 'dur':
+                stages[name] = stages.get(name, 0.0) + float(value) / 1000.0
+    return stages
+
+
+class TestClientSession:
+    """Utilisateur connecté via le client de test Flask"""
+
+    def __init__(self, app, user):
+        self.client = app.test_client()
+        with self.client.session_transaction() as session:
+            session['user_id'] = user['id']
+            session['username'] = user['username']
+
+    def request(self, method, path, upload=None):
+        if upload is not None:
+            name, data = upload
+            from io import BytesIO
+            response = self.client.post(path, data={'file': (BytesIO(data), name)},
+                                        content_type='multipart/form-data')
+        else:
+            response = self.client.open(path, method=method)
+        response.get_data()
+        return response.status_code, response.headers.get('Server-Timing')
+
+
+class HttpSession:
+    """Utilisateur connecté à un serveur HTTP (connexion persistante par thread)"""
+
+    def __init__(self, url, username, password):
+        parsed = urllib.parse.urlsplit(url)
+        self.host, self.port = parsed.hostname, parsed.port or 80
+        self.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+        self.cookie = ''
+
+        body = urllib.parse.urlencode({'username': username, 'password': password})
+        self.conn.request('POST', '/login', body=body,
+                          headers={'Content-Type': 'application/x-www-form-urlencoded'})
+        response = self.conn.getresponse()
+        response.read()
+        cookies = [c.split(';', 1)[0] for c in response.headers.get_all('Set-Cookie') or []]
+        self.cookie = '; '.join(cookies)
+        if response.status != 302 or 'session=' not in self.cookie:
+            raise SystemExit(f"❌ Connexion impossible en tant que {username} (HTTP {response.status})")
+
+    def request(self, method, path, upload=None):
+        headers = {'Cookie': self.cookie}
+        body = None
+        if upload is not None:
+            name, data = upload
+            boundary = uuid.uuid4().hex
+            body = (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+                    f'Content-Type: application/octet-stream\r\n\r\n').encode() + data + \
+                   f'\r\n--{boundary}--\r\n'.encode()
+            headers['Content-Type'] = f'multipart/form-data; boundary={boundary}'
+        self.conn.request(method, path, body=body, headers=headers)
+        response = self.conn.getresponse()
+        response.read()
+        return response.status, response.getheader('Server-Timing')
+
+
+def summarize(values):
+    values = np.asarray(values) * 1000.0
+    if not len(values):
+        return {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'mean_ms': 0.0}
+    return {
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p95_ms': round(float(np.percentile(values, 95)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'mean_ms': round(float(np.mean(values)), 3)
+    }
+
+
+def run_endpoint(sessions, endpoint, n_requests, samples):
+    """n_requests appels répartis sur une session (un thread) par niveau de concurrence"""
+    method, path = ENDPOINTS[endpoint]
+    latencies, stages, statuses = [], {}, {}
+    lock = threading.Lock()
+    counter = iter(range(n_requests))
+
+    def worker(session):
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            upload = samples[i % len(samples)] if method == 'POST' else None
+            t0 = time.perf_counter()
+            try:
+                status, timing = session.request(method, path, upload)
+            except Exception as e:
+                status, timing = f"error: {type(e).__name__}", None
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                for name, seconds in parse_server_timing(timing).items():
+                    stages.setdefault(name, []).append(seconds)
+
+    threads = [threading.Thread(target=worker, args=(s,)) for s in sessions]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    errors = sum(count for status, count in statuses.items() if not status.startswith(('2', '3')))
+    return {
+        'requests': n_requests,
+        'concurrency': len(sessions),
+        'wall_time_s': round(wall, 3),
+        'throughput_rps': round(n_requests / wall, 2),
+        'errors': errors,
+        'status_codes': statuses,
+        **summarize(latencies),
+        'stages': {name: summarize(values) for name, values in sorted(stages.items())}
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+
+def setup_test_client(args):
+    """Importe l'application avec la base choisie ; retourne (app, utilisateur, config)"""
+    os.environ['SERVER_TIMING'] = 'True'
+    if not args.cache:
+        # Images tirées au hasard mais répétées : sans cela, on mesurerait le cache
+        os.environ['PREDICTION_CACHE_ENABLED'] = 'False'
+
+    import database
+    if args.database == 'memory':
+        database.db = MemoryDatabase()
+
+    import app as app_module
+    from werkzeug.security import generate_password_hash
+
+    db = database.db
+    user = db.get_user_by_username('bench') or db.create_user(
+        'bench', 'bench@example.com', generate_password_hash('Bench1234'))
+    if user is None:
+        raise SystemExit("❌ Impossible de créer l'utilisateur de benchmark")
+
+    # Historique pré-rempli pour que / et /history affichent des pages pleines
+    if args.database == 'memory':
+        db.save_predictions_batch(user['id'], [
+            {'filename': f"seed_{i}.png", 'predicted_class': 'Parasitized' if i % 2 else 'Uninfected',
+             'confidence': 0.9}
+            for i in range(args.history_rows)
+        ])
+    return app_module.app, user, app_module.config
+
+
+def compare(results, baseline, max_regression):
+    """Écarts par rapport à la référence ; retourne la liste des régressions"""
+    regressions = []
+    print("\n" + "=" * 86)
+    print(f"{'Route':<12}{'Conc.':>6}{'p95 réf.':>12}{'p95':>12}{'écart':>9}"
+          f"{'req/s réf.':>13}{'req/s':>10}{'écart':>9}")
+    print("-" * 86)
+    for key, current in results['runs'].items():
+        ref = baseline.get('runs', {}).get(key)
+        if ref is None:
+            continue
+        p95_delta = (current['p95_ms'] - ref['p95_ms']) / ref['p95_ms'] if ref['p95_ms'] else 0.0
+        rps_delta = (current['throughput_rps'] - ref['throughput_rps']) / ref['throughput_rps'] \
+            if ref['throughput_rps'] else 0.0
+        flag = ''
+        if p95_delta > max_regression or -rps_delta > max_regression:
+            regressions.append(key)
+            flag = '  ⚠'
+        print(f"{current['endpoint']:<12}{current['concurrency']:>6}{ref['p95_ms']:>10.1f}ms"
+              f"{current['p95_ms']:>10.1f}ms{p95_delta:>+9.1%}{ref['throughput_rps']:>13.1f}"
+              f"{current['throughput_rps']:>10.1f}{rps_delta:>+9.1%}{flag}")
+    print("=" * 86)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de charge des routes Flask")
+    parser.add_argument('--endpoints', nargs='+', default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--requests', type=int, default=200, help="Requêtes par route et par niveau")
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--data-dir', default='cell_images')
+    parser.add_argument('--samples', type=int, default=256, help="Images distinctes envoyées à /predict")
+    parser.add_argument('--url', default=None, help="Serveur à tester (sinon client de test Flask)")
+    parser.add_argument('--username', default='bench')
+    parser.add_argument('--password', default='Bench1234')
+    parser.add_argument('--database', choices=['memory', 'postgres'], default='memory',
+                        help="Base utilisée avec le client de test")
+    parser.add_argument('--history-rows', type=int, default=200)
+    parser.add_argument('--cache', action='store_true', help="Laisser le cache des prédictions actif")
+    parser.add_argument('--output', default=None, help="Fichier JSON de résultats")
+    parser.add_argument('--compare', default=None, help="Fichier JSON de référence")
+    parser.add_argument('--max-regression', type=float, default=0.15,
+                        help="Écart toléré sur p95 et sur le débit (0.15 = 15%%)")
+    args = parser.parse_args()
+
+    samples = load_sample_files(args.data_dir, args.samples)
+
+    if args.url:
+        target = args.url
+        make_session = lambda: HttpSession(args.url, args.username, args.password)
+        settings = {}
+    else:
+        target = f"flask-test-client ({args.database})"
+        app, user, config = setup_test_client(args)
+        make_session = lambda: TestClientSession(app, user)
+        settings = {
+            'model_path': config.MODEL_PATH,
+            'inference_backend': config.INFERENCE_BACKEND,
+            'batching': config.BATCHING_ENABLED,
+            'cascade': config.CASCADE_ENABLED,
+            'prediction_cache': config.PREDICTION_CACHE_ENABLED,
+            'write_behind': config.DB_WRITE_BEHIND
+        }
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'target': target,
+            'python': platform.python_version(),
+            'cpus': os.cpu_count(),
+            'requests_per_run': args.requests,
+            'samples': len(samples),
+            'settings': settings
+        },
+        'runs': {}
+    }
+
+    for endpoint in args.endpoints:
+        warmup = make_session()
+        method = ENDPOINTS[endpoint][0]
+        for i in range(args.warmup):
+            warmup.request(method, ENDPOINTS[endpoint][1], samples[i % len(samples)] if method == 'POST' else None)
+
+        for concurrency in args.concurrency:
+            print(f"▶ {endpoint} : {args.requests} requêtes, concurrence {concurrency}...")
+            sessions = [make_session() for _ in range(concurrency)]
+            run = run_endpoint(sessions, endpoint, args.requests, samples)
+            results['runs'][f"{endpoint}@{concurrency}"] = {'endpoint': endpoint, **run}
+
+    print("\n" + "=" * 78)
+    print(f"{'Route':<12}{'Conc.':>6}{'req/s':>10}{'p50':>11}{'p95':>11}{'p99':>11}{'erreurs':>9}")
+    print("-" * 78)
+    for run in results['runs'].values():
+        print(f"{run['endpoint']:<12}{run['concurrency']:>6}{run['throughput_rps']:>10.1f}"
+              f"{run['p50_ms']:>9.1f}ms{run['p95_ms']:>9.1f}ms{run['p99_ms']:>9.1f}ms{run['errors']:>9}")
+        for name, stage in run['stages'].items():
+            print(f"{'':<6}└ {name:<16}{'':>4}{stage['p50_ms']:>11.2f}ms{stage['p95_ms']:>9.2f}ms"
+                  f"{stage['p99_ms']:>9.2f}ms")
+    print("=" * 78)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Résultats sauvegardés dans {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"❌ Régressions au-delà de {args.max_regression:.0%}: {', '.join(regressions)}")
+            raise SystemExit(1)
+        print("✓ Aucune régression")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Benchmark du prétraitement : images/seconde par backend et par API
+
+Pour chaque backend de preprocessing.py (cv2, pil, keras), mesure :
+    preprocess (octets)   une image en mémoire, comme /predict
+    preprocess (chemin)   une image sur disque, comme les jobs et les outils
+    preprocess_batch      lots de --batch-size images en mémoire, comme /predict/batch
+et, pour comparaison, l'ancien chemin de l'application et du notebook
+(load_img + img_to_array + / 255.0, un tableau neuf par image) ainsi que la
+lecture du cache pack_dataset.py si --packed est fourni.
+
+Les fichiers sont lus une première fois avant les mesures (cache disque chaud).
+
+Usage:
+    python benchmark_preprocessing.py
+    python benchmark_preprocessing.py --images 2000 --batch-size 256 --repeat 5
+    python benchmark_preprocessing.py --packed cell_images_packed --output preprocessing_benchmark.csv
+"""
+import argparse
+import csv
+import random
+import time
+
+import numpy as np
+
+import preprocessing
+from config import config
+from dataset import list_images
+
+IMG_SIZE = (config.IMG_SIZE, config.IMG_SIZE)
+
+
+def legacy_preprocess(path, target_size=IMG_SIZE):
+    """Ancien preprocess_image de app.py (et load_and_normalize_images du notebook)"""
+    from tensorflow.keras.preprocessing.image import img_to_array
+    from tensorflow.keras.utils import load_img
+
+    img_array = img_to_array(load_img(path, target_size=target_size))
+    img_array = img_array / 255.0
+    return np.expand_dims(img_array, axis=0)
+
+
+def measure(fn, n_images, repeat):
+    """Meilleur débit (images/s) sur `repeat` passages de fn"""
+    fn()
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return n_images / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit du prétraitement par backend")
+    parser.add_argument('--data-dir', default='cell_images')
+    parser.add_argument('--images', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=config.BATCH_MAX_SIZE)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--packed', default=None, help="Cache produit par pack_dataset.py")
+    parser.add_argument('--output', default=None, help="Écrit les résultats en CSV")
+    args = parser.parse_args()
+
+    paths, _ = list_images(args.data_dir)
+    if not paths:
+        raise SystemExit(f"❌ Aucune image trouvée dans {args.data_dir}")
+    random.seed(42)
+    paths = random.sample(paths, min(args.images, len(paths)))
+    payloads = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            payloads.append(f.read())
+    n = len(paths)
+    batches = [payloads[i:i + args.batch_size] for i in range(0, n, args.batch_size)]
+    print(f"▶ {n} images {IMG_SIZE[0]}x{IMG_SIZE[1]}, lots de {args.batch_size}, meilleur de {args.repeat}")
+
+    rows = []
+
+    def add(backend, api, rate):
+        rows.append({'backend': backend, 'api': api, 'images_per_sec': round(rate, 1),
+                     'us_per_image': round(1e6 / rate, 1)})
+
+    for backend in preprocessing.available_backends():
+        print(f"▶ {backend}...")
+        add(backend, 'preprocess (octets)', measure(
+            lambda: [preprocessing.preprocess(data, IMG_SIZE, backend) for data in payloads], n, args.repeat))
+        add(backend, 'preprocess (chemin)', measure(
+            lambda: [preprocessing.preprocess(path, IMG_SIZE, backend) for path in paths], n, args.repeat))
+        add(backend, 'preprocess_batch', measure(
+            lambda: [preprocessing.preprocess_batch(batch, IMG_SIZE, backend) for batch in batches], n, args.repeat))
+
+    if preprocessing.backend_available('keras'):
+        add('legacy', 'load_img + img_to_array', measure(
+            lambda: [legacy_preprocess(path) for path in paths], n, args.repeat))
+
+    if args.packed:
+        from pack_dataset import PackedDataset
+        packed = PackedDataset(args.packed, IMG_SIZE)
+        positions = packed.positions(paths)
+        out = np.empty((args.batch_size, *IMG_SIZE, 3), dtype=np.float32)
+        add('packed', 'batch (cache mmap)', measure(
+            lambda: [packed.batch(positions[i:i + args.batch_size], out=out[:len(positions[i:i + args.batch_size])])
+                     for i in range(0, n, args.batch_size)], n, args.repeat))
+
+    baseline = next((r['images_per_sec'] for r in rows if r['backend'] == 'legacy'), None)
+    print("\n" + "=" * 72)
+    print(f"{'Backend':<10}{'API':<26}{'Images/s':>12}{'µs/image':>12}{'Gain':>10}")
+    print("-" * 72)
+    for row in rows:
+        gain = f"x{row['images_per_sec'] / baseline:.1f}" if baseline else '-'
+        print(f"{row['backend']:<10}{row['api']:<26}{row['images_per_sec']:>12.0f}"
+              f"{row['us_per_image']:>12.1f}{gain:>10}")
+    print("=" * 72)
+    print(f"✓ Backend 'auto' : {preprocessing.configure('auto')}")
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"✓ Résultats sauvegardés dans {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark : model.predict vs fonction de graphe compilée (KerasBackend)
+
+Mesure, pour chaque taille de lot, la latence médiane/p99 d'un appel et le
+débit en images/s des deux chemins, après préchauffage.
+
+Usage:
+    python benchmark_serving.py --batch-sizes 1 8 32 --iterations 200
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from config import config
+from inference import load_inference_model, KerasBackend
+
+
+def time_calls(predict, batch, iterations):
+    """Durées (s) de `iterations` appels, après deux appels de préchauffage"""
+    predict(batch)
+    predict(batch)
+    timings = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        predict(batch)
+        timings.append(time.perf_counter() - t0)
+    return np.asarray(timings)
+
+
+def summarize(timings, batch_size):
+    return {
+        'p50_ms': round(float(np.percentile(timings, 50) * 1000), 3),
+        'p99_ms': round(float(np.percentile(timings, 99) * 1000), 3),
+        'images_per_s': round(batch_size / float(np.mean(timings)), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="model.predict vs fonction de service compilée")
+    parser.add_argument('--model', default=config.MODEL_PATH)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output', help="Fichier JSON de résultats (optionnel)")
+    args = parser.parse_args()
+
+    model = load_inference_model(args.model)
+    if model is None:
+        raise SystemExit(1)
+
+    legacy = KerasBackend(model, compiled=False)
+    compiled = KerasBackend(model, compiled=True, warmup_batch_sizes=args.batch_sizes)
+
+    rng = np.random.default_rng(42)
+    results = []
+    for batch_size in args.batch_sizes:
+        batch = rng.random((batch_size, config.IMG_SIZE, config.IMG_SIZE, 3), dtype=np.float32)
+        diff = float(np.max(np.abs(legacy.predict(batch) - compiled.predict(batch))))
+
+        results.append({
+            'batch_size': batch_size,
+            'predict': summarize(time_calls(legacy.predict, batch, args.iterations), batch_size),
+            'compiled': summarize(time_calls(compiled.predict, batch, args.iterations), batch_size),
+            'max_abs_diff': diff
+        })
+
+    print("\n" + "=" * 84)
+    print(f"{'Lot':>5}{'predict p50':>14}{'p99':>10}{'img/s':>10}"
+          f"{'compilé p50':>14}{'p99':>10}{'img/s':>10}{'gain':>9}")
+    print("-" * 84)
+    for r in results:
+        p, c = r['predict'], r['compiled']
+        print(f"{r['batch_size']:>5}{p['p50_ms']:>12.2f}ms{p['p99_ms']:>8.2f}ms{p['images_per_s']:>10.0f}"
+              f"{c['p50_ms']:>12.2f}ms{c['p99_ms']:>8.2f}ms{c['images_per_s']:>10.0f}"
+              f"{p['p50_ms'] / c['p50_ms']:>8.1f}x")
+    print("=" * 84)
+    print(f"Écart max des probabilités: {max(r['max_abs_diff'] for r in results):.2e}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Résultats sauvegardés dans {args.output}")
+
+
+if __name__ == '__main__':
+    main()
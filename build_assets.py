@@ -0,0 +1,163 @@
+"""
+Prépare les images de models/ pour le web
+
+Pour chaque PNG de models/ (courbes d'entraînement, matrices de confusion,
+exemples de prédictions...), génère dans models/assets/ :
+    - des variantes WebP à plusieurs largeurs (jamais plus larges que l'original)
+    - un PNG recompressé à la taille d'origine (ou l'original s'il est plus
+      petit), pour les clients sans WebP
+nommées par l'empreinte de leur contenu (<nom>.<largeur>.<empreinte>.<ext>),
+et un manifest.json lu par l'application (assets.py) pour choisir la
+variante à servir et poser des en-têtes de cache immuables.
+
+Les images dont le contenu n'a pas changé depuis la dernière exécution ne
+sont pas recalculées ; les variantes obsolètes sont supprimées. À relancer
+après chaque entraînement (traitement.ipynb, train_all.py), et dans la
+commande de build du déploiement.
+
+Usage:
+    python build_assets.py
+    python build_assets.py --widths 480 960 1600 --quality 85
+    python build_assets.py --force
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from assets import MANIFEST_FILE
+from config import config
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def encode(img, fmt, quality):
+    """Octets de l'image encodée en WebP ou PNG"""
+    out = BytesIO()
+    if fmt == 'webp':
+        img.save(out, 'WEBP', quality=quality, method=6)
+    else:
+        img.save(out, 'PNG', optimize=True)
+    return out.getvalue()
+
+
+def build_variants(source_path, output_dir, widths, quality):
+    """Écrit les variantes d'une image ; retourne son entrée de manifeste"""
+    with open(source_path, 'rb') as f:
+        source_bytes = f.read()
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+
+    with Image.open(BytesIO(source_bytes)) as img:
+        img.load()
+        width, height = img.size
+        # Les PNG RGBA/palette gardent leur transparence en WebP
+        mode = 'RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB'
+        img = img.convert(mode)
+
+        targets = [('webp', w) for w in sorted(set(min(w, width) for w in widths))]
+        targets.append(('png', width))
+
+        variants = []
+        for fmt, target_width in targets:
+            target_height = max(1, round(height * target_width / width))
+            resized = img if target_width == width else img.resize((target_width, target_height), Image.LANCZOS)
+            data = encode(resized, fmt, quality)
+            if fmt == 'png' and len(data) >= len(source_bytes):
+                # La recompression n'a rien gagné : l'original est servi tel quel
+                data = source_bytes
+            digest = content_hash(data)
+            name = f"{stem}.{target_width}.{digest[:12]}.{fmt}"
+            path = os.path.join(output_dir, name)
+            if not os.path.exists(path):
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            variants.append({
+                'file': name,
+                'mimetype': f"image/{fmt}",
+                'width': target_width,
+                'height': target_height,
+                'bytes': len(data),
+                'sha256': digest
+            })
+
+    return {
+        'source_sha256': content_hash(source_bytes),
+        'source_bytes': len(source_bytes),
+        'width': width,
+        'height': height,
+        'variants': variants
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Variantes WebP/PNG des images de models/")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--output', default=config.MODEL_ASSETS_DIR)
+    parser.add_argument('--widths', type=int, nargs='+', default=[480, 960, 1600])
+    parser.add_argument('--quality', type=int, default=85, help="Qualité WebP (0-100)")
+    parser.add_argument('--force', action='store_true', help="Recalcule toutes les variantes")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest_path = os.path.join(args.output, MANIFEST_FILE)
+    previous = {}
+    if os.path.exists(manifest_path) and not args.force:
+        with open(manifest_path) as f:
+            previous = json.load(f).get('images', {})
+
+    sources = sorted(glob.glob(os.path.join(args.models_dir, '*.png')))
+    if not sources:
+        raise SystemExit(f"❌ Aucune image PNG dans {args.models_dir}")
+
+    images = {}
+    start = time.perf_counter()
+    for path in sources:
+        filename = os.path.basename(path)
+        with open(path, 'rb') as f:
+            source_sha256 = content_hash(f.read())
+        entry = previous.get(filename)
+        up_to_date = (
+            entry is not None
+            and entry['source_sha256'] == source_sha256
+            and sorted(set(min(w, entry['width']) for w in args.widths)) ==
+                [v['width'] for v in entry['variants'] if v['mimetype'] == 'image/webp']
+            and all(os.path.exists(os.path.join(args.output, v['file'])) for v in entry['variants'])
+        )
+        images[filename] = entry if up_to_date else build_variants(path, args.output, args.widths, args.quality)
+
+    # Variantes qui ne sont plus référencées
+    kept = {v['file'] for entry in images.values() for v in entry['variants']}
+    removed = 0
+    for entry in os.listdir(args.output):
+        if entry != MANIFEST_FILE and entry not in kept:
+            os.remove(os.path.join(args.output, entry))
+            removed += 1
+
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'generated_at': time.time(), 'images': images}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+    print("\n" + "=" * 78)
+    print(f"{'Image':<32}{'Original':>12}{'WebP (par largeur)':>34}")
+    print("-" * 78)
+    for filename, entry in images.items():
+        webp = '  '.join(f"{v['width']}:{v['bytes'] / 1024:.0f}K"
+                         for v in entry['variants'] if v['mimetype'] == 'image/webp')
+        print(f"{filename:<32}{entry['source_bytes'] / 1024:>11.0f}K{webp:>34}")
+    print("=" * 78)
+    print(f"✓ {len(images)} image(s), {len(kept)} variante(s) dans {args.output} "
+          f"({removed} obsolète(s) supprimée(s), {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
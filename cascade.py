@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from inference import load_backend
+
+
+class CascadePredictor:
+    """
+    Inférence en cascade : le modèle le moins coûteux voit toutes les images,
+    seules celles dont la confiance reste sous `threshold` passent à l'étage
+    suivant (toutes ensemble, en un seul lot).
+
+    final='escalate' : la décision revient au dernier modèle consulté
+    final='ensemble' : moyenne des probabilités de tous les modèles consultés
+
+    Expose la même méthode `predict(batch)` qu'un backend d'inférence.
+
+    Les statistiques par étage mesurent le temps réel (perf_counter) : le
+    temps CPU du processus compterait aussi les requêtes concurrentes, les
+    jobs et le micro-batcher, et celui du thread appelant ignorerait les
+    threads de calcul de TensorFlow. Pour comparer les coûts CPU des
+    modèles et régler les seuils : evaluate_cascade.py, hors service.
+    """
+
+    def __init__(self, stages, threshold=0.9, final='escalate'):
+        if final not in ('escalate', 'ensemble'):
+            raise ValueError(f"Mode final inconnu: {final} (attendu: escalate ou ensemble)")
+        self.stages = stages  # [(nom, backend)], du moins coûteux au plus coûteux
+        self.threshold = float(threshold)
+        self.final = final
+
+        self._lock = threading.Lock()
+        self._images = 0
+        self._entered = [0] * len(stages)
+        self._resolved = [0] * len(stages)
+        self._wall_time = [0.0] * len(stages)
+
+    @classmethod
+    def from_paths(cls, backend, model_paths, threshold=0.9, final='escalate', **backend_options):
+        """Charge chaque étage avec le moteur d'inférence choisi (None si un modèle manque)"""
+        stages = []
+        for path in model_paths:
+            model = load_backend(backend, path, **backend_options)
+            if model is None:
+                print(f"⚠ Cascade désactivée : étage {path} indisponible")
+                return None
+            stages.append((os.path.splitext(os.path.basename(path))[0], model))
+        return cls(stages, threshold=threshold, final=final)
+
+    def predict_with_routes(self, batch):
+        """Retourne (probabilités, index du dernier étage consulté pour chaque image)"""
+        n = len(batch)
+        routes = np.zeros(n, dtype=np.int64)
+        pending = np.arange(n)
+        probabilities = None
+        totals = None
+
+        for stage, (_, backend) in enumerate(self.stages):
+            if len(pending) == 0:
+                break
+
+            start = time.perf_counter()
+            stage_batch = batch if len(pending) == n else batch[pending]
+            stage_probs = np.asarray(backend.predict(stage_batch), dtype=np.float32)
+            elapsed = time.perf_counter() - start
+
+            if probabilities is None:
+                probabilities = stage_probs.copy()
+                totals = stage_probs.copy()
+            else:
+                totals[pending] += stage_probs
+                if self.final == 'ensemble':
+                    probabilities[pending] = totals[pending] / (stage + 1)
+                else:
+                    probabilities[pending] = stage_probs
+            routes[pending] = stage
+
+            with self._lock:
+                self._entered[stage] += len(pending)
+                self._wall_time[stage] += elapsed
+
+            if stage < len(self.stages) - 1:
+                confident = probabilities[pending].max(axis=1) >= self.threshold
+                resolved = int(np.count_nonzero(confident))
+                pending = pending[~confident]
+            else:
+                resolved = len(pending)
+
+            with self._lock:
+                self._resolved[stage] += resolved
+
+        with self._lock:
+            self._images += n
+        return probabilities, routes
+
+    def predict(self, batch):
+        return self.predict_with_routes(batch)[0]
+
+    def stats(self):
+        """Décisions de routage et durée par image de chaque étage depuis le démarrage"""
+        with self._lock:
+            stages = []
+            for i, (name, _) in enumerate(self.stages):
+                stages.append({
+                    'model': name,
+                    'images': self._entered[i],
+                    'resolved': self._resolved[i],
+                    'escalated': self._entered[i] - self._resolved[i],
+                    'ms_per_image': round(self._wall_time[i] / self._entered[i] * 1000, 3)
+                    if self._entered[i] else 0.0
+                })
+            return {
+                'threshold': self.threshold,
+                'final': self.final,
+                'images': self._images,
+                'stages': stages
+            }
@@ -1,4 +1,6 @@
+import hashlib
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Charger les variables d'environnement
@@ -15,11 +17,110 @@ class Config:
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16777216))  # 16MB
     ALLOWED_EXTENSIONS = set(os.getenv('ALLOWED_EXTENSIONS', 'png,jpg,jpeg').split(','))
+    # Décodage en mémoire ; au-delà du seuil, le fichier est écrit dans UPLOAD_FOLDER
+    UPLOAD_IN_MEMORY = os.getenv('UPLOAD_IN_MEMORY', 'True').lower() == 'true'
+    UPLOAD_SPOOL_THRESHOLD = int(os.getenv('UPLOAD_SPOOL_THRESHOLD', 8388608))  # 8MB
     
     # Model
     MODEL_PATH = os.getenv('MODEL_PATH', 'models/best_overall_model.keras')
     IMG_SIZE = int(os.getenv('IMG_SIZE', 128))
-    
+    # Décodage/redimensionnement : auto (le plus rapide disponible), cv2, pil ou keras
+    PREPROCESS_BACKEND = os.getenv('PREPROCESS_BACKEND', 'auto').lower()
+    # Moteur d'inférence : keras (.h5) ou tflite (.tflite produit par export_model.py)
+    INFERENCE_BACKEND = os.getenv('INFERENCE_BACKEND', 'keras').lower()
+    INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', 0)) or None
+    # Keras : fonction de graphe compilée (sinon model.predict) et tailles de lot préchauffées
+    KERAS_COMPILED_SERVING = os.getenv('KERAS_COMPILED_SERVING', 'True').lower() == 'true'
+    SERVING_WARMUP_BATCH_SIZES = [int(n) for n in os.getenv('SERVING_WARMUP_BATCH_SIZES', '1,32').split(',') if n]
+
+    # Cascade : modèle le moins coûteux d'abord, escalade des images peu sûres
+    CASCADE_ENABLED = os.getenv('CASCADE_ENABLED', 'False').lower() == 'true'
+    CASCADE_MODELS = [p for p in os.getenv(
+        'CASCADE_MODELS',
+        'models/model_A_best.h5,models/model_B_best.h5,models/model_C_best.h5'
+    ).split(',') if p]
+    CASCADE_THRESHOLD = float(os.getenv('CASCADE_THRESHOLD', 0.9))
+    CASCADE_FINAL = os.getenv('CASCADE_FINAL', 'escalate').lower()  # escalate ou ensemble
+
+    # Inférence par micro-lots (regroupement des requêtes concurrentes) :
+    # utile seulement avec des workers threadés (gthread), inactif par défaut
+    BATCHING_ENABLED = os.getenv('BATCHING_ENABLED', 'False').lower() == 'true'
+    BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', 32))
+    BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', 5))
+
+    # Cache des prédictions (empreinte de l'image + identité du modèle)
+    PREDICTION_CACHE_ENABLED = os.getenv('PREDICTION_CACHE_ENABLED', 'True').lower() == 'true'
+    PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', 2048))
+    PREDICTION_CACHE_PERSISTENT = os.getenv('PREDICTION_CACHE_PERSISTENT', 'False').lower() == 'true'
+
+    # Écriture différée des prédictions (hors du chemin de la requête)
+    DB_WRITE_BEHIND = os.getenv('DB_WRITE_BEHIND', 'False').lower() == 'true'
+    WRITE_BEHIND_QUEUE_SIZE = int(os.getenv('WRITE_BEHIND_QUEUE_SIZE', 10000))
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 100))
+    WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv('WRITE_BEHIND_FLUSH_INTERVAL', 1.0))
+    WRITE_BEHIND_MAX_RETRIES = int(os.getenv('WRITE_BEHIND_MAX_RETRIES', 5))
+
+    # Image renvoyée par /predict : thumbnail (URL d'une miniature), base64 (image complète) ou none
+    PREDICT_IMAGE_ECHO = os.getenv('PREDICT_IMAGE_ECHO', 'thumbnail').lower()
+    THUMBNAIL_DIR = os.getenv('THUMBNAIL_DIR', os.path.join(UPLOAD_FOLDER, 'thumbnails'))
+    THUMBNAIL_MAX_SIDE = int(os.getenv('THUMBNAIL_MAX_SIDE', 256))
+    THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 80))
+    THUMBNAIL_TTL = int(os.getenv('THUMBNAIL_TTL', 3600))  # secondes
+
+    # Variantes WebP/PNG des images de models/ (build_assets.py)
+    MODEL_ASSETS_DIR = os.getenv('MODEL_ASSETS_DIR', os.path.join('models', 'assets'))
+
+    # Augmentation au test (symétries moyennées) si la confiance est sous le seuil
+    TTA_ENABLED = os.getenv('TTA_ENABLED', 'False').lower() == 'true'
+    TTA_THRESHOLD = float(os.getenv('TTA_THRESHOLD', 0.8))
+    TTA_TRANSFORMS = int(os.getenv('TTA_TRANSFORMS', 8))  # 2, 4 ou 8
+
+    # Frottis complets (/predict/slide) : tuiles, taille des lots, diamètre des cellules (0 = estimé)
+    SLIDE_TILE_SIZE = int(os.getenv('SLIDE_TILE_SIZE', 2048))
+    SLIDE_BATCH_SIZE = int(os.getenv('SLIDE_BATCH_SIZE', 256))
+    SLIDE_CELL_DIAMETER = float(os.getenv('SLIDE_CELL_DIAMETER', 0))
+    # Nombre de pixels maximal (largeur x hauteur) d'un frottis, vérifié avant décodage
+    SLIDE_MAX_PIXELS = int(os.getenv('SLIDE_MAX_PIXELS', 50000000))
+
+    # Prédictions asynchrones (/predict?async=1, suivi sur /jobs/<id>)
+    ASYNC_JOBS_ENABLED = os.getenv('ASYNC_JOBS_ENABLED', 'True').lower() == 'true'
+    # En dessous de cette taille, /predict répond directement même avec async=1
+    ASYNC_MIN_UPLOAD_SIZE = int(os.getenv('ASYNC_MIN_UPLOAD_SIZE', UPLOAD_SPOOL_THRESHOLD))
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+    JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', 64))
+    JOB_DIR = os.getenv('JOB_DIR', os.path.join(UPLOAD_FOLDER, 'jobs'))
+    JOB_TTL = int(os.getenv('JOB_TTL', 3600))
+    # Suivi en server-sent events : chaque flux ouvert occupe un worker pendant
+    # tout le job, à n'activer qu'avec des workers threadés ou async (gthread, gevent)
+    JOB_EVENTS_ENABLED = os.getenv('JOB_EVENTS_ENABLED', 'False').lower() == 'true'
+    JOB_EVENTS_TIMEOUT = float(os.getenv('JOB_EVENTS_TIMEOUT', 120))
+
+    # Durées par étape dans l'en-tête Server-Timing (benchmark_endpoints.py)
+    SERVER_TIMING = os.getenv('SERVER_TIMING', 'False').lower() == 'true'
+
+    # Métriques Prometheus (/metrics) ; METRICS_DIR partagé entre les workers gunicorn
+    # (par défaut un dossier temporaire propre à ce déploiement, vide = un seul processus)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() == 'true'
+    METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(
+        tempfile.gettempdir(),
+        'malaria_metrics_' + hashlib.sha256(os.path.dirname(os.path.abspath(__file__)).encode()).hexdigest()[:12]
+    ))
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+    # Sans jeton, /metrics ne répond qu'aux requêtes locales non relayées par un proxy
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+    # Historique (taille d'une page)
+    HISTORY_PAGE_SIZE = int(os.getenv('HISTORY_PAGE_SIZE', 20))
+
+    # Exports de l'historique (/export/predictions.csv|ndjson, export_predictions.py)
+    EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))  # lignes par lot du curseur serveur
+    # Utilisateurs autorisés à exporter les prédictions de tous les utilisateurs
+    EXPORT_ADMINS = [u.strip() for u in os.getenv('EXPORT_ADMINS', '').split(',') if u.strip()]
+
+    # Prédiction multi-images (/predict/batch)
+    BATCH_MAX_FILES = int(os.getenv('BATCH_MAX_FILES', 256))
+    BATCH_MAX_UNZIPPED_SIZE = int(os.getenv('BATCH_MAX_UNZIPPED_SIZE', 67108864))  # 64MB
+
     # PostgreSQL - Gestion production vs développement
     DATABASE_URL = os.getenv('DATABASE_URL')  # URL complète fournie par Render
     if DATABASE_URL and DATABASE_URL.startswith("postgres://"):
@@ -31,6 +132,13 @@ class Config:
     DB_NAME = os.getenv('DB_NAME', 'malaria_detection')
     DB_USER = os.getenv('DB_USER', 'malaria_user')
     DB_PASSWORD = os.getenv('DB_PASSWORD', '')
+
+    # Pool de connexions (par worker)
+    DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+    DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 5))  # secondes d'attente max
+    DB_POOL_MAX_IDLE = float(os.getenv('DB_POOL_MAX_IDLE', 300))  # fermeture après inactivité
+    DB_POOL_PING_AFTER = float(os.getenv('DB_POOL_PING_AFTER', 30))  # SELECT 1 si inactive plus longtemps
     
     @property
     def SQLALCHEMY_DATABASE_URI(self):
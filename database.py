@@ -1,8 +1,316 @@
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values, Json
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_UNKNOWN
+from psycopg2.pool import PoolError
 from psycopg2 import errors
+import base64
 import os
+import threading
+import time
+from datetime import datetime
 from config import config
+import metrics
+
+
+def encode_cursor(row):
+    """Curseur opaque de pagination à partir de la dernière ligne affichée"""
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Retourne (created_at, id) ou None si le curseur est invalide"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+# Colonnes des exports (ordre des tuples de stream_predictions)
+EXPORT_COLUMNS = ('id', 'user_id', 'username', 'filename', 'predicted_class', 'confidence', 'created_at')
+
+
+# Agrégats par utilisateur (totaux et moyenne de confiance par classe, par jour),
+# mis à jour dans la transaction de chaque INSERT/UPDATE/DELETE sur predictions.
+# Triggers par instruction : un INSERT multi-lignes ne fait qu'un upsert groupé.
+PREDICTION_STATS_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS user_prediction_stats (
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        predicted_class VARCHAR(50) NOT NULL,
+        total BIGINT NOT NULL DEFAULT 0,
+        confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        last_prediction_at TIMESTAMP,
+        PRIMARY KEY (user_id, predicted_class)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_daily_prediction_stats (
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        day DATE NOT NULL,
+        predicted_class VARCHAR(50) NOT NULL,
+        total BIGINT NOT NULL DEFAULT 0,
+        confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day, predicted_class)
+    )
+    """,
+]
+
+PREDICTION_STATS_FUNCTION = """
+    CREATE OR REPLACE FUNCTION apply_prediction_stats() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            UPDATE user_prediction_stats s
+            SET total = s.total - d.total, confidence_sum = s.confidence_sum - d.confidence_sum
+            FROM (
+                SELECT user_id, predicted_class, COUNT(*) AS total, SUM(confidence) AS confidence_sum
+                FROM old_rows WHERE user_id IS NOT NULL
+                GROUP BY user_id, predicted_class
+            ) d
+            WHERE s.user_id = d.user_id AND s.predicted_class = d.predicted_class;
+
+            UPDATE user_daily_prediction_stats s
+            SET total = s.total - d.total, confidence_sum = s.confidence_sum - d.confidence_sum
+            FROM (
+                SELECT user_id, created_at::date AS day, predicted_class,
+                       COUNT(*) AS total, SUM(confidence) AS confidence_sum
+                FROM old_rows WHERE user_id IS NOT NULL
+                GROUP BY user_id, created_at::date, predicted_class
+            ) d
+            WHERE s.user_id = d.user_id AND s.day = d.day AND s.predicted_class = d.predicted_class;
+        END IF;
+
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            -- Ordre fixe des clés : pas d'interblocage entre lots concurrents
+            INSERT INTO user_prediction_stats AS s
+                (user_id, predicted_class, total, confidence_sum, last_prediction_at)
+            SELECT user_id, predicted_class, COUNT(*), SUM(confidence), MAX(created_at)
+            FROM new_rows WHERE user_id IS NOT NULL
+            GROUP BY user_id, predicted_class
+            ORDER BY user_id, predicted_class
+            ON CONFLICT (user_id, predicted_class) DO UPDATE
+            SET total = s.total + EXCLUDED.total,
+                confidence_sum = s.confidence_sum + EXCLUDED.confidence_sum,
+                last_prediction_at = GREATEST(s.last_prediction_at, EXCLUDED.last_prediction_at);
+
+            INSERT INTO user_daily_prediction_stats AS s
+                (user_id, day, predicted_class, total, confidence_sum)
+            SELECT user_id, created_at::date, predicted_class, COUNT(*), SUM(confidence)
+            FROM new_rows WHERE user_id IS NOT NULL
+            GROUP BY user_id, created_at::date, predicted_class
+            ORDER BY user_id, created_at::date, predicted_class
+            ON CONFLICT (user_id, day, predicted_class) DO UPDATE
+            SET total = s.total + EXCLUDED.total,
+                confidence_sum = s.confidence_sum + EXCLUDED.confidence_sum;
+        END IF;
+
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+"""
+
+# Une table de transition n'est possible que pour un seul événement par trigger.
+# Créés par init_db seulement s'ils manquent : CREATE/DROP TRIGGER prend un
+# verrou ACCESS EXCLUSIVE sur predictions (python backfill_stats.py --reinstall-triggers
+# pour les remplacer après une modification)
+PREDICTION_STATS_TRIGGERS = {
+    'predictions_stats_insert': """
+    CREATE TRIGGER predictions_stats_insert AFTER INSERT ON predictions
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_prediction_stats()
+    """,
+    'predictions_stats_update': """
+    CREATE TRIGGER predictions_stats_update AFTER UPDATE ON predictions
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_prediction_stats()
+    """,
+    'predictions_stats_delete': """
+    CREATE TRIGGER predictions_stats_delete AFTER DELETE ON predictions
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION apply_prediction_stats()
+    """
+}
+
+
+class PoolTimeout(PoolError):
+    """Aucune connexion libérée avant l'expiration du délai d'attente"""
+
+
+class ConnectionPool:
+    """
+    Pool de connexions thread-safe.
+
+    - Au plus `maxconn` connexions ouvertes ; au-delà, attente bornée par `timeout`
+    - Les connexions inactives depuis plus de `max_idle` secondes sont fermées
+      (en conservant `minconn` connexions)
+    - Vérification à l'emprunt : connexion fermée ou dans un état inconnu
+      remplacée, et `SELECT 1` si elle est restée inactive plus de `ping_after` secondes
+    """
+
+    def __init__(self, connect, minconn=1, maxconn=10, timeout=5.0, max_idle=300.0, ping_after=30.0):
+        self._connect = connect
+        self.minconn = max(0, int(minconn))
+        self.maxconn = max(1, int(maxconn))
+        self.timeout = float(timeout)
+        self.max_idle = float(max_idle)
+        self.ping_after = float(ping_after)
+
+        self._cond = threading.Condition()
+        self._idle = []  # pile (connexion, dernière utilisation)
+        self._size = 0
+        self._in_use = 0
+        self._pid = os.getpid()
+
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._max_wait = 0.0
+        self._timeouts = 0
+        self._recycled = 0
+        self._broken = 0
+
+    def _check_pid(self):
+        """Après un fork (gunicorn --preload), ne pas réutiliser les sockets du parent"""
+        if self._pid != os.getpid():
+            with self._cond:
+                self._pid = os.getpid()
+                self._idle = []
+                self._size = 0
+                self._in_use = 0
+
+    def _prune_idle(self):
+        """Ferme les connexions inactives depuis trop longtemps (verrou déjà pris)"""
+        now = time.monotonic()
+        kept = []
+        for conn, last_used in self._idle:
+            if now - last_used > self.max_idle and self._size > self.minconn:
+                self._size -= 1
+                self._recycled += 1
+                self._close_quietly(conn)
+            else:
+                kept.append((conn, last_used))
+        self._idle = kept
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_alive(self, conn, last_used):
+        if conn.closed or conn.get_transaction_status() == TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if time.monotonic() - last_used > self.ping_after:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    def getconn(self):
+        """Emprunte une connexion (lève PoolTimeout si le pool reste saturé)"""
+        self._check_pid()
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                self._prune_idle()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._size < self.maxconn:
+                    self._size += 1
+                    conn, last_used = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolTimeout(f"Aucune connexion disponible après {self.timeout:.1f}s")
+                waited = True
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            self._checkouts += 1
+            if waited:
+                wait = time.monotonic() - start
+                self._waits += 1
+                self._wait_time += wait
+                self._max_wait = max(self._max_wait, wait)
+
+        try:
+            if conn is not None and not self._is_alive(conn, last_used):
+                self._close_quietly(conn)
+                with self._cond:
+                    self._broken += 1
+                conn = None
+            if conn is None:
+                conn = self._connect()
+            return conn
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn):
+        """Rend une connexion au pool (annule toute transaction restée ouverte)"""
+        if self._pid != os.getpid():
+            return
+
+        reusable = not conn.closed
+        if reusable:
+            try:
+                status = conn.get_transaction_status()
+                if status == TRANSACTION_STATUS_UNKNOWN:
+                    reusable = False
+                elif status != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except Exception:
+                reusable = False
+
+        with self._cond:
+            self._in_use -= 1
+            if reusable:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._size -= 1
+                self._broken += 1
+                self._close_quietly(conn)
+            self._cond.notify()
+
+    def stats(self):
+        """Utilisation du pool et temps d'attente des emprunts"""
+        with self._cond:
+            return {
+                'size': self._size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'min_size': self.minconn,
+                'max_size': self.maxconn,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'avg_wait_ms': round(self._wait_time / self._waits * 1000, 2) if self._waits else 0.0,
+                'max_wait_ms': round(self._max_wait * 1000, 2),
+                'timeouts': self._timeouts,
+                'recycled': self._recycled,
+                'broken': self._broken
+            }
+
+    def closeall(self):
+        with self._cond:
+            for conn, _ in self._idle:
+                self._close_quietly(conn)
+            self._size -= len(self._idle)
+            self._idle = []
+
 
 class Database:
     def __init__(self):
@@ -19,29 +327,69 @@ class Database:
             'password': config.DB_PASSWORD
         }
 
-    def get_connection(self):
-        """Connexion DB"""
-        try:
-            if self.use_database_url:
-                db_url = self.database_url
+        self.pool = ConnectionPool(
+            self._connect,
+            minconn=config.DB_POOL_MIN,
+            maxconn=config.DB_POOL_MAX,
+            timeout=config.DB_POOL_TIMEOUT,
+            max_idle=config.DB_POOL_MAX_IDLE,
+            ping_after=config.DB_POOL_PING_AFTER
+        )
 
-                # Conversion Render → psycopg2
-                if db_url.startswith("postgres://"):
-                    db_url = db_url.replace("postgres://", "postgresql://", 1)
+    def _connect(self):
+        """Ouvre une nouvelle connexion physique"""
+        if self.use_database_url:
+            db_url = self.database_url
 
-                conn = psycopg2.connect(
-                    db_url,
-                    sslmode="require"
-                )
-            else:
-                conn = psycopg2.connect(**self.conn_params)
+            # Conversion Render → psycopg2
+            if db_url.startswith("postgres://"):
+                db_url = db_url.replace("postgres://", "postgresql://", 1)
 
-            return conn
+            return psycopg2.connect(
+                db_url,
+                sslmode="require"
+            )
+
+        return psycopg2.connect(**self.conn_params)
+
+    def get_connection(self):
+        """Connexion DB empruntée au pool (à rendre avec release_connection)"""
+        try:
+            with metrics.timer('malaria_db_connection_seconds'):
+                return self.pool.getconn()
 
         except Exception as e:
+            metrics.inc('malaria_db_connection_errors_total')
             print(f"Erreur de connexion à la base de données: {e}")
             return None
 
+    def release_connection(self, conn):
+        """Rend la connexion au pool"""
+        try:
+            self.pool.putconn(conn)
+        except Exception as e:
+            print(f"Erreur lors de la libération de la connexion: {e}")
+
+    def ping(self):
+        """Vérifie que la base répond"""
+        conn = self.get_connection()
+        if not conn:
+            return False
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+
+        except Exception:
+            return False
+
+        finally:
+            self.release_connection(conn)
+
+    def pool_stats(self):
+        return self.pool.stats()
+
 
     #############################################
     #                INIT DB                    #
@@ -76,6 +424,41 @@ class Database:
                     )
                 """)
 
+                # Index créés seulement s'ils manquent : même avec IF NOT EXISTS,
+                # CREATE INDEX bloque les écritures sur predictions
+                indexes = {
+                    # Historique par utilisateur (tri + pagination par curseur)
+                    'idx_predictions_user_created': "predictions (user_id, created_at DESC, id DESC)",
+                    # Exports tous utilisateurs : parcours dans l'ordre sans tri
+                    'idx_predictions_created': "predictions (created_at, id)"
+                }
+                for name, definition in indexes.items():
+                    cur.execute("SELECT to_regclass(%s) IS NULL", (name,))
+                    if cur.fetchone()[0]:
+                        cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+
+                # Statistiques par utilisateur, tenues à jour par trigger
+                cur.execute("SELECT to_regclass('user_prediction_stats') IS NULL")
+                stats_created = cur.fetchone()[0]
+                for statement in PREDICTION_STATS_SCHEMA:
+                    cur.execute(statement)
+                self._install_prediction_stats_triggers(cur)
+
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS prediction_cache (
+                        image_hash CHAR(64) NOT NULL,
+                        model_id CHAR(64) NOT NULL,
+                        probabilities JSONB NOT NULL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (image_hash, model_id)
+                    )
+                """)
+
+                if stats_created:
+                    cur.execute("SELECT EXISTS (SELECT 1 FROM predictions)")
+                    if cur.fetchone()[0]:
+                        print("⚠ Statistiques vides pour les prédictions existantes : lancez python backfill_stats.py")
+
             conn.commit()
             print("✓ Base de données initialisée")
             return True
@@ -86,7 +469,62 @@ class Database:
             return False
 
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+
+    def _missing_prediction_stats_triggers(self, cur):
+        """Triggers de statistiques absents de predictions"""
+        cur.execute("""
+            SELECT tgname FROM pg_trigger
+            WHERE tgrelid = 'predictions'::regclass AND tgname = ANY(%s)
+        """, (list(PREDICTION_STATS_TRIGGERS),))
+        present = {row[0] for row in cur.fetchall()}
+        return [name for name in PREDICTION_STATS_TRIGGERS if name not in present]
+
+    def _install_prediction_stats_triggers(self, cur, replace=False):
+        """
+        Crée la fonction et les triggers de statistiques s'ils manquent ; au
+        démarrage normal, deux lectures du catalogue et aucun verrou sur
+        predictions. replace=True les recrée (nouvelle version de la fonction).
+        """
+        if not replace and not self._missing_prediction_stats_triggers(cur):
+            return 0
+        # Workers démarrés en même temps : un seul crée, les autres revérifient
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('prediction_stats_triggers'))")
+        cur.execute("SELECT to_regprocedure('apply_prediction_stats()') IS NULL")
+        if replace or cur.fetchone()[0]:
+            cur.execute(PREDICTION_STATS_FUNCTION)
+        if replace:
+            for name in PREDICTION_STATS_TRIGGERS:
+                cur.execute(f"DROP TRIGGER IF EXISTS {name} ON predictions")
+        missing = self._missing_prediction_stats_triggers(cur)
+        for name in missing:
+            cur.execute(PREDICTION_STATS_TRIGGERS[name])
+        return len(missing)
+
+    def install_prediction_stats_triggers(self):
+        """
+        Recrée la fonction et les triggers de statistiques (après modification
+        de PREDICTION_STATS_FUNCTION). Verrouille brièvement predictions.
+        Retourne le nombre de triggers créés, None en cas d'erreur.
+        """
+        conn = self.get_connection()
+        if not conn:
+            return None
+
+        try:
+            with conn.cursor() as cur:
+                created = self._install_prediction_stats_triggers(cur, replace=True)
+            conn.commit()
+            return created
+
+        except Exception as e:
+            print(f"Erreur install_prediction_stats_triggers: {e}")
+            conn.rollback()
+            return None
+
+        finally:
+            self.release_connection(conn)
 
 
     #############################################
@@ -111,7 +549,7 @@ class Database:
             return None
 
         finally:
-            conn.close()
+            self.release_connection(conn)
 
 
     def create_user(self, username, email, password_hash):
@@ -141,7 +579,7 @@ class Database:
             return None
 
         finally:
-            conn.close()
+            self.release_connection(conn)
 
 
     #############################################
@@ -169,7 +607,73 @@ class Database:
             return None
 
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+
+    def save_predictions_batch(self, user_id, predictions):
+        """Enregistre plusieurs prédictions en un seul INSERT multi-lignes"""
+        if not predictions:
+            return []
+
+        conn = self.get_connection()
+        if not conn:
+            return None
+
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                rows = execute_values(cur, """
+                    INSERT INTO predictions (user_id, filename, predicted_class, confidence)
+                    VALUES %s
+                    RETURNING id, created_at
+                """, [
+                    (user_id, p['filename'], p['predicted_class'], p['confidence'])
+                    for p in predictions
+                ], page_size=len(predictions), fetch=True)
+
+                conn.commit()
+                return rows
+
+        except Exception as e:
+            print(f"Erreur save_predictions_batch: {e}")
+            conn.rollback()
+            return None
+
+        finally:
+            self.release_connection(conn)
+
+
+    def save_predictions_many(self, rows):
+        """
+        INSERT multi-lignes de prédictions de plusieurs utilisateurs.
+        rows : (user_id, filename, predicted_class, confidence, age_secondes),
+        created_at étant reculé de l'âge de la ligne (écriture différée).
+        """
+        if not rows:
+            return 0
+
+        conn = self.get_connection()
+        if not conn:
+            return None
+
+        try:
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                    INSERT INTO predictions (user_id, filename, predicted_class, confidence, created_at)
+                    VALUES %s
+                """, rows,
+                    template="(%s, %s, %s, %s, CURRENT_TIMESTAMP - %s * INTERVAL '1 second')",
+                    page_size=len(rows))
+
+            conn.commit()
+            return len(rows)
+
+        except Exception as e:
+            print(f"Erreur save_predictions_many: {e}")
+            conn.rollback()
+            return None
+
+        finally:
+            self.release_connection(conn)
 
 
     def get_user_predictions(self, user_id, limit=10):
@@ -183,7 +687,7 @@ class Database:
                     SELECT id, filename, predicted_class, confidence, created_at
                     FROM predictions
                     WHERE user_id=%s
-                    ORDER BY created_at DESC
+                    ORDER BY created_at DESC, id DESC
                     LIMIT %s
                 """, (user_id, limit))
 
@@ -194,7 +698,353 @@ class Database:
             return []
 
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+
+    def get_user_predictions_page(self, user_id, limit=20, cursor=None):
+        """
+        Page d'historique par curseur (keyset) : coût constant quelle que soit
+        la profondeur. Retourne (prédictions, curseur de la page suivante ou None).
+        """
+        position = decode_cursor(cursor) if cursor else None
+
+        conn = self.get_connection()
+        if not conn:
+            return [], None
+
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                if position is None:
+                    cur.execute("""
+                        SELECT id, filename, predicted_class, confidence, created_at
+                        FROM predictions
+                        WHERE user_id=%s
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT %s
+                    """, (user_id, limit + 1))
+                else:
+                    cur.execute("""
+                        SELECT id, filename, predicted_class, confidence, created_at
+                        FROM predictions
+                        WHERE user_id=%s AND (created_at, id) < (%s, %s)
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT %s
+                    """, (user_id, *position, limit + 1))
+
+                rows = cur.fetchall()
+                if len(rows) > limit:
+                    rows = rows[:limit]
+                    return rows, encode_cursor(rows[-1])
+                return rows, None
+
+        except Exception as e:
+            print(f"Erreur get_user_predictions_page: {e}")
+            return [], None
+
+        finally:
+            self.release_connection(conn)
+
+
+    #############################################
+    #                  EXPORT                   #
+    #############################################
+    def stream_predictions(self, user_id=None, start=None, end=None, predicted_class=None, chunk_size=1000):
+        """
+        Prédictions (toutes, ou d'un utilisateur) par lots de `chunk_size`
+        tuples dans l'ordre de EXPORT_COLUMNS, via un curseur nommé côté
+        serveur : la mémoire utilisée ne dépend pas du nombre de lignes.
+        Filtres appliqués en SQL : start <= created_at < end, classe prédite.
+
+        Générateur : la connexion n'est empruntée qu'à la première itération
+        et rendue à son épuisement ou à sa fermeture ; un générateur jamais
+        démarré (requête HEAD, client parti avant les données) ne garde rien.
+        Lève RuntimeError si la base est indisponible.
+        """
+        conditions = []
+        params = {'user_id': user_id, 'start': start, 'end': end, 'predicted_class': predicted_class}
+        if user_id is not None:
+            conditions.append("p.user_id = %(user_id)s")
+        if start is not None:
+            conditions.append("p.created_at >= %(start)s")
+        if end is not None:
+            conditions.append("p.created_at < %(end)s")
+        if predicted_class is not None:
+            conditions.append("p.predicted_class = %(predicted_class)s")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        conn = self.get_connection()
+        if not conn:
+            raise RuntimeError("Impossible de se connecter à la base de données")
+
+        try:
+            with conn.cursor(name=f"export_{os.getpid()}_{threading.get_ident()}") as cur:
+                cur.itersize = chunk_size
+                cur.execute(f"""
+                    SELECT p.id, p.user_id, u.username, p.filename, p.predicted_class,
+                           p.confidence, p.created_at
+                    FROM predictions p
+                    LEFT JOIN users u ON u.id = p.user_id
+                    {where}
+                    ORDER BY p.created_at, p.id
+                """, params)
+                while True:
+                    rows = cur.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+
+        except Exception as e:
+            # Export interrompu : l'erreur est propagée pour ne pas livrer un fichier tronqué
+            print(f"Erreur stream_predictions: {e}")
+            raise
+
+        finally:
+            # release_connection annule la transaction du curseur nommé
+            self.release_connection(conn)
+
+
+    #############################################
+    #          STATISTIQUES UTILISATEUR         #
+    #############################################
+    def get_user_stats(self, user_id, days=30):
+        """
+        Totaux par classe, confiance moyenne et comptes quotidiens des `days`
+        derniers jours, lus dans les tables d'agrégats : le coût ne dépend pas
+        du nombre de prédictions de l'utilisateur.
+        """
+        conn = self.get_connection()
+        if not conn:
+            return None
+
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    SELECT predicted_class, total, confidence_sum, last_prediction_at
+                    FROM user_prediction_stats
+                    WHERE user_id=%s AND total > 0
+                """, (user_id,))
+                by_class = cur.fetchall()
+
+                cur.execute("""
+                    SELECT day, predicted_class, total
+                    FROM user_daily_prediction_stats
+                    WHERE user_id=%s AND day > CURRENT_DATE - %s AND total > 0
+                    ORDER BY day
+                """, (user_id, days))
+                daily_rows = cur.fetchall()
+
+            total = sum(row['total'] for row in by_class)
+            confidence_sum = sum(row['confidence_sum'] for row in by_class)
+            last_dates = [row['last_prediction_at'] for row in by_class if row['last_prediction_at']]
+
+            daily = {}
+            for row in daily_rows:
+                day = daily.setdefault(row['day'], {'day': row['day'].isoformat(), 'total': 0, 'by_class': {}})
+                day['total'] += row['total']
+                day['by_class'][row['predicted_class']] = row['total']
+
+            return {
+                'total': total,
+                'mean_confidence': confidence_sum / total if total else None,
+                'last_prediction_at': max(last_dates).isoformat() if last_dates else None,
+                'by_class': {
+                    row['predicted_class']: {
+                        'count': row['total'],
+                        'mean_confidence': row['confidence_sum'] / row['total']
+                    }
+                    for row in by_class
+                },
+                'daily': list(daily.values())
+            }
+
+        except Exception as e:
+            print(f"Erreur get_user_stats: {e}")
+            return None
+
+        finally:
+            self.release_connection(conn)
+
+
+    def backfill_prediction_stats(self, user_id=None):
+        """
+        Recalcule les agrégats depuis predictions (données antérieures aux
+        triggers, ou vérification). Les écritures concurrentes sont bloquées
+        le temps du recalcul. Retourne le nombre de lignes d'agrégats écrites.
+        """
+        conn = self.get_connection()
+        if not conn:
+            return None
+
+        scope = "WHERE user_id IS NOT NULL" if user_id is None else "WHERE user_id = %(user_id)s"
+        params = {'user_id': user_id}
+        try:
+            with conn.cursor() as cur:
+                cur.execute("LOCK TABLE predictions IN SHARE MODE")
+                cur.execute(f"DELETE FROM user_prediction_stats {scope}", params)
+                cur.execute(f"DELETE FROM user_daily_prediction_stats {scope}", params)
+
+                cur.execute(f"""
+                    INSERT INTO user_prediction_stats
+                        (user_id, predicted_class, total, confidence_sum, last_prediction_at)
+                    SELECT user_id, predicted_class, COUNT(*), SUM(confidence), MAX(created_at)
+                    FROM predictions {scope}
+                    GROUP BY user_id, predicted_class
+                """, params)
+                written = cur.rowcount
+
+                cur.execute(f"""
+                    INSERT INTO user_daily_prediction_stats
+                        (user_id, day, predicted_class, total, confidence_sum)
+                    SELECT user_id, created_at::date, predicted_class, COUNT(*), SUM(confidence)
+                    FROM predictions {scope}
+                    GROUP BY user_id, created_at::date, predicted_class
+                """, params)
+                written += cur.rowcount
+
+            conn.commit()
+            return written
+
+        except Exception as e:
+            print(f"Erreur backfill_prediction_stats: {e}")
+            conn.rollback()
+            return None
+
+        finally:
+            self.release_connection(conn)
+
+
+    #############################################
+    #           CACHE DES PRÉDICTIONS           #
+    #############################################
+    def get_cached_prediction(self, image_hash, model_id):
+        """Retourne les probabilités en cache pour cette image et ce modèle"""
+        conn = self.get_connection()
+        if not conn:
+            return None
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT probabilities FROM prediction_cache
+                    WHERE image_hash=%s AND model_id=%s
+                """, (image_hash, model_id))
+                row = cur.fetchone()
+                return row[0] if row else None
+
+        except Exception as e:
+            print(f"Erreur get_cached_prediction: {e}")
+            return None
+
+        finally:
+            self.release_connection(conn)
+
+
+    def save_cached_prediction(self, image_hash, model_id, probabilities):
+        conn = self.get_connection()
+        if not conn:
+            return False
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    INSERT INTO prediction_cache (image_hash, model_id, probabilities)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (image_hash, model_id) DO NOTHING
+                """, (image_hash, model_id, Json(probabilities)))
+
+            conn.commit()
+            return True
+
+        except Exception as e:
+            print(f"Erreur save_cached_prediction: {e}")
+            conn.rollback()
+            return False
+
+        finally:
+            self.release_connection(conn)
+
+
+    def get_cached_predictions(self, image_hashes, model_id):
+        """Probabilités en cache de plusieurs images en une requête : {image_hash: probabilités}"""
+        if not image_hashes:
+            return {}
+
+        conn = self.get_connection()
+        if not conn:
+            return {}
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT image_hash, probabilities FROM prediction_cache
+                    WHERE model_id=%s AND image_hash = ANY(%s::char(64)[])
+                """, (model_id, list(image_hashes)))
+                return dict(cur.fetchall())
+
+        except Exception as e:
+            print(f"Erreur get_cached_predictions: {e}")
+            return {}
+
+        finally:
+            self.release_connection(conn)
+
+
+    def prediction_cache_models(self):
+        """Entrées du cache persistant par modèle (nombre, dernière écriture)"""
+        conn = self.get_connection()
+        if not conn:
+            return None
+
+        try:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute("""
+                    SELECT model_id, COUNT(*) AS entries, MAX(created_at) AS last_entry_at
+                    FROM prediction_cache
+                    GROUP BY model_id
+                    ORDER BY last_entry_at DESC
+                """)
+                return cur.fetchall()
+
+        except Exception as e:
+            print(f"Erreur prediction_cache_models: {e}")
+            return None
+
+        finally:
+            self.release_connection(conn)
+
+
+    def purge_prediction_cache(self, max_age_days):
+        """
+        Supprime les entrées des modèles qui n'ont rien écrit depuis
+        max_age_days jours. Un modèle encore servi (par n'importe quelle
+        version de l'application) ajoute des entrées et n'est pas touché.
+        """
+        conn = self.get_connection()
+        if not conn:
+            return None
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    DELETE FROM prediction_cache
+                    WHERE model_id IN (
+                        SELECT model_id FROM prediction_cache
+                        GROUP BY model_id
+                        HAVING MAX(created_at) < NOW() - make_interval(days => %s)
+                    )
+                """, (int(max_age_days),))
+                deleted = cur.rowcount
+
+            conn.commit()
+            return deleted
+
+        except Exception as e:
+            print(f"Erreur purge_prediction_cache: {e}")
+            conn.rollback()
+            return None
+
+        finally:
+            self.release_connection(conn)
 
 
 # Instance globale
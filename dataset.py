@@ -0,0 +1,92 @@
+"""
+Inventaire et découpage du jeu de données cell_images/
+
+Reproduit exactement les étapes 1 et 5 de traitement.ipynb (même ordre de
+parcours, même mélange pandas et mêmes appels à train_test_split avec
+RANDOM_STATE=42), afin que les outils (export, évaluation, scoring) utilisent
+le même ensemble de test que celui rapporté dans final_summary.csv.
+"""
+import os
+
+DATA_DIR = 'cell_images'
+CATEGORIES = ['Parasitized', 'Uninfected']
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+RANDOM_STATE = 42
+TEST_SIZE = 0.15
+VAL_SIZE = 0.15
+
+
+def list_images(data_dir=DATA_DIR, categories=CATEGORIES):
+    """Retourne (chemins, index de classe) dans l'ordre de parcours du notebook"""
+    filepaths = []
+    label_indices = []
+
+    for idx, cat in enumerate(categories):
+        folder = os.path.join(data_dir, cat)
+        if not os.path.isdir(folder):
+            raise FileNotFoundError(f"Dossier attendu non trouvé: {folder}")
+
+        files = [f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS)]
+        for fname in files:
+            filepaths.append(os.path.join(folder, fname))
+            label_indices.append(idx)
+
+    return filepaths, label_indices
+
+
+def split_dataset(data_dir=DATA_DIR, random_state=RANDOM_STATE):
+    """
+    Découpage train/val/test stratifié identique au notebook.
+    Retourne {'train': (X, y), 'val': (X, y), 'test': (X, y)} (tableaux numpy).
+    """
+    import pandas as pd
+    from sklearn.model_selection import train_test_split
+
+    filepaths, label_indices = list_images(data_dir)
+    df = pd.DataFrame({'filepath': filepaths, 'label_index': label_indices})
+    df = df.sample(frac=1, random_state=random_state).reset_index(drop=True)
+
+    X = df['filepath'].values
+    y = df['label_index'].values
+
+    X_trainval, X_test, y_trainval, y_test = train_test_split(
+        X, y, test_size=TEST_SIZE, stratify=y, random_state=random_state
+    )
+    X_train, X_val, y_train, y_val = train_test_split(
+        X_trainval, y_trainval, test_size=VAL_SIZE, stratify=y_trainval, random_state=random_state
+    )
+
+    return {
+        'train': (X_train, y_train),
+        'val': (X_val, y_val),
+        'test': (X_test, y_test)
+    }
+
+
+def summary_metrics(y_true, y_pred):
+    """
+    Accuracy / Sensitivity / Specificity / Precision / F1-Score calculés comme
+    dans traitement.ipynb (même convention que final_summary.csv :
+    TP = cm[1, 1], TN = cm[0, 0], FP = cm[0, 1], FN = cm[1, 0]).
+    """
+    import numpy as np
+
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    TP = int(np.sum((y_true == 1) & (y_pred == 1)))
+    TN = int(np.sum((y_true == 0) & (y_pred == 0)))
+    FP = int(np.sum((y_true == 0) & (y_pred == 1)))
+    FN = int(np.sum((y_true == 1) & (y_pred == 0)))
+
+    sensitivity = TP / (TP + FN) if (TP + FN) > 0 else 0
+    specificity = TN / (TN + FP) if (TN + FP) > 0 else 0
+    precision = TP / (TP + FP) if (TP + FP) > 0 else 0
+    f1_score = 2 * (precision * sensitivity) / (precision + sensitivity) if (precision + sensitivity) > 0 else 0
+
+    return {
+        'Accuracy': (TP + TN) / len(y_true) if len(y_true) else 0,
+        'Sensitivity': sensitivity,
+        'Specificity': specificity,
+        'Precision': precision,
+        'F1-Score': f1_score
+    }
@@ -0,0 +1,159 @@
+"""
+Évaluation de la cascade model_A → model_B → model_C sur l'ensemble de test
+
+Chaque modèle est exécuté une seule fois sur toutes les images de test
+(probabilités + temps CPU moyen par image) ; les seuils sont ensuite rejoués
+avec CascadePredictor sur ces probabilités, sans repasser par les modèles.
+Le coût d'une configuration = somme, par étage, des images qui y entrent
+multipliées par le coût CPU par image de ce modèle. Ce coût est le temps CPU
+de tout le processus (time.process_time, threads de TensorFlow compris) :
+il n'est fiable que si rien d'autre ne tourne dans le processus, d'où une
+mesure ici, hors service, plutôt que dans les statistiques de /health.
+
+Usage:
+    python evaluate_cascade.py
+    python evaluate_cascade.py --backend tflite --suffix _int8.tflite --limit 2000
+    python evaluate_cascade.py --thresholds 0.8 0.9 0.95 0.99 --final ensemble
+    python evaluate_cascade.py --packed cell_images_packed     # images lues dans le cache uint8
+"""
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+
+from cascade import CascadePredictor
+from config import config
+from dataset import split_dataset
+from inference import load_backend
+from preprocessing import preprocess_paths
+
+IMG_SIZE = (config.IMG_SIZE, config.IMG_SIZE)
+
+
+class PrecomputedBackend:
+    """Rejoue des probabilités déjà calculées : le « lot » est un tableau d'index"""
+
+    def __init__(self, probabilities):
+        self.probabilities = probabilities
+
+    def predict(self, indices):
+        return self.probabilities[indices]
+
+
+def score_model(backend, paths, batch_size=64, packed=None):
+    """Probabilités sur toutes les images et temps CPU (s) par image, hors prétraitement"""
+    load = packed.batch_for_paths if packed is not None else (lambda p: preprocess_paths(p, IMG_SIZE))
+    backend.predict(load(paths[:1]))  # préchauffage
+    outputs = []
+    cpu_time = 0.0
+    for start in range(0, len(paths), batch_size):
+        batch = load(paths[start:start + batch_size])
+        t0 = time.process_time()
+        outputs.append(np.asarray(backend.predict(batch), dtype=np.float32))
+        cpu_time += time.process_time() - t0
+    return np.concatenate(outputs, axis=0), cpu_time / len(paths)
+
+
+def simulate(names, probabilities, costs, y_test, threshold, final):
+    """Précision, coût moyen et répartition des décisions d'une configuration de cascade"""
+    stages = [(name, PrecomputedBackend(probabilities[name])) for name in names]
+    cascade = CascadePredictor(stages, threshold=threshold, final=final)
+    probs, routes = cascade.predict_with_routes(np.arange(len(y_test)))
+    stats = cascade.stats()
+
+    cost = sum(stage['images'] * costs[stage['model']] for stage in stats['stages']) / len(y_test)
+    row = {
+        'config': f"cascade_{final}",
+        'threshold': threshold,
+        'accuracy': round(float(np.mean(np.argmax(probs, axis=1) == y_test)), 4),
+        'cpu_ms_per_image': round(cost * 1000, 3),
+    }
+    for i, stage in enumerate(stats['stages']):
+        row[f"resolved_by_{stage['model']}"] = round(float(np.mean(routes == i)), 4)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Évaluation de la cascade de modèles")
+    parser.add_argument('--models', nargs='+', default=['model_A', 'model_B', 'model_C'],
+                        help="Du moins coûteux au plus coûteux")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--suffix', default='_best.h5', help="ex: _int8.tflite avec --backend tflite")
+    parser.add_argument('--backend', default=config.INFERENCE_BACKEND, choices=['keras', 'tflite'])
+    parser.add_argument('--data-dir', default='cell_images')
+    parser.add_argument('--packed', default=None, help="Cache produit par pack_dataset.py")
+    parser.add_argument('--thresholds', type=float, nargs='+',
+                        default=[0.6, 0.7, 0.8, 0.9, 0.95, 0.98, 0.99, 0.995])
+    parser.add_argument('--final', nargs='+', choices=['escalate', 'ensemble'],
+                        default=['escalate', 'ensemble'])
+    parser.add_argument('--limit', type=int, default=None,
+                        help="Limiter le nombre d'images de test")
+    parser.add_argument('--report-path', default=os.path.join('models', 'cascade_report.csv'))
+    args = parser.parse_args()
+
+    X_test, y_test = split_dataset(args.data_dir)['test']
+    if args.limit:
+        X_test, y_test = X_test[:args.limit], y_test[:args.limit]
+    y_test = np.asarray(y_test)
+
+    packed = None
+    if args.packed:
+        from pack_dataset import PackedDataset
+        packed = PackedDataset(args.packed, IMG_SIZE)
+
+    probabilities, costs = {}, {}
+    rows = []
+    for name in args.models:
+        path = os.path.join(args.models_dir, f"{name}{args.suffix}")
+        backend = load_backend(args.backend, path, num_threads=config.INFERENCE_THREADS)
+        if backend is None:
+            raise SystemExit(1)
+        print(f"▶ {name} sur {len(X_test)} images de test...")
+        probabilities[name], costs[name] = score_model(backend, X_test, packed=packed)
+        rows.append({
+            'config': name,
+            'threshold': '',
+            'accuracy': round(float(np.mean(np.argmax(probabilities[name], axis=1) == y_test)), 4),
+            'cpu_ms_per_image': round(costs[name] * 1000, 3)
+        })
+
+    for final in args.final:
+        for threshold in args.thresholds:
+            rows.append(simulate(args.models, probabilities, costs, y_test, threshold, final))
+
+    reference = rows[len(args.models) - 1]
+    fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+
+    print("\n" + "=" * 78)
+    print(f"{'Configuration':<20}{'Seuil':>8}{'Précision':>12}{'CPU/image':>14}{'vs ' + reference['config']:>16}")
+    print("-" * 78)
+    for row in rows:
+        ratio = row['cpu_ms_per_image'] / reference['cpu_ms_per_image'] if reference['cpu_ms_per_image'] else 0.0
+        threshold = f"{row['threshold']:.3f}" if row['threshold'] != '' else '-'
+        print(f"{row['config']:<20}{threshold:>8}{row['accuracy']:>12.4f}"
+              f"{row['cpu_ms_per_image']:>12.3f}ms{ratio:>15.1%}")
+    print("=" * 78)
+
+    # Configuration la moins coûteuse au moins aussi précise que le plus gros modèle, et moins chère
+    candidates = [r for r in rows[len(args.models):]
+                  if r['accuracy'] >= reference['accuracy'] and r['cpu_ms_per_image'] < reference['cpu_ms_per_image']]
+    if candidates:
+        best = min(candidates, key=lambda r: r['cpu_ms_per_image'])
+        print(f"✓ Recommandé: CASCADE_FINAL={best['config'].split('_', 1)[1]} "
+              f"CASCADE_THRESHOLD={best['threshold']} "
+              f"({best['accuracy']:.4f} vs {reference['accuracy']:.4f}, "
+              f"{best['cpu_ms_per_image'] / reference['cpu_ms_per_image']:.1%} du coût CPU)")
+    else:
+        print(f"⚠ Aucun seuil n'atteint la précision de {reference['config']} à moindre coût")
+
+    with open(args.report_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"✓ Rapport sauvegardé dans {args.report_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Précision gagnée et latence ajoutée par l'augmentation au test (TTA) sur
+l'ensemble de test (même découpage que traitement.ipynb)
+
+Le modèle est exécuté une fois sur les images telles quelles, puis une fois
+par nombre de symétries (2, 4, 8) sur toutes les images ; chaque seuil est
+ensuite rejoué sans repasser par le modèle : une image est recalculée si sa
+confiance de premier passage est sous le seuil (comme apply_tta dans app.py).
+
+La latence ajoutée est mesurée image par image (lot de 1, comme /predict) :
+surcoût d'une image recalculée, et surcoût moyen par requête au seuil donné.
+
+Usage:
+    python evaluate_tta.py
+    python evaluate_tta.py --model models/model_C_best.h5 --limit 2000
+    python evaluate_tta.py --backend tflite --model models/model_A_int8.tflite
+    python evaluate_tta.py --packed cell_images_packed
+"""
+import argparse
+import csv
+import os
+import time
+
+import numpy as np
+
+from config import config
+from dataset import split_dataset, summary_metrics
+from evaluate_cascade import score_model
+from inference import load_backend
+from preprocessing import preprocess_paths
+from tta import ALLOWED_TRANSFORMS, augment_batch, tta_predict
+
+IMG_SIZE = (config.IMG_SIZE, config.IMG_SIZE)
+
+
+def score_tta(backend, paths, transforms, first_pass, batch_size=64, packed=None):
+    """Probabilités TTA sur toutes les images (identité reprise de first_pass)"""
+    load = packed.batch_for_paths if packed is not None else (lambda p: preprocess_paths(p, IMG_SIZE))
+    outputs = []
+    for start in range(0, len(paths), batch_size):
+        batch = load(paths[start:start + batch_size])
+        outputs.append(tta_predict(backend.predict, batch, transforms,
+                                   first_pass=first_pass[start:start + batch_size]))
+    return np.concatenate(outputs, axis=0)
+
+
+def single_image_latency(backend, paths, transforms, samples=50, packed=None):
+    """(ms d'un passage simple, ms ajoutées par la TTA) pour une image seule"""
+    load = packed.batch_for_paths if packed is not None else (lambda p: preprocess_paths(p, IMG_SIZE))
+    images = load(paths[:samples])
+    backend.predict(images[:1])
+    backend.predict(augment_batch(images[:1], transforms, include_identity=False))
+
+    base, extra = [], []
+    for i in range(len(images)):
+        image = images[i:i + 1]
+        t0 = time.perf_counter()
+        backend.predict(image)
+        t1 = time.perf_counter()
+        backend.predict(augment_batch(image, transforms, include_identity=False))
+        t2 = time.perf_counter()
+        base.append(t1 - t0)
+        extra.append(t2 - t1)
+    return float(np.median(base)) * 1000, float(np.median(extra)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Précision / latence de l'augmentation au test")
+    parser.add_argument('--model', default=config.MODEL_PATH)
+    parser.add_argument('--backend', default=config.INFERENCE_BACKEND, choices=['keras', 'tflite'])
+    parser.add_argument('--data-dir', default='cell_images')
+    parser.add_argument('--packed', default=None, help="Cache produit par pack_dataset.py")
+    parser.add_argument('--transforms', type=int, nargs='+', default=list(ALLOWED_TRANSFORMS),
+                        choices=ALLOWED_TRANSFORMS)
+    parser.add_argument('--thresholds', type=float, nargs='+',
+                        default=[0.6, 0.7, 0.8, 0.9, 0.95, 0.99, 1.01],
+                        help="1.01 = TTA sur toutes les images")
+    parser.add_argument('--limit', type=int, default=None, help="Limiter le nombre d'images de test")
+    parser.add_argument('--latency-samples', type=int, default=50)
+    parser.add_argument('--report-path', default=os.path.join('models', 'tta_report.csv'))
+    args = parser.parse_args()
+
+    X_test, y_test = split_dataset(args.data_dir)['test']
+    if args.limit:
+        X_test, y_test = X_test[:args.limit], y_test[:args.limit]
+    y_test = np.asarray(y_test)
+
+    packed = None
+    if args.packed:
+        from pack_dataset import PackedDataset
+        packed = PackedDataset(args.packed, IMG_SIZE)
+
+    backend = load_backend(args.backend, args.model, num_threads=config.INFERENCE_THREADS)
+    if backend is None:
+        raise SystemExit(1)
+
+    print(f"▶ Premier passage sur {len(X_test)} images de test...")
+    first_pass, _ = score_model(backend, X_test, packed=packed)
+    confidence = first_pass.max(axis=1)
+    base_pred = np.argmax(first_pass, axis=1)
+    base_metrics = summary_metrics(y_test, base_pred)
+
+    rows = [{
+        'transforms': 1,
+        'threshold': '',
+        'triggered': 0.0,
+        'accuracy': round(base_metrics['Accuracy'], 4),
+        'f1_score': round(base_metrics['F1-Score'], 4),
+        'fixed': 0,
+        'broken': 0,
+        'extra_ms_per_triggered': 0.0,
+        'extra_ms_per_request': 0.0
+    }]
+    base_ms = None
+    for transforms in args.transforms:
+        print(f"▶ TTA x{transforms}...")
+        tta_probs = score_tta(backend, X_test, transforms, first_pass, packed=packed)
+        base_ms, extra_ms = single_image_latency(backend, X_test, transforms, args.latency_samples, packed)
+
+        for threshold in args.thresholds:
+            mask = confidence < threshold
+            pred = np.where(mask, np.argmax(tta_probs, axis=1), base_pred)
+            result = summary_metrics(y_test, pred)
+            rows.append({
+                'transforms': transforms,
+                'threshold': threshold,
+                'triggered': round(float(mask.mean()), 4),
+                'accuracy': round(result['Accuracy'], 4),
+                'f1_score': round(result['F1-Score'], 4),
+                # Erreurs corrigées / créées par la TTA
+                'fixed': int(np.sum((base_pred != y_test) & (pred == y_test))),
+                'broken': int(np.sum((base_pred == y_test) & (pred != y_test))),
+                'extra_ms_per_triggered': round(extra_ms, 3),
+                'extra_ms_per_request': round(extra_ms * float(mask.mean()), 3)
+            })
+
+    print("\n" + "=" * 92)
+    print(f"{'TTA':>5}{'Seuil':>8}{'Déclench.':>11}{'Précision':>11}{'F1':>9}{'Corrigées':>11}"
+          f"{'Cassées':>9}{'+ms/image':>12}{'+ms/requête':>14}")
+    print("-" * 92)
+    for row in rows:
+        threshold = f"{row['threshold']:.2f}" if row['threshold'] != '' else '-'
+        print(f"{'x' + str(row['transforms']):>5}{threshold:>8}{row['triggered']:>10.1%}{row['accuracy']:>11.4f}"
+              f"{row['f1_score']:>9.4f}{row['fixed']:>11}{row['broken']:>9}"
+              f"{row['extra_ms_per_triggered']:>12.2f}{row['extra_ms_per_request']:>14.3f}")
+    print("=" * 92)
+    if base_ms is not None:
+        print(f"Passage simple : {base_ms:.2f} ms par image (lot de 1)")
+
+    # Meilleur gain de précision par milliseconde ajoutée en moyenne
+    gains = [r for r in rows[1:] if r['accuracy'] > rows[0]['accuracy'] and r['extra_ms_per_request'] > 0]
+    if gains:
+        best = max(gains, key=lambda r: (r['accuracy'] - rows[0]['accuracy']) / r['extra_ms_per_request'])
+        print(f"✓ Recommandé: TTA_TRANSFORMS={best['transforms']} TTA_THRESHOLD={best['threshold']} "
+              f"({rows[0]['accuracy']:.4f} → {best['accuracy']:.4f}, "
+              f"+{best['extra_ms_per_request']:.2f} ms par requête en moyenne)")
+    else:
+        print("⚠ La TTA n'améliore pas la précision de ce modèle sur l'ensemble de test")
+
+    with open(args.report_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    print(f"✓ Rapport sauvegardé dans {args.report_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from database import EXPORT_COLUMNS
+
+# Formats d'export et type MIME de la réponse
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+def parse_date(value, end=False):
+    """
+    '2024-05-01' ou '2024-05-01T12:00:00' -> datetime (ValueError si invalide).
+    En fin de plage, une date seule inclut toute la journée.
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def encode_chunks(chunks, fmt):
+    """
+    Convertit les lots de tuples de db.stream_predictions en morceaux de
+    texte CSV (avec en-tête) ou NDJSON, un morceau par lot.
+    """
+    if fmt == 'csv':
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buf.getvalue()
+        for rows in chunks:
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows([_plain(v) for v in row] for row in rows)
+            yield buf.getvalue()
+    elif fmt == 'ndjson':
+        for rows in chunks:
+            yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, map(_plain, row)))) + '\n' for row in rows)
+    else:
+        raise ValueError(f"Format d'export inconnu: {fmt}")
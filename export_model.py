@@ -0,0 +1,214 @@
+"""
+Export des modèles Keras (model_A/B/C) vers TFLite, avec quantification int8
+optionnelle, et rapport de parité avec le modèle Keras sur l'ensemble de test
+
+Usage:
+    python export_model.py                              # float32
+    python export_model.py --quantize int8              # int8 calibré sur cell_images/
+    python export_model.py --models model_C --quantize int8 --limit 1000
+
+Le fichier produit se sert avec INFERENCE_BACKEND=tflite et
+MODEL_PATH=models/model_C_int8.tflite (tflite-runtime suffit, sans TensorFlow).
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from config import config
+from dataset import split_dataset, RANDOM_STATE
+from inference import load_backend
+from preprocessing import preprocess_paths
+
+IMG_SIZE = (config.IMG_SIZE, config.IMG_SIZE)
+
+
+def representative_dataset(paths):
+    """Images de calibration pour la quantification (une à la fois, comme à l'inférence)"""
+    def generator():
+        for path in paths:
+            yield [preprocess_paths([path], IMG_SIZE)]
+    return generator
+
+
+def export_tflite(h5_path, output_path, quantize=None, calibration_paths=None):
+    """Convertit un modèle .h5 en .tflite (float32 ou int8 avec entrées/sorties float32)"""
+    import tensorflow as tf
+    from tensorflow.keras.models import load_model
+
+    model = load_model(h5_path, compile=False)
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantize == 'int8':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = representative_dataset(calibration_paths)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+
+    tflite_model = converter.convert()
+
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(tflite_model)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def predict_all(backend, paths, batch_size=64):
+    """Probabilités pour toutes les images, par lots"""
+    outputs = []
+    for start in range(0, len(paths), batch_size):
+        outputs.append(np.asarray(backend.predict(preprocess_paths(paths[start:start + batch_size], IMG_SIZE))))
+    return np.concatenate(outputs, axis=0)
+
+
+def single_image_latency(backend, paths, n=200):
+    """Latence médiane (ms) d'une prédiction sur une seule image, comme /predict"""
+    images = [preprocess_paths([p], IMG_SIZE) for p in paths[:n]]
+    backend.predict(images[0])
+    timings = []
+    for img in images:
+        t0 = time.perf_counter()
+        backend.predict(img)
+        timings.append(time.perf_counter() - t0)
+    return float(np.median(timings) * 1000.0)
+
+
+_PROBE = """
+import json, resource, sys, time
+t0 = time.perf_counter()
+from inference import load_backend
+import numpy as np
+
+def peak_rss_mb():
+    # ru_maxrss survit au fork/exec depuis le parent : VmHWM est propre au processus
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+backend = load_backend(sys.argv[1], sys.argv[2])
+backend.predict(np.zeros((1, {size}, {size}, 3), dtype=np.float32))
+print(json.dumps({{
+    'cold_start_s': time.perf_counter() - t0,
+    'peak_rss_mb': peak_rss_mb(),
+    'tensorflow_imported': 'tensorflow' in sys.modules
+}}))
+"""
+
+
+def measure_process(backend_name, model_path):
+    """Démarrage à froid et mémoire résidente d'un processus neuf servant ce modèle"""
+    code = _PROBE.format(size=config.IMG_SIZE)
+    result = subprocess.run(
+        [sys.executable, '-c', code, backend_name, model_path],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    if result.returncode != 0 or not lines:
+        print(f"⚠ Mesure impossible pour {model_path}: {result.stderr.strip()[-300:]}")
+        return {'cold_start_s': None, 'peak_rss_mb': None, 'tensorflow_imported': None}
+    return json.loads(lines[-1])
+
+
+def parity_report(name, h5_path, tflite_path, X_test, y_test):
+    """Compare le modèle Keras et son export TFLite sur l'ensemble de test"""
+    keras_backend = load_backend('keras', h5_path)
+    tflite_backend = load_backend('tflite', tflite_path)
+
+    keras_probs = predict_all(keras_backend, X_test)
+    tflite_probs = predict_all(tflite_backend, X_test)
+    keras_pred = np.argmax(keras_probs, axis=1)
+    tflite_pred = np.argmax(tflite_probs, axis=1)
+
+    keras_proc = measure_process('keras', h5_path)
+    tflite_proc = measure_process('tflite', tflite_path)
+
+    return {
+        'model': name,
+        'tflite_file': os.path.basename(tflite_path),
+        'test_images': len(X_test),
+        'keras_accuracy': round(float(np.mean(keras_pred == y_test)), 4),
+        'tflite_accuracy': round(float(np.mean(tflite_pred == y_test)), 4),
+        'agreement': round(float(np.mean(keras_pred == tflite_pred)), 4),
+        'max_prob_diff': round(float(np.max(np.abs(keras_probs - tflite_probs))), 4),
+        'keras_latency_ms': round(single_image_latency(keras_backend, X_test), 2),
+        'tflite_latency_ms': round(single_image_latency(tflite_backend, X_test), 2),
+        'keras_rss_mb': keras_proc['peak_rss_mb'] and round(keras_proc['peak_rss_mb'], 1),
+        'tflite_rss_mb': tflite_proc['peak_rss_mb'] and round(tflite_proc['peak_rss_mb'], 1),
+        'keras_cold_start_s': keras_proc['cold_start_s'] and round(keras_proc['cold_start_s'], 2),
+        'tflite_cold_start_s': tflite_proc['cold_start_s'] and round(tflite_proc['cold_start_s'], 2),
+        'tflite_imports_tensorflow': tflite_proc['tensorflow_imported'],
+        'h5_size_mb': round(os.path.getsize(h5_path) / 1e6, 2),
+        'tflite_size_mb': round(os.path.getsize(tflite_path) / 1e6, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export TFLite des modèles et rapport de parité")
+    parser.add_argument('--models', nargs='+', default=['model_A', 'model_B', 'model_C'])
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--data-dir', default='cell_images')
+    parser.add_argument('--quantize', choices=['none', 'int8'], default='none')
+    parser.add_argument('--calibration-size', type=int, default=500,
+                        help="Nombre d'images d'entraînement pour calibrer l'int8")
+    parser.add_argument('--limit', type=int, default=None,
+                        help="Limiter le nombre d'images de test du rapport")
+    parser.add_argument('--no-report', action='store_true')
+    parser.add_argument('--report-path', default=os.path.join('models', 'export_report.csv'))
+    args = parser.parse_args()
+
+    splits = split_dataset(args.data_dir)
+    X_train, _ = splits['train']
+    X_test, y_test = splits['test']
+    if args.limit:
+        X_test, y_test = X_test[:args.limit], y_test[:args.limit]
+
+    random.seed(RANDOM_STATE)
+    calibration_paths = random.sample(list(X_train), min(args.calibration_size, len(X_train)))
+
+    suffix = '_int8' if args.quantize == 'int8' else ''
+    quantize = args.quantize if args.quantize != 'none' else None
+    rows = []
+
+    for name in args.models:
+        h5_path = os.path.join(args.models_dir, f"{name}_best.h5")
+        tflite_path = os.path.join(args.models_dir, f"{name}{suffix}.tflite")
+
+        print(f"\n▶ Export de {name} ({args.quantize})...")
+        export_tflite(h5_path, tflite_path, quantize=quantize, calibration_paths=calibration_paths)
+        print(f"✓ {tflite_path} ({os.path.getsize(tflite_path) / 1e6:.2f} MB)")
+
+        if not args.no_report:
+            print(f"▶ Parité Keras / TFLite sur {len(X_test)} images de test...")
+            rows.append(parity_report(name, h5_path, tflite_path, X_test, y_test))
+
+    if rows:
+        print("\n" + "=" * 100)
+        print(f"{'Modèle':<10}{'Acc Keras':>11}{'Acc TFLite':>12}{'Accord':>9}{'Lat. Keras':>12}"
+              f"{'Lat. TFLite':>13}{'RSS Keras':>11}{'RSS TFLite':>12}")
+        print("-" * 100)
+        for r in rows:
+            print(f"{r['model']:<10}{r['keras_accuracy']:>11.4f}{r['tflite_accuracy']:>12.4f}{r['agreement']:>9.4f}"
+                  f"{r['keras_latency_ms']:>10.2f}ms{r['tflite_latency_ms']:>11.2f}ms"
+                  f"{r['keras_rss_mb'] or 0:>9.0f}MB{r['tflite_rss_mb'] or 0:>10.0f}MB")
+        print("=" * 100)
+
+        with open(args.report_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"✓ Rapport sauvegardé dans {args.report_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Export de l'historique des prédictions (tous les utilisateurs ou un seul)
+en CSV ou NDJSON, pour les audits
+
+Les lignes sont lues par lots via un curseur nommé côté serveur et écrites
+au fil de l'eau : la mémoire utilisée reste constante quelle que soit la
+taille de la table. Les filtres (dates, classe, utilisateur) sont appliqués
+dans la requête SQL.
+
+Usage:
+    python export_predictions.py --output predictions.csv
+    python export_predictions.py --username alice --format ndjson --output alice.ndjson
+    python export_predictions.py --start 2024-01-01 --end 2024-03-31 --class Parasitized > t1.csv
+"""
+import argparse
+import sys
+import time
+
+from config import config
+from database import db
+from export import EXPORT_FORMATS, encode_chunks, parse_date
+
+CATEGORIES = ['Parasitized', 'Uninfected']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export des prédictions en CSV ou NDJSON")
+    who = parser.add_mutually_exclusive_group()
+    who.add_argument('--user-id', type=int, default=None)
+    who.add_argument('--username', default=None)
+    parser.add_argument('--start', default=None, help="Date de début incluse (AAAA-MM-JJ ou ISO)")
+    parser.add_argument('--end', default=None, help="Date de fin incluse (AAAA-MM-JJ) ou instant exclu (ISO)")
+    parser.add_argument('--class', dest='predicted_class', default=None, choices=CATEGORIES)
+    parser.add_argument('--format', default='csv', choices=list(EXPORT_FORMATS))
+    parser.add_argument('--output', default='-', help="Fichier de sortie (- = sortie standard)")
+    parser.add_argument('--chunk-size', type=int, default=config.EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    # Les messages vont sur stderr : stdout peut porter l'export
+    def log(message):
+        print(message, file=sys.stderr)
+
+    try:
+        start = parse_date(args.start)
+        end = parse_date(args.end, end=True)
+    except ValueError as e:
+        raise SystemExit(f"❌ Date invalide: {e}")
+
+    user_id = args.user_id
+    if args.username:
+        user = db.get_user_by_username(args.username)
+        if user is None:
+            raise SystemExit(f"❌ Utilisateur inconnu: {args.username}")
+        user_id = user['id']
+
+    if not db.ping():
+        raise SystemExit("❌ Impossible de se connecter à la base de données")
+    chunks = db.stream_predictions(user_id=user_id, start=start, end=end,
+                                   predicted_class=args.predicted_class, chunk_size=args.chunk_size)
+
+    rows = 0
+
+    def counted(chunks):
+        nonlocal rows
+        for chunk in chunks:
+            rows += len(chunk)
+            yield chunk
+
+    t0 = time.perf_counter()
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        for text in encode_chunks(counted(chunks), args.format):
+            out.write(text)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - t0
+
+    scope = f"utilisateur {user_id}" if user_id is not None else "tous les utilisateurs"
+    log(f"✓ {rows} prédiction(s) exportée(s) ({scope}) en {elapsed:.1f}s"
+        + (f" vers {args.output}" if args.output != '-' else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,291 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def load_inference_model(model_path):
+    """Charge le modèle Keras depuis le disque (None si indisponible)"""
+    from tensorflow.keras.models import load_model
+
+    try:
+        if os.path.exists(model_path):
+            # Inférence seule : pas besoin d'optimiseur ni de compile()
+            model = load_model(model_path, compile=False)
+            print(f"✓ Modèle chargé depuis: {model_path}")
+            return model
+
+        print(f"⚠ Fichier modèle introuvable: {model_path}")
+        print("⚠ L'application fonctionnera sans le modèle")
+        return None
+
+    except Exception as e:
+        print(f"⚠ Erreur lors du chargement du modèle: {e}")
+        print("⚠ L'application continuera sans le modèle")
+        return None
+
+
+def _import_tflite_interpreter():
+    """Interpréteur TFLite le plus léger disponible (sans importer TensorFlow si possible)"""
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    print("⚠ tflite-runtime absent : utilisation de tf.lite (TensorFlow complet)")
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class KerasBackend:
+    """
+    Modèle Keras complet (.h5 / .keras).
+
+    Par défaut, sert via une fonction de graphe compilée une seule fois
+    (tf.function à signature fixe (None, H, W, 3) float32) au lieu de
+    model.predict, qui recrée adaptateur de données et callbacks à chaque appel.
+    Les tailles de lot courantes sont exécutées au démarrage (préchauffage).
+    """
+    name = 'keras'
+
+    def __init__(self, model, compiled=True, warmup_batch_sizes=(1,)):
+        self.model = model
+        self.compiled = compiled
+        self._serve = None
+
+        if compiled:
+            import tensorflow as tf
+
+            input_shape = tuple(model.input_shape[1:])
+            self._serve = tf.function(
+                lambda x: model(x, training=False),
+                input_signature=[tf.TensorSpec((None, *input_shape), tf.float32)]
+            )
+            for batch_size in warmup_batch_sizes:
+                self._serve(tf.zeros((batch_size, *input_shape), tf.float32))
+
+    def predict(self, batch):
+        if self._serve is None:
+            return self.model.predict(batch, verbose=0)
+        return self._serve(np.asarray(batch, dtype=np.float32)).numpy()
+
+
+class TFLiteBackend:
+    """
+    Modèle exporté par export_model.py (.tflite, float32 ou quantifié int8),
+    exécuté avec tflite-runtime : TensorFlow n'est pas importé.
+    """
+    name = 'tflite'
+
+    def __init__(self, model_path, num_threads=None):
+        Interpreter = _import_tflite_interpreter()
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input['shape'][0])
+        # L'interpréteur n'est pas réentrant
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            shape = [batch_size, *self._input['shape'][1:]]
+            self.interpreter.resize_tensor_input(self._input['index'], shape)
+            self.interpreter.allocate_tensors()
+            self._batch_size = batch_size
+
+    def predict(self, batch):
+        with self._lock:
+            self._resize(len(batch))
+
+            input_dtype = self._input['dtype']
+            if input_dtype != np.float32:
+                scale, zero_point = self._input['quantization']
+                batch = np.round(batch / scale + zero_point).astype(input_dtype)
+            self.interpreter.set_tensor(self._input['index'], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self._output['index'])
+
+        if output.dtype != np.float32:
+            scale, zero_point = self._output['quantization']
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+def load_backend(backend, model_path, num_threads=None, compiled=True, warmup_batch_sizes=(1,)):
+    """Charge le modèle avec le moteur d'inférence choisi (None si indisponible)"""
+    if backend == 'keras':
+        model = load_inference_model(model_path)
+        if model is None:
+            return None
+        return KerasBackend(model, compiled=compiled, warmup_batch_sizes=warmup_batch_sizes)
+
+    if backend == 'tflite':
+        if not os.path.exists(model_path):
+            print(f"⚠ Fichier modèle introuvable: {model_path}")
+            print("⚠ L'application fonctionnera sans le modèle")
+            return None
+        try:
+            model = TFLiteBackend(model_path, num_threads=num_threads)
+            print(f"✓ Modèle TFLite chargé depuis: {model_path}")
+            return model
+        except Exception as e:
+            print(f"⚠ Erreur lors du chargement du modèle: {e}")
+            print("⚠ L'application continuera sans le modèle")
+            return None
+
+    raise ValueError(f"Moteur d'inférence inconnu: {backend} (attendu: keras ou tflite)")
+
+
+class MicroBatcher:
+    """
+    Regroupe les requêtes de prédiction concurrentes en un seul lot.
+
+    Chaque appel à `submit` dépose un tableau (n, H, W, 3) dans une file ;
+    un thread unique les concatène (jusqu'à `max_batch_size` images ou
+    `max_wait_ms` millisecondes d'attente), effectue une seule passe avant
+    avec `predict_fn`, puis renvoie à chaque appelant ses propres lignes.
+
+    Une requête seule part sans attendre : l'attente de `max_wait_ms` n'est
+    appliquée que si le lot précédent regroupait déjà plusieurs requêtes
+    (appels concurrents, donc workers threadés). Sinon, les requêtes
+    arrivées pendant une passe avant sont regroupées dans la suivante.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=5.0, on_batch=None):
+        self.predict_fn = predict_fn
+        # on_batch(images, requests) après chaque passe avant (métriques)
+        self.on_batch = on_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self._last_requests = 1
+
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._images = 0
+        self._max_seen = 0
+
+    def _ensure_worker(self):
+        """Démarre le thread de traitement (une fois par processus, après fork)"""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, img_array):
+        """Soumet un tableau (n, H, W, 3) et retourne un Future des probabilités (n, classes)"""
+        if img_array.ndim == 3:
+            img_array = img_array[np.newaxis, ...]
+
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("MicroBatcher fermé")
+            self._ensure_worker()
+            self._pending.append((img_array, future))
+            self._cond.notify()
+        return future
+
+    def predict(self, img_array, timeout=None):
+        """Version bloquante de `submit`"""
+        return self.submit(img_array).result(timeout=timeout)
+
+    def _collect(self):
+        """
+        Attend la première requête puis remplit le lot avec les requêtes en
+        file ; n'attend l'échéance que sous charge concurrente (voir la classe)
+        """
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return []
+
+            items = [self._pending.popleft()]
+            size = len(items[0][0])
+            wait = self.max_wait if self._last_requests > 1 else 0.0
+            deadline = time.monotonic() + wait
+
+            while size < self.max_batch_size:
+                if not self._pending:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or self._closed:
+                        break
+                    self._cond.wait(remaining)
+                    continue
+                if size + len(self._pending[0][0]) > self.max_batch_size:
+                    break
+                item = self._pending.popleft()
+                items.append(item)
+                size += len(item[0])
+
+            self._last_requests = len(items)
+            return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            if not items:
+                return
+
+            # Futures annulés entre-temps : inutile de les calculer
+            items = [item for item in items if item[1].set_running_or_notify_cancel()]
+            if not items:
+                continue
+
+            try:
+                batch = items[0][0] if len(items) == 1 else np.concatenate([a for a, _ in items], axis=0)
+                predictions = np.asarray(self.predict_fn(batch))
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+
+            offset = 0
+            for img_array, future in items:
+                n = len(img_array)
+                future.set_result(predictions[offset:offset + n])
+                offset += n
+
+            with self._stats_lock:
+                self._batches += 1
+                self._images += len(batch)
+                self._max_seen = max(self._max_seen, len(batch))
+            if self.on_batch is not None:
+                self.on_batch(len(batch), len(items))
+
+    def stats(self):
+        """Statistiques de regroupement depuis le démarrage"""
+        with self._stats_lock:
+            return {
+                'batches': self._batches,
+                'images': self._images,
+                'avg_batch_size': round(self._images / self._batches, 2) if self._batches else 0.0,
+                'max_batch_size_seen': self._max_seen,
+                'pending': len(self._pending),
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0
+            }
+
+    def close(self):
+        """Arrête le thread après avoir traité les requêtes déjà en file"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=5)
@@ -0,0 +1,175 @@
+import atexit
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class JobQueue:
+    """
+    Prédictions asynchrones sans broker externe.
+
+    `submit` confie l'image à un pool de threads du worker (qui partagent le
+    modèle déjà chargé) et rend immédiatement un identifiant de job. L'état
+    de chaque job est écrit dans `job_dir/<id>.json` : n'importe quel worker
+    gunicorn peut donc répondre au suivi (polling ou server-sent events),
+    pas seulement celui qui exécute le job.
+
+    Le nombre de jobs en attente est borné (`max_pending`) ; au-delà,
+    `submit` retourne None. Les fichiers de plus de `ttl` secondes sont
+    supprimés au fil des soumissions.
+    """
+
+    FINAL_STATUSES = ('done', 'error')
+
+    def __init__(self, handler, job_dir, workers=2, max_pending=64, ttl=3600, poll_interval=0.25):
+        self.handler = handler
+        self.job_dir = job_dir
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        os.makedirs(job_dir, exist_ok=True)
+
+        # Threads créés au premier submit (après le fork des workers gunicorn)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prediction-job')
+        self._changed = threading.Condition()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._last_cleanup = 0.0
+        atexit.register(self.close)
+
+    def _path(self, job_id):
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _write(self, job):
+        path = self._path(job['id'])
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp_path, path)
+        with self._changed:
+            self._changed.notify_all()
+
+    def _read(self, job_id):
+        if not JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def submit(self, owner, payload):
+        """Met le job en file ; retourne son identifiant, ou None si la file est pleine"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                return None
+            self._pending += 1
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'owner': owner,
+            'status': 'queued',
+            'created_at': time.time()
+        }
+        try:
+            self._write(job)
+            self._executor.submit(self._run, job, payload)
+        except Exception as e:
+            print(f"Erreur submit job: {e}")
+            with self._lock:
+                self._pending -= 1
+            return None
+
+        self._cleanup()
+        return job['id']
+
+    def _run(self, job, payload):
+        job.update(status='running', started_at=time.time())
+        try:
+            self._write(job)
+            result, error = self.handler(payload)
+        except Exception as e:
+            result, error = None, f"Erreur lors du traitement: {e}"
+
+        job['finished_at'] = time.time()
+        if error:
+            job.update(status='error', error=error)
+        else:
+            job.update(status='done', result=result)
+
+        with self._lock:
+            self._pending -= 1
+            if error:
+                self._failed += 1
+            else:
+                self._completed += 1
+        try:
+            self._write(job)
+        except OSError as e:
+            print(f"Erreur écriture job {job['id']}: {e}")
+
+    def get(self, job_id, owner=None):
+        """État du job (sans le propriétaire), None s'il est inconnu ou à un autre utilisateur"""
+        job = self._read(job_id)
+        if job is None or (owner is not None and job.get('owner') != owner):
+            return None
+        job.pop('owner', None)
+        return job
+
+    def wait(self, job_id, status=None, owner=None, timeout=15.0):
+        """
+        Attend que le job quitte l'état `status` (ou `timeout` secondes).
+        Un job de ce worker réveille l'attente aussitôt ; ceux des autres
+        workers sont relus toutes les `poll_interval` secondes.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.get(job_id, owner)
+            if job is None or job['status'] != status:
+                return job
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return job
+            with self._changed:
+                self._changed.wait(min(self.poll_interval, remaining))
+
+    def _cleanup(self):
+        """Supprime les jobs expirés (au plus une fois par minute)"""
+        now = time.time()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        try:
+            for entry in os.listdir(self.job_dir):
+                path = os.path.join(self.job_dir, entry)
+                try:
+                    if now - os.path.getmtime(path) > self.ttl:
+                        os.remove(path)
+                except OSError:
+                    continue
+        except OSError as e:
+            print(f"Erreur nettoyage des jobs: {e}")
+
+    def close(self, wait=True):
+        """Termine les jobs en cours avant l'arrêt du processus"""
+        self._executor.shutdown(wait=wait, cancel_futures=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'completed': self._completed,
+                'failed': self._failed,
+                'rejected': self._rejected,
+                'max_pending': self.max_pending
+            }
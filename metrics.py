@@ -0,0 +1,372 @@
+"""
+Instrumentation du chemin critique et endpoint /metrics (format Prometheus)
+
+- stage(nom) : durée d'une étape de la requête en cours (histogramme
+  malaria_stage_duration_seconds et, si activé, en-tête Server-Timing)
+- observe() / inc() : histogrammes et compteurs déclarés dans METRICS
+- sous gunicorn, chaque worker écrit périodiquement ses valeurs dans
+  METRICS_DIR/worker-<pid>.json ; /metrics additionne tous les fichiers
+- /metrics exige le jeton METRICS_TOKEN s'il est défini, sinon n'est servi
+  qu'aux requêtes locales
+
+Désactivé (METRICS_ENABLED=False), chaque appel se réduit à un test de booléen.
+"""
+import atexit
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+from flask import g, has_request_context, request, Response
+
+# Bornes des histogrammes : secondes et octets
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LOAD_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+# nom -> (type, aide, étiquettes, bornes)
+METRICS = {
+    'malaria_request_duration_seconds': (
+        'histogram', "Durée des requêtes HTTP", ('endpoint',), DURATION_BUCKETS),
+    'malaria_requests_total': (
+        'counter', "Requêtes HTTP par route et code de réponse", ('endpoint', 'status'), None),
+    'malaria_stage_duration_seconds': (
+        'histogram', "Durée des étapes du traitement (upload, preprocess, inference, db...)",
+        ('endpoint', 'stage'), DURATION_BUCKETS),
+    'malaria_upload_size_bytes': (
+        'histogram', "Taille des fichiers envoyés", ('endpoint',), SIZE_BUCKETS),
+    'malaria_errors_total': (
+        'counter', "Erreurs par type", ('endpoint', 'kind'), None),
+    'malaria_tta_images_total': (
+        'counter', "Images recalculées par TTA (confiance sous le seuil)", ('endpoint',), None),
+    'malaria_batch_images': (
+        'histogram', "Images par passe avant du micro-batcher", (), BATCH_BUCKETS),
+    'malaria_batch_requests': (
+        'histogram', "Requêtes regroupées par passe avant du micro-batcher", (), BATCH_BUCKETS),
+    'malaria_model_load_seconds': (
+        'histogram', "Durée de chargement du modèle au démarrage d'un worker", ('backend',), LOAD_BUCKETS),
+    'malaria_db_connection_seconds': (
+        'histogram', "Attente d'une connexion du pool PostgreSQL", (), DURATION_BUCKETS),
+    'malaria_db_connection_errors_total': (
+        'counter', "Échecs d'obtention d'une connexion PostgreSQL", (), None),
+}
+
+_enabled = False
+_server_timing = False
+_metrics_dir = None
+_flush_interval = 5.0
+_last_flush = 0.0
+_lock = threading.Lock()
+# nom -> {valeurs d'étiquettes: compteur} ou {valeurs: [comptes par borne..., +Inf, somme]}
+_values = {name: {} for name in METRICS}
+
+
+def _before_fork():
+    """
+    Avant un fork (gunicorn --preload) : les valeurs du processus maître
+    (chargement du modèle...) sont écrites une fois dans son propre fichier
+    """
+    flush()
+
+
+def _after_fork_in_child():
+    """Le worker repart de zéro : les valeurs héritées ne sont comptées que chez le maître"""
+    global _lock, _values, _last_flush
+    _lock = threading.Lock()
+    _values = {name: {} for name in METRICS}
+    _last_flush = 0.0
+
+
+os.register_at_fork(before=_before_fork, after_in_child=_after_fork_in_child)
+
+
+def configure(enabled=True, metrics_dir=None, flush_interval=5.0):
+    """Active la collecte ; metrics_dir : dossier partagé entre les workers gunicorn"""
+    global _enabled, _metrics_dir, _flush_interval
+    _enabled = enabled
+    _flush_interval = flush_interval
+    _metrics_dir = metrics_dir or None
+    if _enabled and _metrics_dir:
+        os.makedirs(_metrics_dir, exist_ok=True)
+        compact_dead_shards(_metrics_dir)
+        atexit.register(flush)
+
+
+def observe(name, value, *labels):
+    """Ajoute une observation à l'histogramme name (étiquettes dans l'ordre de METRICS)"""
+    if not _enabled:
+        return
+    buckets = METRICS[name][3]
+    index = bisect.bisect_left(buckets, value)
+    with _lock:
+        series = _values[name].get(labels)
+        if series is None:
+            series = _values[name][labels] = [0] * (len(buckets) + 1) + [0.0]
+        series[index] += 1
+        series[-1] += value
+
+
+def inc(name, *labels, amount=1):
+    """Incrémente le compteur name"""
+    if not _enabled:
+        return
+    with _lock:
+        _values[name][labels] = _values[name].get(labels, 0) + amount
+
+
+class _Timer:
+    """Chronomètre de bloc with ; callback(secondes) appelé à la sortie"""
+    __slots__ = ('callback', 'args', 'start')
+
+    def __init__(self, callback, *args):
+        self.callback = callback
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.callback(*self.args, time.perf_counter() - self.start)
+        return False
+
+
+# Contexte vide partagé : coût quasi nul quand l'instrumentation est coupée
+_NULL_CONTEXT = nullcontext()
+
+
+def timer(name, *labels):
+    """Chronomètre le bloc dans l'histogramme name"""
+    if not _enabled:
+        return _NULL_CONTEXT
+    return _Timer(lambda seconds: observe(name, seconds, *labels))
+
+
+def current_endpoint():
+    """Route Flask de la requête en cours ('' hors requête, 'unknown' si aucune route)"""
+    if not has_request_context():
+        return ''
+    return request.endpoint or 'unknown'
+
+
+def stage(name):
+    """Chronomètre une étape du traitement de la requête en cours"""
+    if not (_enabled or _server_timing):
+        return _NULL_CONTEXT
+    return _Timer(record_stage, name)
+
+
+def record_stage(name, seconds):
+    """Ajoute la durée d'une étape à la requête en cours"""
+    observe('malaria_stage_duration_seconds', seconds, current_endpoint(), name)
+    if not _server_timing or not has_request_context():
+        return
+    if 'stage_timings' not in g:
+        g.stage_timings = []
+    g.stage_timings.append((name, seconds))
+
+
+def server_timing_header(timings):
+    """Valeur de l'en-tête Server-Timing (durées en millisecondes)"""
+    return ', '.join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings)
+
+
+#############################################
+#       AGRÉGATION ENTRE LES WORKERS        #
+#############################################
+def snapshot():
+    """Copie des valeurs de ce processus, sérialisable en JSON"""
+    with _lock:
+        return {
+            name: [[list(labels), value if isinstance(value, (int, float)) else list(value)]
+                   for labels, value in series.items()]
+            for name, series in _values.items() if series
+        }
+
+
+def merge(total, shard):
+    """Additionne un snapshot dans total (même structure que _values)"""
+    for name, series in shard.items():
+        if name not in METRICS:
+            continue
+        target = total.setdefault(name, {})
+        for labels, value in series:
+            labels = tuple(labels)
+            if isinstance(value, list):
+                current = target.get(labels)
+                target[labels] = value if current is None else [a + b for a, b in zip(current, value)]
+            else:
+                target[labels] = target.get(labels, 0) + value
+    return total
+
+
+def _shard_path(metrics_dir, pid=None):
+    return os.path.join(metrics_dir, f"worker-{pid or os.getpid()}.json")
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def flush():
+    """Écrit les valeurs de ce worker dans son fichier de METRICS_DIR"""
+    global _last_flush
+    if not (_enabled and _metrics_dir):
+        return
+    _last_flush = time.monotonic()
+    try:
+        _write_json(_shard_path(_metrics_dir), snapshot())
+    except OSError as e:
+        print(f"⚠ Écriture des métriques impossible: {e}")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def compact_dead_shards(metrics_dir):
+    """
+    Regroupe les fichiers des workers arrêtés (redémarrage, max_requests) dans
+    dead.json : les compteurs restent croissants sans multiplier les fichiers.
+    """
+    with open(os.path.join(metrics_dir, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        dead_path = os.path.join(metrics_dir, 'dead.json')
+        total = None
+        for entry in os.listdir(metrics_dir):
+            if not (entry.startswith('worker-') and entry.endswith('.json')):
+                continue
+            try:
+                pid = int(entry[len('worker-'):-len('.json')])
+            except ValueError:
+                continue
+            if pid != os.getpid() and _pid_alive(pid):
+                continue
+            if total is None:
+                total = merge({}, _read_json(dead_path))
+            merge(total, _read_json(os.path.join(metrics_dir, entry)))
+            os.remove(os.path.join(metrics_dir, entry))
+        if total is not None:
+            _write_json(dead_path, {
+                name: [[list(labels), value] for labels, value in series.items()]
+                for name, series in total.items()
+            })
+
+
+def collect():
+    """Valeurs de tous les workers (ou de ce processus sans METRICS_DIR)"""
+    if not _metrics_dir:
+        return merge({}, snapshot())
+
+    flush()
+    with open(os.path.join(_metrics_dir, '.lock'), 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        total = {}
+        for entry in sorted(os.listdir(_metrics_dir)):
+            if entry.endswith('.json'):
+                merge(total, _read_json(os.path.join(_metrics_dir, entry)))
+    return total
+
+
+#############################################
+#            FORMAT PROMETHEUS              #
+#############################################
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def render_prometheus(values):
+    """Texte d'exposition Prometheus (version 0.0.4)"""
+    lines = []
+    for name, (kind, help_text, label_names, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(values.get(name, {}).items()):
+            if kind == 'counter':
+                lines.append(f"{name}{_format_labels(label_names, labels)} {value}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], value[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(label_names, labels, ('le', bound))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(label_names, labels)} {value[-1]}")
+            lines.append(f"{name}_count{_format_labels(label_names, labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+
+def _authorized(token):
+    """Jeton Bearer si configuré, sinon requête locale directe (pas via un proxy)"""
+    if token:
+        return request.headers.get('Authorization') == f"Bearer {token}"
+    return request.remote_addr in LOOPBACK_ADDRESSES and 'X-Forwarded-For' not in request.headers
+
+
+def init_app(app, enabled=True, server_timing=False, metrics_dir=None, flush_interval=5.0, token=None):
+    """
+    Durées et compteurs par requête, route /metrics et, si server_timing,
+    en-tête Server-Timing avec les durées par étape.
+    """
+    global _server_timing
+    _server_timing = server_timing
+    configure(enabled, metrics_dir, flush_interval)
+
+    if not (_enabled or _server_timing):
+        return
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        if _server_timing:
+            timings = g.get('stage_timings')
+            if timings:
+                response.headers['Server-Timing'] = server_timing_header(timings)
+
+        if _enabled and request.endpoint != 'metrics_endpoint':
+            endpoint = current_endpoint()
+            start = g.get('request_start')
+            if start is not None:
+                observe('malaria_request_duration_seconds', time.perf_counter() - start, endpoint)
+            inc('malaria_requests_total', endpoint, str(response.status_code))
+            if _metrics_dir and time.monotonic() - _last_flush >= _flush_interval:
+                flush()
+        return response
+
+    if not _enabled:
+        return
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        """Métriques de tous les workers, au format texte Prometheus"""
+        if not _authorized(token):
+            return Response("Unauthorized\n", status=401, mimetype='text/plain')
+        return Response(render_prometheus(collect()), mimetype='text/plain; version=0.0.4; charset=utf-8')
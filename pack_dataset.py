@@ -0,0 +1,160 @@
+"""
+Cache prétraité de cell_images/ en tableau uint8 mappé en mémoire
+
+Les images sont décodées et redimensionnées une seule fois (même
+prétraitement que l'application) dans un dossier :
+
+    pixels.npy   tableau (N, H, W, 3) uint8, lu avec np.load(mmap_mode='r')
+    index.csv    position, filepath, label_index (ordre de parcours du notebook)
+    meta.json    taille des images, nombre d'images, catégories
+
+27 558 images en 128x128 occupent ~1,35 Go sur disque (au lieu de ~5,4 Go de
+float32 en RAM) ; seules les pages lues sont chargées, et la normalisation
+/ 255 se fait lot par lot.
+
+Usage:
+    python pack_dataset.py                                  # cell_images -> cell_images_packed
+    python pack_dataset.py --data-dir archive --output archive_packed --workers 8
+
+    from pack_dataset import PackedDataset
+    packed = PackedDataset('cell_images_packed')
+    X = packed.batch_for_paths(X_test_paths)      # float32 normalisé
+"""
+import argparse
+import csv
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from config import config
+from dataset import DATA_DIR, CATEGORIES, list_images
+from preprocessing import normalize_image
+from score_images import prefetched_batches
+
+PIXELS_FILE = 'pixels.npy'
+INDEX_FILE = 'index.csv'
+META_FILE = 'meta.json'
+
+
+def pack_dataset(data_dir, output_dir, target_size, workers=4, batch_size=512):
+    """Décode toutes les images une fois et écrit le cache (remplacé atomiquement)"""
+    filepaths, label_indices = list_images(data_dir)
+    tmp_dir = output_dir.rstrip('/') + '.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    pixels = np.lib.format.open_memmap(
+        os.path.join(tmp_dir, PIXELS_FILE), mode='w+', dtype=np.uint8,
+        shape=(len(filepaths), *target_size, 3)
+    )
+
+    index = []  # (filepath, label_index) des images décodées, dans l'ordre du tableau
+    position = 0
+    start = time.perf_counter()
+    for chunk, batch, errors in prefetched_batches(filepaths, batch_size, workers, 2 * workers):
+        for i, path in enumerate(chunk):
+            if i in errors:
+                print(f"⚠ Image ignorée {path}: {errors[i]}")
+            else:
+                pixels[len(index)] = batch[i]
+                index.append((path, label_indices[position + i]))
+        position += len(chunk)
+        print(f"  {position}/{len(filepaths)} images - {position / (time.perf_counter() - start):.0f} img/s")
+
+    pixels.flush()
+    del pixels
+
+    with open(os.path.join(tmp_dir, INDEX_FILE), 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['position', 'filepath', 'label_index'])
+        for i, (path, label) in enumerate(index):
+            writer.writerow([i, path, label])
+
+    with open(os.path.join(tmp_dir, META_FILE), 'w') as f:
+        json.dump({
+            'data_dir': data_dir,
+            'img_size': list(target_size),
+            # Les lignes au-delà de count (images illisibles) ne sont jamais lues
+            'count': len(index),
+            'categories': CATEGORIES
+        }, f, indent=2)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    return len(index), time.perf_counter() - start
+
+
+class PackedDataset:
+    """
+    Lecture paresseuse d'un cache produit par pack_dataset : rien n'est
+    chargé en mémoire à l'ouverture, les lots sont copiés puis normalisés
+    à la demande.
+    """
+
+    def __init__(self, path, img_size=None):
+        with open(os.path.join(path, META_FILE)) as f:
+            self.meta = json.load(f)
+        if img_size is not None and tuple(self.meta['img_size']) != tuple(img_size):
+            raise ValueError(f"Cache {path} en {self.meta['img_size']}, attendu {list(img_size)}")
+
+        self.path = path
+        self.pixels = np.load(os.path.join(path, PIXELS_FILE), mmap_mode='r')[:self.meta['count']]
+
+        filepaths, labels = [], []
+        with open(os.path.join(path, INDEX_FILE), newline='') as f:
+            for row in csv.DictReader(f):
+                filepaths.append(row['filepath'])
+                labels.append(int(row['label_index']))
+        self.filepaths = np.asarray(filepaths)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self._positions = {p: i for i, p in enumerate(filepaths)}
+
+    def __len__(self):
+        return len(self.filepaths)
+
+    def positions(self, paths):
+        """Positions dans le tableau des chemins donnés (ex: X_test de split_dataset)"""
+        try:
+            return np.fromiter((self._positions[p] for p in paths), dtype=np.int64, count=len(paths))
+        except KeyError as e:
+            raise KeyError(f"Image absente du cache {self.path}: {e.args[0]}") from None
+
+    def batch(self, positions, out=None):
+        """Lot (n, H, W, 3) float32 normalisé ; les positions triées lisent le disque séquentiellement"""
+        positions = np.asarray(positions)
+        return normalize_image(self.pixels[positions], out=out)
+
+    def batch_for_paths(self, paths, out=None):
+        return self.batch(self.positions(paths), out=out)
+
+    def iter_batches(self, positions, batch_size=256):
+        """Lots successifs (positions, float32) sans jamais matérialiser tout le jeu"""
+        buf = np.empty((batch_size, *self.pixels.shape[1:]), dtype=np.float32)
+        for start in range(0, len(positions), batch_size):
+            chunk = positions[start:start + batch_size]
+            yield chunk, self.batch(chunk, out=buf[:len(chunk)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cache uint8 mappé en mémoire du jeu d'images")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--output', default=None, help="Dossier du cache (défaut: <data-dir>_packed)")
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument('--batch-size', type=int, default=512)
+    args = parser.parse_args()
+
+    output = args.output or args.data_dir.rstrip('/') + '_packed'
+    target_size = (config.IMG_SIZE, config.IMG_SIZE)
+
+    print(f"▶ Compactage de {args.data_dir} en {target_size[0]}x{target_size[1]} uint8...")
+    count, elapsed = pack_dataset(args.data_dir, output, target_size,
+                                  workers=args.workers, batch_size=args.batch_size)
+    size = os.path.getsize(os.path.join(output, PIXELS_FILE)) / 1e9
+    print(f"✓ {count} images en {elapsed:.1f}s -> {output} ({size:.2f} Go)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """Empreinte SHA-256 d'un fichier lu par blocs"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def model_identity(model_path):
+    """
+    Identité du modèle servi : empreinte du contenu du fichier.
+    Change dès que MODEL_PATH pointe vers un autre fichier ou que le fichier est remplacé.
+    """
+    try:
+        return file_sha256(model_path)
+    except OSError:
+        # Fichier illisible : on se rabat sur le chemin et la date de modification
+        stat = os.stat(model_path) if os.path.exists(model_path) else None
+        raw = f"{os.path.abspath(model_path)}:{stat.st_size if stat else 0}:{stat.st_mtime_ns if stat else 0}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cascade_identity(model_paths, threshold, final):
+    """Identité d'une cascade : modèles, dans l'ordre, et règle de routage"""
+    raw = '|'.join([model_identity(path) for path in model_paths] + [f"{float(threshold):.6f}", final])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def tta_identity(model_id, threshold, transforms):
+    """Identité du modèle servi avec TTA : les probabilités mises en cache en dépendent"""
+    raw = f"{model_id}|tta|{float(threshold):.6f}|{int(transforms)}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class PredictionCache:
+    """
+    Cache des probabilités prédites, adressé par le contenu de l'image.
+
+    - Niveau 1 : LRU borné en mémoire (par processus)
+    - Niveau 2 (optionnel) : table prediction_cache de PostgreSQL,
+      partagée entre workers gunicorn et conservée après redémarrage
+
+    Les clés incluent l'identité du modèle : changer de modèle invalide
+    automatiquement toutes les entrées. Les entrées persistantes d'anciens
+    modèles ne sont pas supprimées au démarrage (deux versions peuvent
+    partager la base pendant un déploiement) : purge_prediction_cache.py
+    retire celles des modèles qui ne servent plus.
+    """
+
+    def __init__(self, model_path, max_entries=2048, database=None, model_id=None):
+        # model_id fourni directement pour une cascade (voir cascade_identity)
+        self.model_id = model_id or model_identity(model_path)
+        self.max_entries = max(1, int(max_entries))
+        self.database = database
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {
+            'memory_hits': 0,
+            'persistent_hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+
+    @staticmethod
+    def key_for(source):
+        """Empreinte des octets envoyés (ou du fichier sur disque)"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return hashlib.sha256(source).hexdigest()
+        return file_sha256(source)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _remember(self, key, probabilities):
+        with self._lock:
+            self._entries[key] = probabilities
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def get(self, key):
+        """Retourne les probabilités en cache (tableau numpy) ou None"""
+        with self._lock:
+            probabilities = self._entries.get(key)
+            if probabilities is not None:
+                self._entries.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return probabilities
+
+        if self.database is not None:
+            stored = self.database.get_cached_prediction(key, self.model_id)
+            if stored is not None:
+                probabilities = np.asarray(stored, dtype=np.float32)
+                self._remember(key, probabilities)
+                self._count('persistent_hits')
+                return probabilities
+
+        self._count('misses')
+        return None
+
+    def get_many(self, keys):
+        """
+        Probabilités en cache de plusieurs images : {clé: tableau numpy} pour
+        les seules clés trouvées. Une seule requête pour le niveau persistant.
+        """
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                probabilities = self._entries.get(key)
+                if probabilities is not None:
+                    self._entries.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    found[key] = probabilities
+                else:
+                    missing.append(key)
+
+        if missing and self.database is not None:
+            stored = self.database.get_cached_predictions(set(missing), self.model_id)
+            for key, values in stored.items():
+                probabilities = np.asarray(values, dtype=np.float32)
+                self._remember(key, probabilities)
+                found[key] = probabilities
+            self._count('persistent_hits', sum(1 for key in missing if key in stored))
+
+        self._count('misses', sum(1 for key in missing if key not in found))
+        return found
+
+    def put(self, key, probabilities):
+        """Enregistre les probabilités d'une image dans les deux niveaux"""
+        probabilities = np.array(probabilities, dtype=np.float32)
+        self._remember(key, probabilities)
+        if self.database is not None:
+            self.database.save_cached_prediction(key, self.model_id, probabilities.tolist())
+
+    def stats(self):
+        """Compteurs exposés sur /health"""
+        with self._lock:
+            counters = dict(self._counters)
+            size = len(self._entries)
+        hits = counters['memory_hits'] + counters['persistent_hits']
+        lookups = hits + counters['misses']
+        counters.update({
+            'hits': hits,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'size': size,
+            'max_entries': self.max_entries,
+            'persistent': self.database is not None,
+            'model_id': self.model_id[:12]
+        })
+        return counters
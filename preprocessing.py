@@ -0,0 +1,228 @@
+"""
+Prétraitement des images, partagé par l'application, traitement.ipynb,
+training.py et les outils hors ligne.
+
+Une image devient RGB 8 bits (alpha ignoré, sans rotation EXIF),
+redimensionnée au plus proche voisin, puis float32 dans [0, 1] : exactement
+load_img(target_size=...) + img_to_array / 255.0, le chemin avec lequel les
+modèles ont été entraînés (vérifié par verify_preprocessing.py).
+
+Plusieurs implémentations produisent ces pixels (BACKENDS) ; 'auto' choisit
+la plus rapide disponible (benchmark_preprocessing.py).
+"""
+import io
+import threading
+
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+# Ordre de préférence de 'auto' (du plus rapide au plus lent)
+BACKEND_PREFERENCE = ('cv2', 'pil', 'keras')
+
+# Buffers réutilisés par thread (évite une allocation par requête)
+_local = threading.local()
+
+_backend = None
+
+
+def _is_bytes(source):
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def decode_image(data):
+    """Décode des octets PNG/JPEG en tableau RGB uint8 (H, W, 3)"""
+    buf = np.frombuffer(data, dtype=np.uint8)
+    # Décodage identique à load_img : RGB 8 bits, alpha ignoré, sans rotation EXIF
+    img = cv2.imdecode(buf, cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+    if img is None:
+        raise ValueError("Format d'image non reconnu ou fichier corrompu")
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+
+def image_size(source):
+    """
+    (largeur, hauteur) lues dans l'en-tête de l'image (octets ou chemin), sans
+    décoder les pixels. ValueError si le format n'est pas reconnu ;
+    PIL.Image.DecompressionBombError au-delà de 2 x Image.MAX_IMAGE_PIXELS.
+    """
+    import warnings
+    from PIL import Image
+
+    with warnings.catch_warnings():
+        # Les très grandes images sont justement celles qu'on veut mesurer
+        warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+        try:
+            with Image.open(io.BytesIO(source) if _is_bytes(source) else source) as img:
+                return img.size
+        except Image.DecompressionBombError:
+            raise
+        except Exception as e:
+            raise ValueError("Format d'image non reconnu ou fichier corrompu") from e
+
+
+def read_image(path):
+    """Lit une image depuis le disque en tableau RGB uint8 (H, W, 3)"""
+    return decode_image(np.fromfile(path, dtype=np.uint8))
+
+
+def resize_image(img, target_size):
+    """
+    Redimensionne au plus proche voisin, comme load_img(target_size=...)
+    utilisé à l'entraînement (INTER_NEAREST_EXACT reproduit PIL.NEAREST)
+    """
+    height, width = target_size
+    if img.shape[:2] == (height, width):
+        return img
+    return cv2.resize(img, (width, height), interpolation=cv2.INTER_NEAREST_EXACT)
+
+
+def normalize_image(img, out=None):
+    """Convertit des pixels uint8 en float32 dans [0, 1] (équivalent à img_to_array / 255.0)"""
+    return np.divide(img, np.float32(255.0), out=out, dtype=np.float32)
+
+
+def _load_cv2(source, target_size):
+    data = source if _is_bytes(source) else np.fromfile(source, dtype=np.uint8)
+    return resize_image(decode_image(data), target_size)
+
+
+def _load_pil(source, target_size):
+    from PIL import Image
+
+    height, width = target_size
+    with Image.open(io.BytesIO(source) if _is_bytes(source) else source) as img:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        if img.size != (width, height):
+            img = img.resize((width, height), Image.NEAREST)
+        return np.asarray(img)
+
+
+def _load_keras(source, target_size):
+    from tensorflow.keras.utils import load_img
+
+    img = load_img(io.BytesIO(source) if _is_bytes(source) else source, target_size=target_size)
+    return np.asarray(img)
+
+
+BACKENDS = {
+    'cv2': _load_cv2,
+    'pil': _load_pil,
+    'keras': _load_keras,
+}
+
+
+def backend_available(name):
+    """True si les bibliothèques du backend sont importables"""
+    if name == 'cv2':
+        return cv2 is not None
+    try:
+        if name == 'pil':
+            import PIL  # noqa: F401
+        elif name == 'keras':
+            import tensorflow  # noqa: F401
+        else:
+            return False
+    except ImportError:
+        return False
+    return True
+
+
+def available_backends():
+    return [name for name in BACKEND_PREFERENCE if backend_available(name)]
+
+
+def configure(backend='auto'):
+    """Choisit l'implémentation utilisée par défaut ; retourne son nom"""
+    global _backend
+    if backend == 'auto':
+        candidates = available_backends()
+        if not candidates:
+            raise RuntimeError("Aucun backend de prétraitement disponible (opencv, Pillow ou TensorFlow)")
+        backend = candidates[0]
+    elif backend not in BACKENDS:
+        raise ValueError(f"Backend de prétraitement inconnu: {backend} ({', '.join(BACKENDS)})")
+    elif not backend_available(backend):
+        raise RuntimeError(f"Backend de prétraitement indisponible: {backend}")
+    _backend = backend
+    return backend
+
+
+def current_backend():
+    if _backend is None:
+        configure()
+    return _backend
+
+
+def load_pixels(source, target_size, backend=None):
+    """Image (octets en mémoire ou chemin) décodée et redimensionnée : uint8 (H, W, 3)"""
+    return BACKENDS[backend or current_backend()](source, target_size)
+
+
+def _thread_buffer(name, shape, dtype):
+    """Buffer propre au thread courant, agrandi si nécessaire ; retourne sa vue (shape)"""
+    buf = getattr(_local, name, None)
+    if buf is None or buf.shape[1:] != shape[1:] or len(buf) < shape[0]:
+        buf = np.empty(shape, dtype=dtype)
+        setattr(_local, name, buf)
+    return buf[:shape[0]]
+
+
+def preprocess(source, target_size, backend=None):
+    """
+    Décode, redimensionne et normalise une image (octets ou chemin).
+    Retourne un tableau (1, H, W, 3) float32 écrit dans le buffer du thread :
+    il reste valide jusqu'au prochain appel dans le même thread.
+    """
+    img = load_pixels(source, target_size, backend)
+    buf = _thread_buffer('single', (1, *target_size, 3), np.float32)
+    normalize_image(img, out=buf[0])
+    return buf
+
+
+def load_batch(sources, target_size, out=None, backend=None):
+    """
+    Décode et redimensionne plusieurs images dans `out` (uint8, au moins
+    len(sources) lignes ; alloué si None). Les images valides sont rangées
+    au début : retourne (pixels valides, index des valides, erreurs par index).
+    """
+    if out is None:
+        out = np.empty((len(sources), *target_size, 3), dtype=np.uint8)
+    valid_indices = []
+    errors = {}
+    for i, source in enumerate(sources):
+        try:
+            out[len(valid_indices)] = load_pixels(source, target_size, backend)
+            valid_indices.append(i)
+        except Exception as e:
+            errors[i] = str(e)
+    return out[:len(valid_indices)], valid_indices, errors
+
+
+def preprocess_batch(sources, target_size, backend=None):
+    """
+    Prétraite plusieurs images en un seul lot (n, H, W, 3) float32.
+    Retourne (lot, index des images valides, erreurs par index). Le lot est
+    écrit dans des buffers du thread : valide jusqu'au prochain appel.
+    """
+    n = len(sources)
+    pixels = _thread_buffer('batch_pixels', (n, *target_size, 3), np.uint8)
+    pixels, valid_indices, errors = load_batch(sources, target_size, out=pixels, backend=backend)
+    batch = _thread_buffer('batch', (len(valid_indices), *target_size, 3), np.float32)
+    return normalize_image(pixels, out=batch), valid_indices, errors
+
+
+def preprocess_paths(paths, target_size, backend=None):
+    """
+    Charge plusieurs fichiers en un seul lot (n, H, W, 3) float32, dans un
+    tableau neuf (que l'appelant peut conserver). Lève une erreur si une
+    image est illisible.
+    """
+    pixels = np.empty((len(paths), *target_size, 3), dtype=np.uint8)
+    for i, path in enumerate(paths):
+        pixels[i] = load_pixels(path, target_size, backend)
+    return normalize_image(pixels)
@@ -0,0 +1,55 @@
+"""
+Supprime du cache persistant (table prediction_cache) les entrées des
+modèles qui ne servent plus
+
+Les clés du cache incluent l'identité du modèle : les entrées d'un ancien
+modèle ne sont plus jamais lues mais restent en base. L'application ne les
+supprime pas au démarrage (pendant un déploiement, deux versions partagent
+la même base) ; ce script retire celles des modèles qui n'ont rien écrit
+depuis --days jours. À planifier (cron) si PREDICTION_CACHE_PERSISTENT=True.
+
+Usage:
+    python purge_prediction_cache.py --days 30
+    python purge_prediction_cache.py --days 30 --dry-run
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from database import db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Purge du cache persistant des prédictions")
+    parser.add_argument('--days', type=int, default=30,
+                        help="Âge de la dernière entrée au-delà duquel un modèle est considéré retiré")
+    parser.add_argument('--dry-run', action='store_true', help="Affiche les modèles sans rien supprimer")
+    args = parser.parse_args()
+
+    if not db.init_db():
+        raise SystemExit(1)
+
+    models = db.prediction_cache_models()
+    if models is None:
+        raise SystemExit("❌ Lecture du cache impossible")
+
+    cutoff = datetime.now() - timedelta(days=args.days)
+    print("\n" + "=" * 60)
+    print(f"{'Modèle':<16}{'Entrées':>12}{'Dernière entrée':>22}")
+    print("-" * 60)
+    for row in models:
+        last_entry = row['last_entry_at'].strftime('%Y-%m-%d %H:%M:%S')
+        stale = "  retiré" if row['last_entry_at'] < cutoff else ""
+        print(f"{row['model_id'][:12]:<16}{row['entries']:>12}{last_entry:>22}{stale}")
+    print("=" * 60)
+
+    if args.dry_run:
+        return
+
+    deleted = db.purge_prediction_cache(args.days)
+    if deleted is None:
+        raise SystemExit("❌ Purge échouée")
+    print(f"✓ {deleted} entrée(s) supprimée(s)")
+
+
+if __name__ == '__main__':
+    main()
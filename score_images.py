@@ -0,0 +1,310 @@
+"""
+Scoring hors ligne de dossiers d'images entiers (ex: cell_images/)
+
+- décodage en parallèle dans des processus (même prétraitement que l'application)
+- lots de grande taille préparés à l'avance pendant que le modèle calcule
+- écriture incrémentale en CSV (fichier) ou Parquet (dossier de fragments)
+- reprise après interruption : les images déjà présentes dans la sortie sont ignorées
+- débit en images/s et, si les dossiers portent le nom des classes,
+  métriques comparables à final_summary.csv
+
+Usage:
+    python score_images.py cell_images --output scores.csv
+    python score_images.py archive/ --output scores.parquet --workers 8 --batch-size 512
+    python score_images.py cell_images --output scores.csv --resume
+    python score_images.py cell_images --output scores.csv --backend tflite --model models/model_C_int8.tflite
+    python score_images.py cell_images_packed --output scores.csv   # cache de pack_dataset.py, sans décodage
+"""
+import argparse
+import csv
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from config import config
+from dataset import CATEGORIES, IMAGE_EXTENSIONS, summary_metrics
+from preprocessing import load_pixels, normalize_image
+
+IMG_SIZE = (config.IMG_SIZE, config.IMG_SIZE)
+FIELDNAMES = ['filepath', 'label', 'predicted_class', 'confidence'] + \
+             [f'prob_{cat}' for cat in CATEGORIES] + ['error']
+
+
+def list_image_files(input_dir):
+    """Toutes les images sous input_dir (récursif, ordre stable pour la reprise)"""
+    paths = []
+    for root, dirs, files in os.walk(input_dir):
+        dirs.sort()
+        for fname in sorted(files):
+            if fname.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(root, fname))
+    return paths
+
+
+def label_from_path(path):
+    """Classe déduite du dossier parent (Parasitized/ ou Uninfected/), sinon None"""
+    folder = os.path.basename(os.path.dirname(path))
+    return folder if folder in CATEGORIES else None
+
+
+def decode_batch(paths, target_size):
+    """
+    Exécuté dans un processus de décodage : retourne les pixels uint8
+    (4x moins à transférer que du float32) et les erreurs par index.
+    """
+    pixels = np.zeros((len(paths), *target_size, 3), dtype=np.uint8)
+    errors = {}
+    for i, path in enumerate(paths):
+        try:
+            pixels[i] = load_pixels(path, target_size)
+        except Exception as e:
+            errors[i] = str(e)
+    return pixels, errors
+
+
+def prefetched_batches(paths, batch_size, workers, prefetch):
+    """Lots décodés dans l'ordre, avec au plus `prefetch` lots en avance"""
+    chunks = (paths[i:i + batch_size] for i in range(0, len(paths), batch_size))
+    # spawn : les processus ne doivent pas hériter des threads de TensorFlow
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append((chunk, executor.submit(decode_batch, chunk, IMG_SIZE)))
+            if len(pending) >= prefetch:
+                chunk, future = pending.popleft()
+                yield (chunk, *future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            yield (chunk, *future.result())
+
+
+def packed_batches(packed, paths, batch_size):
+    """Mêmes lots que prefetched_batches, lus dans un cache pack_dataset.py"""
+    positions = packed.positions(paths)
+    for start in range(0, len(paths), batch_size):
+        yield paths[start:start + batch_size], packed.pixels[positions[start:start + batch_size]], {}
+
+
+def load_model(args):
+    """Même chargement que l'application (modèle unique ou cascade)"""
+    from inference import load_backend
+
+    options = {'num_threads': config.INFERENCE_THREADS, 'compiled': config.KERAS_COMPILED_SERVING,
+               'warmup_batch_sizes': [args.batch_size]}
+    if args.cascade:
+        from cascade import CascadePredictor
+        return CascadePredictor.from_paths(args.backend, config.CASCADE_MODELS,
+                                           threshold=config.CASCADE_THRESHOLD,
+                                           final=config.CASCADE_FINAL, **options)
+    return load_backend(args.backend, args.model, **options)
+
+
+class CsvSink:
+    """Sortie CSV en ajout, vidée après chaque lot"""
+
+    def __init__(self, path, resume):
+        self.path = path
+        exists = resume and os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            self._truncate_partial_line()
+        self.file = open(path, 'a' if exists else 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDNAMES)
+        if not exists:
+            self.writer.writeheader()
+
+    def _truncate_partial_line(self):
+        """Supprime une dernière ligne incomplète laissée par une interruption"""
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    @staticmethod
+    def read_done(path):
+        if not os.path.exists(path):
+            return []
+        with open(path, newline='') as f:
+            return [row for row in csv.DictReader(f) if row.get('error') is not None]
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """Sortie Parquet : un fragment part-NNNNN.parquet par écriture (lisible comme un seul jeu de données)"""
+
+    def __init__(self, path, resume, rows_per_part=8192):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("❌ La sortie Parquet nécessite pyarrow (pip install pyarrow)")
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        if not resume:
+            for fname in os.listdir(path):
+                if fname.startswith('part-') and fname.endswith('.parquet'):
+                    os.remove(os.path.join(path, fname))
+        self.part = len([f for f in os.listdir(path) if f.endswith('.parquet')])
+        self.rows_per_part = rows_per_part
+        self.buffer = []
+
+    @staticmethod
+    def read_done(path):
+        if not os.path.isdir(path):
+            return []
+        import pyarrow.parquet as pq
+        parts = sorted(f for f in os.listdir(path) if f.endswith('.parquet'))
+        rows = []
+        for fname in parts:
+            rows.extend(pq.read_table(os.path.join(path, fname)).to_pylist())
+        return rows
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(self.buffer)
+        final_path = os.path.join(self.path, f"part-{self.part:05d}.parquet")
+        pq.write_table(table, final_path + '.tmp')
+        os.replace(final_path + '.tmp', final_path)
+        self.part += 1
+        self.buffer = []
+
+    def write(self, rows):
+        # Champs vides -> null, pour garder des colonnes numériques typées
+        self.buffer.extend({k: (None if v == '' else v) for k, v in row.items()} for row in rows)
+        if len(self.buffer) >= self.rows_per_part:
+            self._flush()
+
+    def close(self):
+        self._flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring hors ligne d'un dossier d'images")
+    parser.add_argument('input_dir')
+    parser.add_argument('--output', required=True, help="Fichier .csv ou dossier .parquet")
+    parser.add_argument('--model', default=config.MODEL_PATH)
+    parser.add_argument('--backend', default=config.INFERENCE_BACKEND, choices=['keras', 'tflite'])
+    parser.add_argument('--cascade', action='store_true', default=config.CASCADE_ENABLED,
+                        help="Utiliser la cascade CASCADE_MODELS de la configuration")
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1),
+                        help="Processus de décodage")
+    parser.add_argument('--prefetch', type=int, default=None,
+                        help="Lots décodés en avance (défaut: 2 par processus)")
+    parser.add_argument('--resume', action='store_true', help="Reprendre une sortie existante")
+    args = parser.parse_args()
+
+    parquet = args.output.endswith('.parquet')
+    Sink = ParquetSink if parquet else CsvSink
+
+    packed = None
+    if os.path.exists(os.path.join(args.input_dir, 'meta.json')):
+        from pack_dataset import PackedDataset
+        packed = PackedDataset(args.input_dir, IMG_SIZE)
+        paths = list(packed.filepaths)
+    else:
+        paths = list_image_files(args.input_dir)
+    # Ouvrir la sortie d'abord : une ligne incomplète est supprimée avant la relecture
+    sink = Sink(args.output, args.resume)
+    done_rows = Sink.read_done(args.output) if args.resume else []
+    done = {row['filepath'] for row in done_rows}
+    todo = [p for p in paths if p not in done]
+
+    print(f"▶ {len(paths)} images trouvées dans {args.input_dir}"
+          + (f", {len(done)} déjà scorées" if done else ""))
+    if not todo:
+        print("✓ Rien à faire")
+    else:
+        model = load_model(args)
+        if model is None:
+            raise SystemExit(1)
+
+    # Classes réelles / prédites, y compris les lignes d'une exécution précédente
+    y_true, y_pred = [], []
+    for row in done_rows:
+        if row.get('label') and row.get('predicted_class'):
+            y_true.append(CATEGORIES.index(row['label']))
+            y_pred.append(CATEGORIES.index(row['predicted_class']))
+
+    processed = failed = 0
+    start = last_report = time.perf_counter()
+
+    try:
+        if todo:
+            prefetch = args.prefetch or 2 * args.workers
+            batch = np.empty((args.batch_size, *IMG_SIZE, 3), dtype=np.float32)
+
+            if packed is not None:
+                batches = packed_batches(packed, todo, args.batch_size)
+            else:
+                batches = prefetched_batches(todo, args.batch_size, args.workers, prefetch)
+
+            for chunk, pixels, errors in batches:
+                valid = [i for i in range(len(chunk)) if i not in errors]
+                probabilities = {}
+                if valid:
+                    inputs = normalize_image(pixels[valid], out=batch[:len(valid)])
+                    for i, probs in zip(valid, np.asarray(model.predict(inputs))):
+                        probabilities[i] = probs
+
+                rows = []
+                for i, path in enumerate(chunk):
+                    label = label_from_path(path)
+                    row = dict.fromkeys(FIELDNAMES, '')
+                    row.update({'filepath': path, 'label': label or ''})
+                    if i in errors:
+                        row['error'] = errors[i]
+                        failed += 1
+                    else:
+                        probs = probabilities[i]
+                        idx = int(np.argmax(probs))
+                        row['predicted_class'] = CATEGORIES[idx]
+                        row['confidence'] = round(float(probs[idx]), 6)
+                        for j, cat in enumerate(CATEGORIES):
+                            row[f'prob_{cat}'] = round(float(probs[j]), 6)
+                        if label:
+                            y_true.append(CATEGORIES.index(label))
+                            y_pred.append(idx)
+                    rows.append(row)
+
+                sink.write(rows)
+                processed += len(chunk)
+
+                now = time.perf_counter()
+                if now - last_report >= 5 or processed == len(todo):
+                    print(f"  {processed}/{len(todo)} images - {processed / (now - start):.0f} img/s")
+                    last_report = now
+    except KeyboardInterrupt:
+        print(f"\n⚠ Interrompu après {processed} images : relancez avec --resume pour continuer")
+    finally:
+        sink.close()
+
+    elapsed = time.perf_counter() - start
+    print("\n" + "=" * 60)
+    print(f"Images scorées:     {processed} ({failed} en erreur)")
+    if processed:
+        print(f"Débit:              {processed / elapsed:.1f} images/s")
+    if y_true:
+        metrics = summary_metrics(y_true, y_pred)
+        print(f"Images étiquetées:  {len(y_true)}")
+        for name, value in metrics.items():
+            print(f"{name + ':':<20}{value:.4f}")
+    print("=" * 60)
+    print(f"✓ Résultats dans {args.output}")
+
+
+if __name__ == '__main__':
+    main()
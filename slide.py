@@ -0,0 +1,301 @@
+"""
+Analyse d'un champ de frottis mince complet (plusieurs mégapixels)
+
+    image -> seuil d'Otsu et diamètre des cellules (sur une version réduite)
+          -> tuiles avec marge -> segmentation (seuil, distance, watershed)
+          -> découpe vectorisée des cellules -> classification par grands lots
+          -> boîtes, classes et parasitémie
+
+Chaque tuile ne garde que les cellules dont le centre tombe dans sa zone
+propre : pas de doublon entre tuiles voisines. Les découpes reproduisent
+les images d'entraînement : cellule centrée, fond noir, redimensionnement
+au plus proche voisin (comme preprocessing.resize_image).
+
+Usage:
+    python slide.py frottis.png
+    python slide.py champs/*.jpg --batch-size 512 --output resultats.json
+    python slide.py frottis.png --annotate annotations/
+"""
+import argparse
+import json
+import math
+import os
+import time
+
+import cv2
+import numpy as np
+
+from preprocessing import read_image, normalize_image
+
+CATEGORIES = ['Parasitized', 'Uninfected']
+TILE_SIZE = 2048
+BATCH_SIZE = 256
+# Découpe un peu plus large que la cellule (les images du jeu sont cadrées au plus juste)
+CROP_PADDING = 1.1
+# Aires acceptées, relatives à l'aire d'une cellule de diamètre médian
+MIN_AREA_RATIO = 0.25
+MAX_AREA_RATIO = 4.0
+
+_KERNEL = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+
+
+def _fill_holes(mask):
+    """Bouche le centre clair des hématies (pâleur centrale)"""
+    padded = cv2.copyMakeBorder(mask, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+    cv2.floodFill(padded, None, (0, 0), 255)
+    return mask | cv2.bitwise_not(padded[1:-1, 1:-1])
+
+
+def cell_mask(image, threshold=None):
+    """Masque binaire des cellules (plus sombres que le fond) ; retourne (seuil, masque)"""
+    gray = cv2.GaussianBlur(cv2.cvtColor(image, cv2.COLOR_RGB2GRAY), (5, 5), 0)
+    if threshold is None:
+        threshold, mask = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    else:
+        _, mask = cv2.threshold(gray, threshold, 255, cv2.THRESH_BINARY_INV)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, _KERNEL, iterations=2)
+    return threshold, _fill_holes(mask)
+
+
+def estimate_cell_geometry(image, max_side=1024):
+    """
+    Seuil d'Otsu et diamètre médian des cellules, calculés une fois sur une
+    version réduite : toutes les tuiles utilisent ensuite le même seuil.
+    """
+    height, width = image.shape[:2]
+    scale = min(1.0, max_side / max(height, width))
+    small = image
+    if scale < 1.0:
+        small = cv2.resize(image, (max(1, round(width * scale)), max(1, round(height * scale))),
+                           interpolation=cv2.INTER_AREA)
+
+    threshold, mask = cell_mask(small)
+    _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+    areas = stats[1:, cv2.CC_STAT_AREA] / (scale * scale)
+    areas = areas[areas >= 20 / (scale * scale)]
+    if not len(areas):
+        return threshold, None
+    return threshold, 2.0 * math.sqrt(float(np.median(areas)) / math.pi)
+
+
+def segment_tile(tile, threshold, diameter, split_ratio=0.5):
+    """
+    Sépare les cellules d'une tuile (y compris les cellules qui se touchent :
+    un marqueur par maximum de la transformée de distance, puis watershed).
+    Retourne la carte des étiquettes et, par cellule : étiquette, centre (x, y), aire.
+    """
+    _, mask = cell_mask(tile, threshold)
+    dist = cv2.distanceTransform(mask, cv2.DIST_L2, 5)
+    sure = (dist >= split_ratio * diameter / 2).astype(np.uint8)
+    n_markers, markers = cv2.connectedComponents(sure, connectivity=8)
+
+    # 1 = fond, 0 = à attribuer, >= 2 = cellules
+    markers += 1
+    markers[(mask > 0) & (sure == 0)] = 0
+    labels = cv2.watershed(np.ascontiguousarray(tile), markers)
+
+    height, width = labels.shape
+    flat = np.where(labels.ravel() >= 2, labels.ravel(), 0)
+    count = n_markers + 1
+    area = np.bincount(flat, minlength=count).astype(np.float64)
+    sum_x = np.bincount(flat, weights=np.tile(np.arange(width, dtype=np.float32), height), minlength=count)
+    sum_y = np.bincount(flat, weights=np.repeat(np.arange(height, dtype=np.float32), width), minlength=count)
+
+    ids = np.arange(2, count)
+    area = area[2:]
+    present = area > 0
+    ids, area = ids[present], area[present]
+    return labels, ids, sum_x[2:][present] / area, sum_y[2:][present] / area, area
+
+
+def gather_crops(tile, labels, ids, cx, cy, sides, out):
+    """
+    Découpe toutes les cellules en une seule indexation numpy :
+    fenêtre carrée centrée, échantillonnage au plus proche voisin
+    (même correspondance que PIL.NEAREST), pixels hors cellule mis à 0.
+    """
+    size = out.shape[1]
+    height, width = labels.shape
+    steps = (np.arange(size) + 0.5) / size
+    xs = np.floor((cx - sides / 2)[:, None] + steps[None, :] * sides[:, None]).astype(np.intp)
+    ys = np.floor((cy - sides / 2)[:, None] + steps[None, :] * sides[:, None]).astype(np.intp)
+    inside = ((ys >= 0) & (ys < height))[:, :, None] & ((xs >= 0) & (xs < width))[:, None, :]
+    np.clip(xs, 0, width - 1, out=xs)
+    np.clip(ys, 0, height - 1, out=ys)
+
+    rows, cols = ys[:, :, None], xs[:, None, :]
+    keep = (labels[rows, cols] == ids[:, None, None]) & inside
+    np.multiply(tile[rows, cols], keep[..., None], out=out)
+
+
+def analyze_slide(image, predict_fn, img_size=(128, 128), tile_size=TILE_SIZE, batch_size=BATCH_SIZE,
+                  cell_diameter=None, split_ratio=0.5, categories=CATEGORIES):
+    """
+    Analyse un champ RGB uint8 (H, W, 3).
+    predict_fn : lot (n, H, W, 3) float32 -> probabilités (n, classes).
+    """
+    timings = {'segmentation': 0.0, 'inference': 0.0}
+    height, width = image.shape[:2]
+
+    start = time.perf_counter()
+    threshold, estimated = estimate_cell_geometry(image)
+    diameter = cell_diameter or estimated
+    timings['segmentation'] += time.perf_counter() - start
+
+    result = {
+        'width': width,
+        'height': height,
+        'cell_diameter': round(diameter, 1) if diameter else None,
+        'cells': [],
+        'total_cells': 0,
+        'parasitized_cells': 0,
+        'parasitemia': 0.0,
+        'timings': timings
+    }
+    if not diameter:
+        return result
+
+    cell_area = math.pi * (diameter / 2) ** 2
+    margin = int(math.ceil(diameter * CROP_PADDING))
+    buffer = np.empty((batch_size, *img_size, 3), dtype=np.uint8)
+    boxes = np.empty((0, 4), dtype=np.int64)
+    box_chunks, prob_chunks = [], []
+    filled = 0
+
+    def flush():
+        nonlocal filled
+        if filled:
+            start = time.perf_counter()
+            prob_chunks.append(np.asarray(predict_fn(normalize_image(buffer[:filled]))))
+            timings['inference'] += time.perf_counter() - start
+            filled = 0
+
+    for y0 in range(0, height, tile_size):
+        for x0 in range(0, width, tile_size):
+            start = time.perf_counter()
+            # Tuile + marge : les cellules à cheval sur la frontière restent entières
+            ty0, tx0 = max(0, y0 - margin), max(0, x0 - margin)
+            ty1, tx1 = min(height, y0 + tile_size + margin), min(width, x0 + tile_size + margin)
+            tile = image[ty0:ty1, tx0:tx1]
+            labels, ids, cx, cy, area = segment_tile(tile, threshold, diameter, split_ratio)
+
+            keep = ((area >= MIN_AREA_RATIO * cell_area) & (area <= MAX_AREA_RATIO * cell_area)
+                    & (cx + tx0 >= x0) & (cx + tx0 < x0 + tile_size)
+                    & (cy + ty0 >= y0) & (cy + ty0 < y0 + tile_size))
+            ids, cx, cy = ids[keep], cx[keep], cy[keep]
+            sides = 2.0 * np.sqrt(area[keep] / math.pi) * CROP_PADDING
+
+            x_min = np.clip(np.round(cx + tx0 - sides / 2), 0, width - 1)
+            y_min = np.clip(np.round(cy + ty0 - sides / 2), 0, height - 1)
+            x_max = np.clip(np.round(cx + tx0 + sides / 2), 0, width)
+            y_max = np.clip(np.round(cy + ty0 + sides / 2), 0, height)
+            box_chunks.append(np.stack([x_min, y_min, x_max - x_min, y_max - y_min], axis=1).astype(np.int64))
+            timings['segmentation'] += time.perf_counter() - start
+
+            i = 0
+            while i < len(ids):
+                take = min(batch_size - filled, len(ids) - i)
+                part = slice(i, i + take)
+                gather_crops(tile, labels, ids[part], cx[part], cy[part], sides[part],
+                             buffer[filled:filled + take])
+                filled += take
+                i += take
+                if filled == batch_size:
+                    flush()
+            del labels
+    flush()
+
+    if box_chunks:
+        boxes = np.concatenate(box_chunks)
+    if not len(boxes):
+        return result
+
+    probabilities = np.concatenate(prob_chunks)
+    predicted = np.argmax(probabilities, axis=1)
+    parasitized_index = categories.index('Parasitized')
+    n_parasitized = int(np.sum(predicted == parasitized_index))
+
+    result['cells'] = [
+        {
+            'x': int(x), 'y': int(y), 'width': int(w), 'height': int(h),
+            'predicted_class': categories[int(label)],
+            'confidence': float(probs[label]),
+            'parasitized_probability': float(probs[parasitized_index])
+        }
+        for (x, y, w, h), label, probs in zip(boxes, predicted, probabilities)
+    ]
+    result['total_cells'] = len(boxes)
+    result['parasitized_cells'] = n_parasitized
+    result['parasitemia'] = round(100.0 * n_parasitized / len(boxes), 2)
+    return result
+
+
+def annotate(image, result):
+    """Copie BGR de l'image avec les boîtes (rouge : parasitée, vert : saine)"""
+    canvas = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    for cell in result['cells']:
+        color = (0, 0, 255) if cell['predicted_class'] == 'Parasitized' else (0, 160, 0)
+        cv2.rectangle(canvas, (cell['x'], cell['y']),
+                      (cell['x'] + cell['width'], cell['y'] + cell['height']), color, 2)
+    return canvas
+
+
+def main():
+    from config import config
+    from inference import load_backend
+
+    parser = argparse.ArgumentParser(description="Analyse de frottis complets (segmentation + classification)")
+    parser.add_argument('images', nargs='+')
+    parser.add_argument('--model', default=config.MODEL_PATH)
+    parser.add_argument('--backend', default=config.INFERENCE_BACKEND, choices=['keras', 'tflite'])
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--tile-size', type=int, default=TILE_SIZE)
+    parser.add_argument('--cell-diameter', type=float, default=None, help="En pixels (sinon estimé)")
+    parser.add_argument('--output', default=None, help="Résultats JSON")
+    parser.add_argument('--annotate', default=None, help="Dossier des images annotées")
+    args = parser.parse_args()
+
+    model = load_backend(args.backend, args.model, num_threads=config.INFERENCE_THREADS,
+                         warmup_batch_sizes=(args.batch_size,))
+    if model is None:
+        raise SystemExit(f"❌ Modèle introuvable: {args.model}")
+    img_size = (config.IMG_SIZE, config.IMG_SIZE)
+    if args.annotate:
+        os.makedirs(args.annotate, exist_ok=True)
+
+    results = {}
+    print("\n" + "=" * 92)
+    print(f"{'Image':<28}{'Mpx':>7}{'Cellules':>10}{'Parasitémie':>13}{'Segm.':>9}{'Inf.':>9}{'Mpx/s':>8}{'cell/s':>9}")
+    print("-" * 92)
+    for path in args.images:
+        try:
+            image = read_image(path)
+        except (OSError, ValueError) as e:
+            print(f"⚠ {path}: {e}")
+            continue
+
+        start = time.perf_counter()
+        result = analyze_slide(image, model.predict, img_size, args.tile_size, args.batch_size,
+                               args.cell_diameter)
+        elapsed = time.perf_counter() - start
+        results[path] = result
+
+        megapixels = image.shape[0] * image.shape[1] / 1e6
+        print(f"{os.path.basename(path)[:27]:<28}{megapixels:>7.1f}{result['total_cells']:>10}"
+              f"{result['parasitemia']:>12.2f}%{result['timings']['segmentation']:>8.2f}s"
+              f"{result['timings']['inference']:>8.2f}s{megapixels / elapsed:>8.2f}"
+              f"{result['total_cells'] / elapsed:>9.0f}")
+
+        if args.annotate:
+            name = os.path.splitext(os.path.basename(path))[0] + '_annotated.png'
+            cv2.imwrite(os.path.join(args.annotate, name), annotate(image, result))
+    print("=" * 92)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Résultats sauvegardés dans {args.output}")
+
+
+if __name__ == '__main__':
+    main()
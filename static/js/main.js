@@ -100,4 +100,96 @@ function confirmAction(message, callback) {
     if (confirm(message)) {
         callback();
     }
-}
\ No newline at end of file
+}
+// Prédiction : mode asynchrone (job suivi par polling, ou server-sent events si
+// le serveur les active) ou réponse directe si le serveur ne propose pas les jobs.
+// onStatus est appelé à chaque changement d'état ('queued', 'running').
+async function submitPrediction(file, { asyncJobs = false, onStatus = null } = {}) {
+    const formData = new FormData();
+    formData.append('file', file);
+    // L'aperçu est déjà affiché localement : pas d'image dans la réponse
+    formData.append('image', 'none');
+    if (asyncJobs) {
+        formData.append('async', '1');
+    }
+
+    const response = await fetch('/predict', { method: 'POST', body: formData });
+    const data = await response.json();
+
+    if (response.status !== 202) {
+        return data;
+    }
+
+    if (onStatus) {
+        onStatus(data.status);
+    }
+    const job = await followJob(data, onStatus);
+    return job.status === 'done' ? job.result : { error: job.error || 'Prédiction interrompue' };
+}
+
+// Suit un job jusqu'à son état final : polling de status_url par défaut ;
+// EventSource seulement si le serveur fournit events_url (JOB_EVENTS_ENABLED)
+function followJob(submitted, onStatus) {
+    return new Promise((resolve) => {
+        let finished = false;
+        // Premier contrôle rapide (la plupart des jobs durent quelques dizaines
+        // de ms), puis intervalle doublé jusqu'à 1 s
+        let delay = 100;
+
+        const finish = (job) => {
+            if (!finished) {
+                finished = true;
+                resolve(job);
+            }
+        };
+
+        const poll = async () => {
+            try {
+                const response = await fetch(submitted.status_url);
+                const job = await response.json();
+                if (!response.ok) {
+                    finish({ status: 'error', error: job.error });
+                    return;
+                }
+                if (onStatus) {
+                    onStatus(job.status);
+                }
+                if (job.status === 'done' || job.status === 'error') {
+                    finish(job);
+                } else {
+                    setTimeout(poll, delay);
+                    delay = Math.min(delay * 2, 1000);
+                }
+            } catch (error) {
+                setTimeout(poll, 2000);
+            }
+        };
+
+        if (!submitted.events_url || !window.EventSource) {
+            setTimeout(poll, delay);
+            delay *= 2;
+            return;
+        }
+
+        const source = new EventSource(submitted.events_url);
+        source.onmessage = (event) => {
+            const job = JSON.parse(event.data);
+            if (onStatus) {
+                onStatus(job.status);
+            }
+            if (job.status === 'done' || job.status === 'error') {
+                source.close();
+                finish(job);
+            }
+        };
+        // Délai dépassé ou connexion coupée : on continue en polling
+        const fallback = () => {
+            source.close();
+            if (!finished) {
+                poll();
+            }
+        };
+        source.addEventListener('timeout', fallback);
+        source.onerror = fallback;
+    });
+}
@@ -0,0 +1,93 @@
+import os
+import re
+import threading
+import time
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+THUMBNAIL_KEY_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+class ThumbnailStore:
+    """
+    Miniatures JPEG des images envoyées, renvoyées par URL au lieu de l'image
+    complète en base64 dans la réponse JSON.
+
+    Les fichiers sont adressés par l'empreinte SHA-256 de l'image d'origine
+    (`<clé>.jpg` dans `directory`) : une même image n'est réduite qu'une
+    fois, tous les workers gunicorn servent la même URL et la clé sert
+    d'ETag. Les miniatures de plus de `ttl` secondes sont supprimées au fil
+    des écritures.
+    """
+
+    def __init__(self, directory, max_side=256, quality=80, ttl=3600):
+        self.directory = directory
+        self.max_side = max_side
+        self.quality = quality
+        self.ttl = ttl
+        self._last_cleanup = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def lookup(self, key):
+        """(chemin, secondes de validité restantes), None si la clé est invalide ou la miniature expirée"""
+        if not THUMBNAIL_KEY_PATTERN.match(key or ''):
+            return None
+        path = os.path.join(self.directory, f"{key}.jpg")
+        try:
+            remaining = self.ttl - (time.time() - os.path.getmtime(path))
+        except OSError:
+            return None
+        if remaining <= 0:
+            return None
+        return path, int(remaining)
+
+    def render(self, source):
+        """Octets JPEG de la miniature d'une image (octets ou chemin)"""
+        with Image.open(BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source) as img:
+            # JPEG décodé directement à échelle réduite (DCT), sans l'image pleine taille
+            img.draft('RGB', (self.max_side, self.max_side))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((self.max_side, self.max_side), Image.BILINEAR)
+            if img.mode != 'RGB':
+                img = img.convert('RGB')
+            out = BytesIO()
+            img.save(out, 'JPEG', quality=self.quality, optimize=True)
+            return out.getvalue()
+
+    def put(self, key, source):
+        """Crée la miniature si elle n'existe pas encore ; retourne True si elle est disponible"""
+        path = os.path.join(self.directory, f"{key}.jpg")
+        try:
+            if os.path.exists(path):
+                # Déjà présente : prolonge sa durée de vie
+                os.utime(path)
+                return True
+            data = self.render(source)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"Erreur création miniature: {e}")
+            return False
+        finally:
+            self._cleanup()
+
+    def _cleanup(self):
+        """Supprime les miniatures expirées (au plus une fois par minute)"""
+        now = time.time()
+        if now - self._last_cleanup < 60:
+            return
+        self._last_cleanup = now
+        try:
+            for entry in os.listdir(self.directory):
+                path = os.path.join(self.directory, entry)
+                try:
+                    if now - os.path.getmtime(path) > self.ttl:
+                        os.remove(path)
+                except OSError:
+                    continue
+        except OSError as e:
+            print(f"Erreur nettoyage des miniatures: {e}")
@@ -0,0 +1,310 @@
+"""
+Entraînement parallèle de model_A / model_B / model_C et écriture des
+fichiers lus par l'application
+
+Chaque modèle est entraîné dans son propre processus (spawn), avec un
+nombre de threads TensorFlow fixé et, sous Linux, un sous-ensemble de cœurs
+réservé : les trois entraînements se partagent la machine au lieu de
+s'exécuter l'un après l'autre.
+
+À la fin, les fichiers sont remplacés atomiquement dans models/ :
+    <modèle>_best.h5, best_overall_model.h5, metrics_comparison.csv
+    (avec precision/recall/f1_score de test), final_summary.csv,
+    training_history.json, training_report.json (durées, débit, gain)
+
+Usage:
+    python train_all.py                                   # 3 modèles en parallèle
+    python train_all.py --jobs 3 --threads-per-job 8 --packed cell_images_packed
+    python train_all.py --mode both                       # mesure aussi le séquentiel
+    python train_all.py --epochs 1 --limit 2000           # essai rapide
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dataset import DATA_DIR, RANDOM_STATE, split_dataset
+
+MODEL_NAMES = ['model_A', 'model_B', 'model_C']
+MODELS_DIR = 'models'
+
+
+def _pin_threads(threads, cpus):
+    """À appeler avant d'importer TensorFlow dans le processus d'entraînement"""
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(threads)
+    os.environ['TF_NUM_INTEROP_THREADS'] = '2'
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    os.environ.setdefault('TF_CPP_MIN_LOG_LEVEL', '2')
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(2)
+
+
+def train_worker(name, options, threads, cpu_slots, staging_dir):
+    """Processus d'entraînement d'un modèle : retourne résultats et chemin du checkpoint"""
+    cpus = cpu_slots.get() if cpu_slots is not None else None
+    try:
+        _pin_threads(threads, cpus)
+        import training
+
+        splits = load_splits(options)
+        packed = None
+        if options['packed']:
+            from pack_dataset import PackedDataset
+            packed = PackedDataset(options['packed'], training.IMG_SIZE)
+
+        result = training.train_model(
+            name, splits,
+            epochs=options['epochs'],
+            batch_size=options['batch_size'],
+            checkpoint_path=os.path.join(staging_dir, f"{name}_best.h5"),
+            augment=options['augment'],
+            seed=options['seed'],
+            packed=packed
+        )
+        # Le modèle évalué est celui restauré par EarlyStopping (meilleure val_loss)
+        test_metrics, _ = training.evaluate_model(result['model'], *splits['test'], packed=packed)
+
+        return {
+            'name': name,
+            'checkpoint': result['checkpoint_path'],
+            'history': result['history'],
+            'metrics': result['metrics'],
+            'test_metrics': test_metrics,
+            'throughput': result['throughput'],
+            'train_seconds': result['train_seconds'],
+            'threads': threads,
+            'cpus': sorted(cpus) if cpus else None
+        }
+    finally:
+        if cpu_slots is not None:
+            cpu_slots.put(cpus)
+
+
+def load_splits(options):
+    """Découpage du notebook, éventuellement réduit pour un essai rapide"""
+    splits = split_dataset(options['data_dir'], random_state=options['seed'])
+    if options['limit']:
+        limit = options['limit']
+        splits = {key: (X[:limit], y[:limit]) for key, (X, y) in splits.items()}
+    return splits
+
+
+def cpu_slices(jobs):
+    """Cœurs disponibles répartis en `jobs` groupes disjoints"""
+    if not hasattr(os, 'sched_getaffinity'):
+        return [None] * jobs
+    cpus = sorted(os.sched_getaffinity(0))
+    size = max(1, len(cpus) // jobs)
+    return [set(cpus[i * size:(i + 1) * size]) or set(cpus) for i in range(jobs)]
+
+
+def run(names, options, jobs, threads, staging_dir):
+    """Entraîne les modèles par `jobs` processus simultanés ; retourne (résultats, durée)"""
+    context = multiprocessing.get_context('spawn')
+    start = time.perf_counter()
+    with context.Manager() as manager:
+        cpu_slots = manager.Queue()
+        for cpus in cpu_slices(jobs):
+            cpu_slots.put(cpus)
+
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=context, max_tasks_per_child=1) as executor:
+            futures = [executor.submit(train_worker, name, options, threads, cpu_slots, staging_dir)
+                       for name in names]
+            results = [future.result() for future in futures]
+    return results, time.perf_counter() - start
+
+
+def atomic_write(path, write):
+    """Écrit dans un fichier temporaire puis le renomme : l'application ne lit jamais un fichier partiel"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', newline='') as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def atomic_copy(src, dst):
+    tmp_path = f"{dst}.tmp"
+    shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dst)
+
+
+def read_existing_metrics(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def write_artifacts(results, splits, models_dir):
+    """Publie checkpoints, métriques, résumé et historiques dans models/"""
+    trained = {r['name']: r for r in results}
+
+    # 1) Checkpoints (déjà complets dans le dossier de préparation)
+    for r in results:
+        if os.path.exists(r['checkpoint']):
+            os.replace(r['checkpoint'], os.path.join(models_dir, f"{r['name']}_best.h5"))
+        else:
+            print(f"⚠ Aucun checkpoint produit pour {r['name']}")
+
+    # 2) metrics_comparison.csv : lignes conservées pour les modèles non ré-entraînés
+    metrics_path = os.path.join(models_dir, 'metrics_comparison.csv')
+    rows = [row for row in read_existing_metrics(metrics_path) if row['model'] not in trained]
+    for r in results:
+        rows.append({
+            **r['metrics'],
+            'precision': r['test_metrics']['Precision'],
+            'recall': r['test_metrics']['Sensitivity'],
+            'f1_score': r['test_metrics']['F1-Score']
+        })
+    rows.sort(key=lambda row: float(row['val_accuracy']), reverse=True)
+    fieldnames = ['model', 'val_accuracy', 'val_loss', 'precision', 'recall', 'f1_score']
+
+    def write_metrics(f):
+        writer = csv.DictWriter(f, fieldnames=fieldnames, restval='', extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    atomic_write(metrics_path, write_metrics)
+
+    # 3) training_history.json (courbes de /evaluation)
+    history_path = os.path.join(models_dir, 'training_history.json')
+    histories = {}
+    if os.path.exists(history_path):
+        with open(history_path) as f:
+            histories = json.load(f)
+    histories.update({r['name']: r['history'] for r in results})
+    atomic_write(history_path, lambda f: json.dump(histories, f, indent=2))
+
+    # 4) Meilleur modèle et final_summary.csv (comme l'étape 10 du notebook)
+    best_name = rows[0]['model']
+    if best_name not in trained:
+        print(f"⚠ Meilleur modèle {best_name} non ré-entraîné : final_summary.csv inchangé")
+        return best_name
+
+    atomic_copy(os.path.join(models_dir, f"{best_name}_best.h5"),
+                os.path.join(models_dir, 'best_overall_model.h5'))
+
+    test = trained[best_name]['test_metrics']
+    sizes = {key: len(X) for key, (X, _) in splits.items()}
+    summary = [
+        ('Total Images', sum(sizes.values())),
+        ('Train Size', sizes['train']),
+        ('Val Size', sizes['val']),
+        ('Test Size', sizes['test']),
+        ('Best Model', best_name),
+        ('Test Accuracy', f"{test['Accuracy']:.4f}"),
+        ('Sensitivity', f"{test['Sensitivity']:.4f}"),
+        ('Specificity', f"{test['Specificity']:.4f}"),
+        ('Precision', f"{test['Precision']:.4f}"),
+        ('F1-Score', f"{test['F1-Score']:.4f}")
+    ]
+
+    def write_summary(f):
+        writer = csv.writer(f)
+        writer.writerow(['Metric', 'Value'])
+        writer.writerows(summary)
+    atomic_write(os.path.join(models_dir, 'final_summary.csv'), write_summary)
+    return best_name
+
+
+def run_summary(results, wall, jobs, threads):
+    return {
+        'wall_seconds': round(wall, 1),
+        'jobs': jobs,
+        'threads_per_job': threads,
+        'models': {
+            r['name']: {
+                'train_seconds': round(r['train_seconds'], 1),
+                'epochs': len(r['throughput']),
+                'avg_images_per_sec': round(sum(e['images_per_sec'] for e in r['throughput'])
+                                            / max(1, len(r['throughput'])), 1),
+                'cpus': r['cpus']
+            } for r in results
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entraînement parallèle des modèles et artefacts de l'application")
+    parser.add_argument('--models', nargs='+', default=MODEL_NAMES, choices=MODEL_NAMES)
+    parser.add_argument('--mode', choices=['parallel', 'sequential', 'both'], default='parallel')
+    parser.add_argument('--jobs', type=int, default=None, help="Entraînements simultanés (défaut: un par modèle)")
+    parser.add_argument('--threads-per-job', type=int, default=None,
+                        help="Threads TensorFlow par entraînement (défaut: cœurs / jobs)")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--packed', default=None, help="Cache produit par pack_dataset.py")
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--epochs', type=int, default=20)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--augment', action='store_true')
+    parser.add_argument('--seed', type=int, default=RANDOM_STATE)
+    parser.add_argument('--limit', type=int, default=None,
+                        help="Limiter chaque ensemble à N images (essai rapide)")
+    args = parser.parse_args()
+
+    options = {
+        'data_dir': args.data_dir, 'packed': args.packed, 'epochs': args.epochs,
+        'batch_size': args.batch_size, 'augment': args.augment, 'seed': args.seed, 'limit': args.limit
+    }
+    n_cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    jobs = args.jobs or len(args.models)
+    threads = args.threads_per_job or max(1, n_cpus // jobs)
+
+    os.makedirs(args.models_dir, exist_ok=True)
+    staging_dir = os.path.join(args.models_dir, f".staging-{os.getpid()}")
+    os.makedirs(staging_dir, exist_ok=True)
+
+    report_path = os.path.join(args.models_dir, 'training_report.json')
+    report = {}
+    if os.path.exists(report_path):
+        with open(report_path) as f:
+            report = json.load(f)
+
+    try:
+        results = None
+        if args.mode in ('sequential', 'both'):
+            print(f"\n▶ Séquentiel : {', '.join(args.models)} ({n_cpus} threads chacun)")
+            results, wall = run(args.models, options, 1, n_cpus, staging_dir)
+            report['sequential'] = run_summary(results, wall, 1, n_cpus)
+            print(f"✓ Séquentiel terminé en {wall:.0f}s")
+
+        if args.mode in ('parallel', 'both'):
+            print(f"\n▶ Parallèle : {', '.join(args.models)} ({jobs} processus x {threads} threads)")
+            results, wall = run(args.models, options, jobs, threads, staging_dir)
+            report['parallel'] = run_summary(results, wall, jobs, threads)
+            print(f"✓ Parallèle terminé en {wall:.0f}s")
+
+        best_name = write_artifacts(results, load_splits(options), args.models_dir)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+    # Gain mesuré seulement si les deux modes ont porté sur les mêmes modèles
+    sequential, parallel = report.get('sequential'), report.get('parallel')
+    if sequential and parallel and set(sequential['models']) == set(parallel['models']):
+        report['speedup'] = round(sequential['wall_seconds'] / parallel['wall_seconds'], 2)
+    report['updated_at'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    atomic_write(report_path, lambda f: json.dump(report, f, indent=2))
+
+    print("\n" + "=" * 60)
+    for r in results:
+        m, t = r['metrics'], r['test_metrics']
+        print(f"{r['name']:<10} val_acc={m['val_accuracy']:.4f}  test_acc={t['Accuracy']:.4f}  "
+              f"F1={t['F1-Score']:.4f}  {r['train_seconds']:.0f}s")
+    print("-" * 60)
+    print(f"Meilleur modèle: {best_name}")
+    if 'speedup' in report:
+        print(f"Gain parallèle / séquentiel: {report['speedup']}x "
+              f"({report['sequential']['wall_seconds']}s -> {report['parallel']['wall_seconds']}s)")
+    print("=" * 60)
+    print(f"✓ Artefacts écrits dans {args.models_dir}/")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""
+Entraînement des modèles A/B/C hors du notebook (traitement.ipynb, étapes 5 à 7)
+
+Au lieu de charger X_train_images entièrement en float32, les images sont
+lues en continu depuis le disque :
+
+    chemins mélangés (tampon borné) -> décodage parallèle (même prétraitement
+    que l'application) -> augmentation optionnelle -> lots -> prefetch
+
+La mémoire reste bornée par la taille des lots et du prefetch, quelle que
+soit la taille du jeu de données. Même découpage que le notebook
+(dataset.split_dataset, RANDOM_STATE=42), mêmes architectures et callbacks.
+
+Usage:
+    python training.py                                   # model_A, model_B, model_C
+    python training.py --models model_C --epochs 5 --augment
+    python training.py --packed cell_images_packed       # cache de pack_dataset.py
+"""
+import argparse
+import os
+import random
+import time
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.callbacks import Callback, EarlyStopping, ReduceLROnPlateau, ModelCheckpoint
+from tensorflow.keras.layers import Conv2D, MaxPooling2D, Dropout, Flatten, Dense, Activation, BatchNormalization
+from tensorflow.keras.models import Sequential
+
+from config import config
+from dataset import DATA_DIR, CATEGORIES, RANDOM_STATE, split_dataset, summary_metrics
+from preprocessing import load_pixels
+
+IMG_SIZE = (config.IMG_SIZE, config.IMG_SIZE)
+BATCH_SIZE = 32
+EPOCHS = 20
+MODELS_DIR = 'models'
+SHUFFLE_BUFFER = 8192
+
+
+def build_model_A(input_shape=(*IMG_SIZE, 3), n_classes=2):
+    """Modèle A - Architecture simple"""
+    model = Sequential([
+        Conv2D(32, (3, 3), padding='same', input_shape=input_shape),
+        Activation('relu'),
+        MaxPooling2D((2, 2)),
+        Conv2D(64, (3, 3)),
+        Activation('relu'),
+        MaxPooling2D((2, 2)),
+        Flatten(),
+        Dense(128),
+        Activation('relu'),
+        Dropout(0.5),
+        Dense(n_classes, activation='softmax')
+    ])
+    model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    print("  ✓ Modèle A créé (architecture simple)")
+    return model
+
+
+def build_model_B(input_shape=(*IMG_SIZE, 3), n_classes=2):
+    """Modèle B - Architecture avec BatchNormalization"""
+    model = Sequential()
+    model.add(Conv2D(32, (3, 3), padding='same', activation='relu', input_shape=input_shape))
+    model.add(Conv2D(32, (3, 3), activation='relu'))
+    model.add(MaxPooling2D((2, 2)))
+    model.add(BatchNormalization())
+    model.add(Conv2D(64, (3, 3), activation='relu'))
+    model.add(Conv2D(64, (3, 3), activation='relu'))
+    model.add(MaxPooling2D((2, 2)))
+    model.add(BatchNormalization())
+    model.add(Flatten())
+    model.add(Dense(256, activation='relu'))
+    model.add(Dropout(0.5))
+    model.add(Dense(n_classes, activation='softmax'))
+    model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    print("  ✓ Modèle B créé (avec BatchNormalization)")
+    return model
+
+
+def build_model_C(input_shape=(*IMG_SIZE, 3), n_classes=2):
+    """Modèle C - Architecture profonde"""
+    model = Sequential()
+    model.add(Conv2D(32, (3, 3), padding='same', activation='relu', input_shape=input_shape))
+    model.add(Conv2D(32, (3, 3), activation='relu'))
+    model.add(MaxPooling2D((2, 2)))
+    model.add(BatchNormalization())
+    model.add(Conv2D(64, (3, 3), padding='same', activation='relu'))
+    model.add(Conv2D(64, (3, 3), activation='relu'))
+    model.add(MaxPooling2D((2, 2)))
+    model.add(BatchNormalization())
+    model.add(Conv2D(128, (3, 3), activation='relu'))
+    model.add(MaxPooling2D((2, 2)))
+    model.add(Flatten())
+    model.add(Dense(512, activation='relu'))
+    model.add(Dropout(0.5))
+    model.add(Dense(n_classes, activation='softmax'))
+    model.compile(optimizer='adam', loss='categorical_crossentropy', metrics=['accuracy'])
+    print("  ✓ Modèle C créé (architecture profonde)")
+    return model
+
+
+MODEL_BUILDERS = {
+    'model_A': build_model_A,
+    'model_B': build_model_B,
+    'model_C': build_model_C
+}
+
+
+def set_seeds(seed=RANDOM_STATE):
+    """Graines random / numpy / TensorFlow, comme en tête du notebook"""
+    random.seed(seed)
+    np.random.seed(seed)
+    tf.random.set_seed(seed)
+
+
+def _augment(image):
+    """Retournements et rotations de 90° : une cellule n'a pas d'orientation"""
+    image = tf.image.random_flip_left_right(image)
+    image = tf.image.random_flip_up_down(image)
+    return tf.image.rot90(image, k=tf.random.uniform([], 0, 4, dtype=tf.int32))
+
+
+def make_dataset(paths, labels, batch_size=BATCH_SIZE, training=False, augment=False,
+                 seed=RANDOM_STATE, packed=None, shuffle_buffer=SHUFFLE_BUFFER):
+    """
+    tf.data en flux : seuls les chemins (ou positions du cache) sont mélangés,
+    les pixels sont décodés à la volée en parallèle et jamais tous en mémoire.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+
+    if packed is not None:
+        # Cache pack_dataset.py : lecture d'une ligne uint8 du tableau mappé
+        sources = packed.positions(paths)
+
+        def load(position):
+            return np.asarray(packed.pixels[position])
+    else:
+        sources = np.asarray(paths)
+
+        def load(path):
+            return load_pixels(path.decode(), IMG_SIZE)
+
+    ds = tf.data.Dataset.from_tensor_slices((sources, labels))
+    if training:
+        ds = ds.shuffle(min(len(labels), shuffle_buffer), seed=seed, reshuffle_each_iteration=True)
+
+    def decode(source, label):
+        image = tf.numpy_function(load, [source], tf.uint8)
+        image.set_shape((*IMG_SIZE, 3))
+        # Même normalisation que img_to_array / 255.0
+        image = tf.cast(image, tf.float32) / 255.0
+        return image, tf.one_hot(label, len(CATEGORIES))
+
+    ds = ds.map(decode, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+    if training:
+        # Une image illisible est ignorée (le notebook les retire à l'étape 2)
+        ds = ds.ignore_errors()
+    if training and augment:
+        ds = ds.map(lambda image, label: (_augment(image), label), num_parallel_calls=tf.data.AUTOTUNE)
+    return ds.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+class ThroughputCallback(Callback):
+    """Durée et débit (images/s) de chaque epoch d'entraînement"""
+
+    def __init__(self, n_images, name=''):
+        super().__init__()
+        self.n_images = n_images
+        self.name = name
+        self.epochs = []
+        self._start = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._start = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = time.perf_counter() - self._start
+        self.epochs.append({
+            'epoch': epoch + 1,
+            'seconds': round(elapsed, 2),
+            'images_per_sec': round(self.n_images / elapsed, 1)
+        })
+        print(f"  ⏱ {self.name} epoch {epoch + 1}: {elapsed:.1f}s, {self.n_images / elapsed:.0f} images/s")
+
+
+def train_model(name, splits, epochs=EPOCHS, batch_size=BATCH_SIZE, models_dir=MODELS_DIR,
+                checkpoint_path=None, augment=False, seed=RANDOM_STATE, packed=None, verbose=2):
+    """
+    Entraîne un modèle comme à l'étape 7 du notebook.
+    Retourne l'historique, les métriques de validation et le débit par epoch.
+    """
+    set_seeds(seed)
+    X_train, y_train = splits['train']
+    X_val, y_val = splits['val']
+
+    train_ds = make_dataset(X_train, y_train, batch_size, training=True, augment=augment,
+                            seed=seed, packed=packed)
+    val_ds = make_dataset(X_val, y_val, batch_size, packed=packed)
+
+    model = MODEL_BUILDERS[name]()
+
+    ckpt_path = checkpoint_path or os.path.join(models_dir, f"{name}_best.h5")
+    checkpoint = ModelCheckpoint(ckpt_path, monitor='val_accuracy',
+                                 save_best_only=True, mode='max', verbose=1)
+    early = EarlyStopping(monitor='val_loss', patience=6,
+                          restore_best_weights=True, verbose=1)
+    reduce_lr = ReduceLROnPlateau(monitor='val_loss', factor=0.5,
+                                  patience=3, min_lr=1e-6, verbose=1)
+    throughput = ThroughputCallback(len(X_train), name)
+
+    start = time.perf_counter()
+    history = model.fit(
+        train_ds,
+        epochs=epochs,
+        validation_data=val_ds,
+        callbacks=[checkpoint, early, reduce_lr, throughput],
+        verbose=verbose
+    )
+
+    history_dict = {key: [float(v) for v in values] for key, values in history.history.items()}
+    return {
+        'model': model,
+        'checkpoint_path': ckpt_path,
+        'history': history_dict,
+        'metrics': {
+            'model': name,
+            'val_accuracy': float(np.max(history_dict['val_accuracy'])),
+            'val_loss': float(np.min(history_dict['val_loss']))
+        },
+        'throughput': throughput.epochs,
+        'train_seconds': time.perf_counter() - start
+    }
+
+
+def evaluate_model(model, X_test, y_test, batch_size=64, packed=None):
+    """Métriques de test (convention de final_summary.csv) et probabilités"""
+    test_ds = make_dataset(X_test, y_test, batch_size, packed=packed)
+    probabilities = model.predict(test_ds, verbose=0)
+    y_pred = np.argmax(probabilities, axis=1)
+    return summary_metrics(y_test, y_pred), probabilities
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Entraînement en flux des modèles A/B/C")
+    parser.add_argument('--models', nargs='+', default=list(MODEL_BUILDERS), choices=list(MODEL_BUILDERS))
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--packed', default=None, help="Cache produit par pack_dataset.py")
+    parser.add_argument('--models-dir', default=MODELS_DIR)
+    parser.add_argument('--epochs', type=int, default=EPOCHS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--augment', action='store_true',
+                        help="Retournements/rotations à la volée (absents du notebook)")
+    parser.add_argument('--seed', type=int, default=RANDOM_STATE)
+    args = parser.parse_args()
+
+    os.makedirs(args.models_dir, exist_ok=True)
+    splits = split_dataset(args.data_dir, random_state=args.seed)
+    print(f"Train: {len(splits['train'][0])}, Validation: {len(splits['val'][0])}, "
+          f"Test: {len(splits['test'][0])}")
+
+    packed = None
+    if args.packed:
+        from pack_dataset import PackedDataset
+        packed = PackedDataset(args.packed, IMG_SIZE)
+
+    for name in args.models:
+        print(f"\n{'=' * 60}\nEntraînement de {name}\n{'=' * 60}")
+        result = train_model(name, splits, epochs=args.epochs, batch_size=args.batch_size,
+                             models_dir=args.models_dir, augment=args.augment,
+                             seed=args.seed, packed=packed)
+        rates = [e['images_per_sec'] for e in result['throughput']]
+        print(f"✓ {name}: val_accuracy={result['metrics']['val_accuracy']:.4f}, "
+              f"val_loss={result['metrics']['val_loss']:.4f}, "
+              f"{np.mean(rates):.0f} images/s en moyenne ({result['train_seconds']:.0f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import numpy as np
+
+# Symétries du carré, ordonnées pour que chaque préfixe de 2, 4 ou 8 forme un groupe :
+# identité, miroir horizontal, miroir vertical, 180°, transposée, 90°, 270°, anti-transposée
+TRANSFORMS = (
+    lambda b: b,
+    lambda b: b[:, :, ::-1],
+    lambda b: b[:, ::-1],
+    lambda b: b[:, ::-1, ::-1],
+    lambda b: b.transpose(0, 2, 1, 3),
+    lambda b: np.rot90(b, 1, axes=(1, 2)),
+    lambda b: np.rot90(b, 3, axes=(1, 2)),
+    lambda b: b[:, ::-1, ::-1].transpose(0, 2, 1, 3),
+)
+ALLOWED_TRANSFORMS = (2, 4, 8)
+
+
+def augment_batch(batch, transforms=8, include_identity=True):
+    """
+    Empile les symétries d'un lot (n, H, W, C) en un seul tableau
+    (t * n, H, W, C), transformation par transformation. Les symétries sont
+    des vues numpy : une seule copie, à la concaténation.
+    """
+    if transforms not in ALLOWED_TRANSFORMS:
+        raise ValueError(f"transforms doit valoir {', '.join(map(str, ALLOWED_TRANSFORMS))}")
+    views = TRANSFORMS[0 if include_identity else 1:transforms]
+    return np.concatenate([view(batch) for view in views], axis=0)
+
+
+def tta_predict(predict_fn, batch, transforms=8, first_pass=None):
+    """
+    Moyenne des probabilités sur les `transforms` symétries, en une seule
+    passe avant. Si `first_pass` (probabilités de l'image telle quelle) est
+    fourni, l'identité n'est pas recalculée.
+    """
+    batch = np.asarray(batch)
+    n = len(batch)
+    if first_pass is None:
+        probabilities = np.asarray(predict_fn(augment_batch(batch, transforms)))
+        return probabilities.reshape(transforms, n, -1).mean(axis=0)
+
+    others = np.asarray(predict_fn(augment_batch(batch, transforms, include_identity=False)))
+    total = others.reshape(transforms - 1, n, -1).sum(axis=0) + first_pass
+    return total / transforms
+
+
+def refine_low_confidence(predict_fn, batch, probabilities, threshold, transforms=8):
+    """
+    Recalcule par TTA les seules lignes dont la confiance est < threshold.
+    Retourne (probabilités, masque des lignes recalculées).
+    """
+    probabilities = np.asarray(probabilities)
+    mask = probabilities.max(axis=1) < threshold
+    if not mask.any():
+        return probabilities, mask
+
+    refined = probabilities.astype(np.float32, copy=True)
+    refined[mask] = tta_predict(predict_fn, np.asarray(batch)[mask], transforms, first_pass=probabilities[mask])
+    return refined, mask
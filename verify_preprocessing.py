@@ -0,0 +1,156 @@
+"""
+Vérifie que preprocessing.py reproduit le prétraitement d'entraînement
+
+La référence est le code de traitement.ipynb avant sa migration vers
+preprocessing.py : load_img(target_size=IMG_SIZE) + img_to_array / 255.0.
+Chaque backend disponible (cv2, pil, keras) et chaque API (image seule
+depuis des octets ou un chemin, lot, preprocess_paths) doit donner
+exactement les mêmes float32, sur un échantillon de cell_images/ et sur
+des cas limites générés (RGBA, niveaux de gris, palette, JPEG,
+agrandissement, image déjà à la bonne taille, format non carré).
+
+Le code de sortie vaut 1 au moindre écart au-delà de --tolerance.
+
+Usage:
+    python verify_preprocessing.py
+    python verify_preprocessing.py --samples 2000 --packed cell_images_packed
+"""
+import argparse
+import os
+import random
+import tempfile
+
+import numpy as np
+
+import preprocessing
+from config import config
+from dataset import list_images
+
+IMG_SIZE = (config.IMG_SIZE, config.IMG_SIZE)
+
+
+def reference_image(path, target_size=IMG_SIZE):
+    """Prétraitement avec lequel les modèles ont été entraînés"""
+    from tensorflow.keras.preprocessing.image import img_to_array
+    from tensorflow.keras.utils import load_img
+
+    return img_to_array(load_img(path, target_size=target_size)) / 255.0
+
+
+def write_edge_cases(folder):
+    """Images couvrant les conversions de mode et de taille ; retourne leurs chemins"""
+    from PIL import Image
+
+    rng = np.random.default_rng(42)
+    height, width = IMG_SIZE
+
+    def pixels(h, w, channels=3):
+        return rng.integers(0, 256, size=(h, w, channels), dtype=np.uint8)
+
+    cases = {
+        'rgba.png': Image.fromarray(pixels(142, 131, 4), 'RGBA'),
+        'grayscale.png': Image.fromarray(pixels(97, 120, 1)[:, :, 0], 'L'),
+        'palette.png': Image.fromarray(pixels(150, 140)).convert('P', palette=Image.ADAPTIVE),
+        'photo.jpg': Image.fromarray(pixels(160, 149)),
+        'upscale.png': Image.fromarray(pixels(40, 37)),
+        'exact_size.png': Image.fromarray(pixels(height, width)),
+        'wide.png': Image.fromarray(pixels(90, 411)),
+        'large.png': Image.fromarray(pixels(1200, 1600)),
+    }
+    paths = []
+    for name, img in cases.items():
+        path = os.path.join(folder, name)
+        img.save(path, quality=90) if name.endswith('.jpg') else img.save(path)
+        paths.append(path)
+    return paths
+
+
+def compare(name, outputs, references, tolerance, rows, paths):
+    """Ajoute une ligne au rapport et retourne True si tout est identique"""
+    diffs = np.array([float(np.max(np.abs(out.astype(np.float64) - ref)))
+                      for out, ref in zip(outputs, references)])
+    exact = int(np.sum(diffs == 0))
+    worst = int(np.argmax(diffs)) if len(diffs) else 0
+    ok = bool(len(diffs)) and float(diffs.max()) <= tolerance
+    rows.append({
+        'name': name,
+        'images': len(diffs),
+        'exact': exact,
+        'max_diff': float(diffs.max()) if len(diffs) else 0.0,
+        'worst': os.path.basename(paths[worst]) if len(diffs) and diffs[worst] > 0 else '-',
+        'ok': ok
+    })
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vérification du prétraitement contre load_img / img_to_array")
+    parser.add_argument('--data-dir', default='cell_images')
+    parser.add_argument('--samples', type=int, default=500, help="Images de cell_images/ vérifiées")
+    parser.add_argument('--packed', default=None, help="Vérifie aussi un cache pack_dataset.py")
+    parser.add_argument('--tolerance', type=float, default=0.0, help="Écart absolu maximal toléré")
+    args = parser.parse_args()
+
+    paths, _ = list_images(args.data_dir)
+    random.seed(42)
+    paths = random.sample(paths, min(args.samples, len(paths)))
+    print(f"▶ {len(paths)} images de {args.data_dir}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        edge_paths = write_edge_cases(tmp)
+        all_paths = paths + edge_paths
+        references = [reference_image(p) for p in all_paths]
+        edge_references = references[len(paths):]
+        payloads = []
+        for p in all_paths:
+            with open(p, 'rb') as f:
+                payloads.append(f.read())
+
+        rows = []
+        for backend in preprocessing.available_backends():
+            single_bytes = [preprocessing.preprocess(data, IMG_SIZE, backend)[0].copy() for data in payloads]
+            compare(f"{backend} preprocess (octets)", single_bytes, references, args.tolerance, rows, all_paths)
+
+            single_paths = [preprocessing.preprocess(p, IMG_SIZE, backend)[0].copy() for p in all_paths]
+            compare(f"{backend} preprocess (chemin)", single_paths, references, args.tolerance, rows, all_paths)
+
+            batch, valid, errors = preprocessing.preprocess_batch(payloads, IMG_SIZE, backend)
+            if errors:
+                print(f"⚠ {backend}: {len(errors)} image(s) refusée(s) par preprocess_batch")
+            compare(f"{backend} preprocess_batch", list(batch), [references[i] for i in valid],
+                    args.tolerance, rows, [all_paths[i] for i in valid])
+
+            loaded = preprocessing.preprocess_paths(all_paths, IMG_SIZE, backend)
+            compare(f"{backend} preprocess_paths", list(loaded), references, args.tolerance, rows, all_paths)
+
+        if args.packed:
+            from pack_dataset import PackedDataset
+            packed = PackedDataset(args.packed, IMG_SIZE)
+            compare("cache pack_dataset", list(packed.batch_for_paths(paths)), references[:len(paths)],
+                    args.tolerance, rows, paths)
+
+        print("\n" + "=" * 84)
+        print(f"{'Chemin':<32}{'Images':>8}{'Identiques':>12}{'Écart max':>12}  {'Pire image':<16}")
+        print("-" * 84)
+        for row in rows:
+            mark = '✓' if row['ok'] else '❌'
+            print(f"{row['name']:<32}{row['images']:>8}{row['exact']:>12}{row['max_diff']:>12.6f}  "
+                  f"{row['worst']:<16}{mark}")
+        print("=" * 84)
+
+        # Cas limites : écart détaillé par image pour le backend par défaut
+        default = preprocessing.current_backend()
+        for path, ref in zip(edge_paths, edge_references):
+            out = preprocessing.preprocess(path, IMG_SIZE, default)[0]
+            diff = float(np.max(np.abs(out - ref)))
+            print(f"  {default:<6}{os.path.basename(path):<18}écart max {diff:.6f}")
+
+    failed = [row['name'] for row in rows if not row['ok']]
+    if failed:
+        print(f"❌ Écarts avec le prétraitement d'entraînement: {', '.join(failed)}")
+        raise SystemExit(1)
+    print("✓ Prétraitement identique à load_img + img_to_array / 255.0 pour tous les backends")
+
+
+if __name__ == '__main__':
+    main()
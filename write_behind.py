@@ -0,0 +1,162 @@
+import atexit
+import os
+import queue
+import threading
+import time
+
+
+class PredictionWriter:
+    """
+    Écriture différée (write-behind) des prédictions.
+
+    `submit` dépose la prédiction dans une file bornée et rend la main
+    immédiatement ; un thread l'écrit avec les autres en un INSERT
+    multi-lignes dès que `batch_size` lignes sont en attente ou que
+    `flush_interval` secondes se sont écoulées. Les échecs sont retentés
+    avec un délai exponentiel ; la file est vidée à l'arrêt du processus.
+
+    created_at est conservé : chaque ligne est horodatée au moment de
+    `submit`, pas au moment de l'écriture.
+    """
+
+    def __init__(self, database, max_queue=10000, batch_size=100, flush_interval=1.0,
+                 max_retries=5, retry_backoff=0.5):
+        self.database = database
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.max_retries = int(max_retries)
+        self.retry_backoff = float(retry_backoff)
+
+        self._queue = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closing = threading.Event()
+
+        self._written = 0
+        self._batches = 0
+        self._retries = 0
+        self._dropped = 0
+        self._rejected = 0
+        self._in_flight = 0
+
+        atexit.register(self.close)
+
+    def _ensure_worker(self):
+        """Démarre le thread d'écriture (une fois par processus, après fork)"""
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='prediction-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, user_id, filename, predicted_class, confidence):
+        """
+        Met la prédiction en file. Retourne False si la file est pleine :
+        l'appelant doit alors l'écrire lui-même (db.save_prediction).
+        """
+        if self._closing.is_set():
+            return False
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((user_id, filename, predicted_class, confidence, time.time()))
+            return True
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            return False
+
+    def _next_batch(self):
+        """Attend la première ligne puis complète le lot jusqu'à la taille ou l'échéance"""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if self._closing.is_set():
+                remaining = 0
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        """Écrit le lot ; retente avec délai exponentiel, puis abandonne"""
+        for attempt in range(self.max_retries + 1):
+            now = time.time()
+            rows = [
+                (user_id, filename, predicted_class, confidence, max(0.0, now - submitted_at))
+                for user_id, filename, predicted_class, confidence, submitted_at in batch
+            ]
+            if self.database.save_predictions_many(rows) is not None:
+                with self._lock:
+                    self._written += len(batch)
+                    self._batches += 1
+                return True
+
+            if attempt < self.max_retries:
+                with self._lock:
+                    self._retries += 1
+                # Pendant l'arrêt, on ne patiente pas indéfiniment
+                if self._closing.wait(self.retry_backoff * (2 ** attempt)):
+                    break
+
+        with self._lock:
+            self._dropped += len(batch)
+        print(f"⚠ Write-behind: {len(batch)} prédiction(s) abandonnée(s) après {self.max_retries} tentatives")
+        return False
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                if self._closing.is_set():
+                    return
+                continue
+
+            with self._lock:
+                self._in_flight = len(batch)
+            try:
+                self._write(batch)
+            finally:
+                with self._lock:
+                    self._in_flight = 0
+
+    def flush(self, timeout=10.0):
+        """Attend que toutes les prédictions en file soient écrites"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                busy = self._in_flight
+            if self._queue.empty() and not busy:
+                return True
+            time.sleep(0.01)
+        return False
+
+    def close(self, timeout=10.0):
+        """Vide la file puis arrête le thread (appelé automatiquement à la sortie)"""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._closing.set()
+        self._thread.join(timeout=timeout)
+        pending = self._queue.qsize()
+        if pending:
+            print(f"⚠ Write-behind: {pending} prédiction(s) non écrite(s) à l'arrêt")
+
+    def stats(self):
+        """Compteurs exposés sur /health"""
+        with self._lock:
+            return {
+                'pending': self._queue.qsize() + self._in_flight,
+                'written': self._written,
+                'batches': self._batches,
+                'retries': self._retries,
+                'dropped': self._dropped,
+                'queue_full': self._rejected
+            }